@@ -0,0 +1,166 @@
+"""Cache of GPT chatbot answers for repeated questions.
+
+An answer is stored under a *scope* and the normalised question:
+
+  ``shared``             general campus questions (outpass rules, hostel
+                         timings …) asked without student data — one answer
+                         for every student
+  ``faculty:<ver>``      "where is / who is" questions answered from the
+                         faculty directory only
+  ``student:<id>:<ver>`` anything using the student's own data; the version
+                         stamp comes from data_versions, so edits to their rows
+                         start a new scope
+
+The last history turns are hashed into the key so follow-up questions are
+not answered out of context. Fuzzy matching is opt-in: with ``fuzzy`` set,
+a miss falls back to the most similar cached question in the same scope
+(hashed character-trigram cosine), e.g. "am i safe from detention" vs "am i
+safe from detention now". Questions whose numbers differ ("fee for semester
+4" vs "… semester 5") are never near-duplicates, however similar the text.
+"""
+import hashlib, math, re, threading, time
+from collections import OrderedDict
+from chat_context import SECTION_KEYWORDS
+
+_PERSONAL = re.compile(r"\b(my|me|mine|i|i'm|im|am i)\b")
+_NON_WORD = re.compile(r'[^a-z0-9+ ]+')
+_NUMBER   = re.compile(r'\d+|\b(?:zero|one|two|three|four|five|six|seven|eight|nine|ten|eleven|twelve'
+                       r'|first|second|third|fourth|fifth|sixth|seventh|eighth|ninth|tenth)\b')
+
+# general campus topics whose answers don't depend on who asks
+SHARED_TOPICS = ['outpass','outing','rule','hostel','mess','timing','hall ticket','grading','grade point',
+                 'how to','how do','procedure','apply','policy','on duty','on-duty','library','wifi','holiday']
+
+# words that ask about the student's own records ("outpass status?", "hostel fee pending?"); a topic
+# word that is also a shared topic ('grade' in 'grade point') doesn't count
+_TOPIC_WORDS  = {w for t in SHARED_TOPICS for w in t.split()}
+STUDENT_WORDS = sorted(({w for section in ('attendance', 'marks', 'fees') for w in SECTION_KEYWORDS[section]} |
+                        {'status', 'approved', 'rejected', 'balance', 'remaining', 'eligible'}) - _TOPIC_WORDS)
+_STUDENT_DATA = re.compile(r'\b(?:' + '|'.join(map(re.escape, STUDENT_WORDS)) + r')\b')
+
+HISTORY_TURNS = 2
+
+
+def normalize(message):
+    return ' '.join(_NON_WORD.sub(' ', message.lower()).split())
+
+
+def classify(message):
+    """'shared', 'faculty' or 'student' — how much context the answer depends on."""
+    q = normalize(message)
+    if _PERSONAL.search(q):
+        return 'student'
+    if any(w in q for w in SECTION_KEYWORDS['faculty']):
+        return 'faculty'
+    if any(w in q for w in SHARED_TOPICS) and not _STUDENT_DATA.search(q):
+        return 'shared'
+    return 'student'
+
+
+def numbers(question):
+    """The numeric tokens of a normalised question, in order — they must match for a fuzzy hit."""
+    return tuple(_NUMBER.findall(question))
+
+
+def _vector(text, dims=512):
+    padded = f'  {text} '
+    counts = {}
+    for i in range(len(padded) - 2):
+        h = int.from_bytes(hashlib.blake2s(padded[i:i+3].encode(), digest_size=4).digest(), 'little') % dims
+        counts[h] = counts.get(h, 0) + 1
+    norm = math.sqrt(sum(c * c for c in counts.values())) or 1.0
+    return {k: c / norm for k, c in counts.items()}
+
+
+def _cosine(a, b):
+    if len(a) > len(b):
+        a, b = b, a
+    return sum(v * b.get(k, 0.0) for k, v in a.items())
+
+
+class AnswerCache:
+
+    def __init__(self, max_entries=5000, ttl=3600, fuzzy=None):
+        self.max_entries = max_entries
+        self.ttl         = ttl
+        self.fuzzy       = fuzzy          # similarity threshold; falsy disables near-duplicate matching
+        self._entries    = OrderedDict()  # (bucket, question) -> [reply, expires, saved_seconds]
+        self._buckets    = {}             # (bucket, numbers) -> {question: vector} (for fuzzy lookups)
+        self._lock       = threading.Lock()
+        self._stats      = {'hits': 0, 'fuzzy_hits': 0, 'shared_hits': 0, 'misses': 0,
+                            'stored': 0, 'evictions': 0, 'saved_seconds': 0.0}
+
+    @staticmethod
+    def _bucket(scope, history):
+        turns = [f"{h.get('role')}:{h.get('content')}" for h in (history or [])[-HISTORY_TURNS:]
+                 if h.get('role') in ('user', 'assistant')]
+        return scope + '#' + hashlib.sha1('\n'.join(turns).encode()).hexdigest()[:12] if turns else scope
+
+    def _drop(self, key):
+        self._entries.pop(key)
+        near = (key[0], numbers(key[1]))
+        qs   = self._buckets.get(near)
+        if qs is not None:
+            qs.pop(key[1], None)
+            if not qs:
+                del self._buckets[near]
+
+    def _hit(self, key, entry, kind):
+        self._entries.move_to_end(key)
+        self._stats[kind] += 1
+        if key[0].startswith('shared'):
+            self._stats['shared_hits'] += 1
+        self._stats['saved_seconds'] += entry[2]
+        return entry[0]
+
+    def get(self, scope, message, history=None):
+        bucket, question = self._bucket(scope, history), normalize(message)
+        now = time.monotonic()
+        with self._lock:
+            key   = (bucket, question)
+            entry = self._entries.get(key)
+            if entry and entry[1] > now:
+                return self._hit(key, entry, 'hits')
+            if entry:
+                self._drop(key)
+            # copy the candidates and score them after releasing the lock
+            candidates = list(self._buckets.get((bucket, numbers(question)), {}).items()) if self.fuzzy else ()
+            if not candidates:
+                self._stats['misses'] += 1
+                return None
+
+        vec  = _vector(question)
+        best = max((_cosine(vec, v), q) for q, v in candidates)
+        with self._lock:
+            if best[0] >= self.fuzzy:
+                key   = (bucket, best[1])
+                entry = self._entries.get(key)          # evicted or replaced meanwhile: a miss
+                if entry and entry[1] > now:
+                    return self._hit(key, entry, 'fuzzy_hits')
+                if entry:
+                    self._drop(key)
+            self._stats['misses'] += 1
+            return None
+
+    def put(self, scope, message, history, reply, seconds):
+        """Store ``reply``; ``seconds`` is what producing it cost (credited back on each hit)."""
+        bucket, question = self._bucket(scope, history), normalize(message)
+        vec = _vector(question) if self.fuzzy else None
+        with self._lock:
+            key = (bucket, question)
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = [reply, time.monotonic() + self.ttl, seconds]
+            if vec is not None:
+                self._buckets.setdefault((bucket, numbers(question)), {})[question] = vec
+            self._stats['stored'] += 1
+            while len(self._entries) > self.max_entries:
+                self._drop(next(iter(self._entries)))
+                self._stats['evictions'] += 1
+
+    def stats(self):
+        with self._lock:
+            hits    = self._stats['hits'] + self._stats['fuzzy_hits']
+            lookups = hits + self._stats['misses']
+            return {**self._stats, 'saved_seconds': round(self._stats['saved_seconds'], 3),
+                    'entries': len(self._entries), 'hit_rate': round(hits / lookups, 3) if lookups else 0}
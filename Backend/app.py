@@ -1,125 +1,188 @@
-from flask import Flask, request, jsonify
+from flask import Flask, request, jsonify, Response
 from flask_cors import CORS
-import sqlite3, os, math
+import sqlite3, os, math, json, base64, time, io, csv, datetime
 from dotenv import load_dotenv
+import db
+from db import ConnectionPool, PoolTimeout
+from response_cache import ResponseCache, cached
+import migrations, importer, backfill, summary, recommender, peer_stats, chat_context, llm_client, answer_cache, intents, faculty_index, outpass_flow, outpass_risk, timetable_index, cohort_analytics
+from events import EventBus, BusFull, TOPICS as EVENT_TOPICS
+import metrics, query_audit
 
 load_dotenv()
 app = Flask(__name__)
-CORS(app)
-DB_PATH = os.path.join(os.path.dirname(__file__), 'data', 'campus.db')
+CORS(app, expose_headers=['X-Next-Cursor', 'ETag'])
+DB_PATH = os.getenv('CAMPUS_DB') or os.path.join(os.path.dirname(__file__), 'data', 'campus.db')
+db_pool = ConnectionPool(DB_PATH, max_size=int(os.getenv('DB_POOL_SIZE', '8')),
+                         timeout=float(os.getenv('DB_POOL_TIMEOUT', '30')))
+response_cache = ResponseCache(max_bytes=int(os.getenv('RESPONSE_CACHE_MB', '32')) * 1024 * 1024,
+                               ttl=int(os.getenv('RESPONSE_CACHE_TTL', '300')))
+# Each /api/events stream holds a request thread; EVENT_MAX_STREAMS caps them per worker
+# (gunicorn.conf.py adds that many threads on top of the DB pool's).
+events = EventBus(lambda: db.connect(DB_PATH), history=int(os.getenv('EVENT_HISTORY', '1000')),
+                  poll_interval=float(os.getenv('EVENT_POLL_INTERVAL', '0.25')),
+                  max_subscribers=int(os.getenv('EVENT_MAX_STREAMS', '8')))
+# Per-route latency / SQL / GPT metrics on /metrics; requests over SLOW_REQUEST_MS go to the slow log
+# (SLOW_REQUEST_LOG file, stderr by default). METRICS=0 turns the request hooks off.
+REQUEST_METRICS = metrics.RequestMetrics(metrics.Registry(), slow_ms=float(os.getenv('SLOW_REQUEST_MS', '500')),
+                                         slow_log=metrics.slow_request_logger(os.getenv('SLOW_REQUEST_LOG')))
+if os.getenv('METRICS', '1') != '0':
+    REQUEST_METRICS.install(app)
 
 def get_db():
-    conn = sqlite3.connect(DB_PATH)
-    conn.row_factory = sqlite3.Row
-    return conn
+    """Borrow this thread's pooled connection; conn.close() returns it to the pool."""
+    return db_pool.connection()
+
+@app.teardown_request
+def release_db(exc):
+    # A handler that raised before conn.close() still hands its connection back (rolled back).
+    db_pool.release_all()
+
+@app.errorhandler(PoolTimeout)
+def db_busy(e):
+    return jsonify({'error': 'The database is busy, please try again.'}), 503
+
+# Development / test only: QUERY_AUDIT=warn|strict flags statements repeated more than QUERY_REPEAT_LIMIT
+# times in one request (N+1 loops), full-table scans in EXPLAIN QUERY PLAN, and routes over their statement
+# budget (QUERY_BUDGETS, else QUERY_BUDGET); strict raises instead of only logging. See query_audit.py.
+QUERY_BUDGETS = {
+    '/api/student/login'                      : 2,
+    '/api/dashboard/summary/<int:student_id>' : 3,
+    '/api/attendance/<int:student_id>'        : 2,
+    '/api/marks/<int:student_id>'             : 2,
+    '/api/fees/<int:student_id>'              : 2,
+    '/api/timetable/<int:student_id>'         : 2,
+    '/api/timetable/<int:student_id>/grid'    : 3,
+    '/api/outpass/student/<int:student_id>'   : 2,
+    '/api/teacher/outpass/pending'            : 4,
+    '/api/teacher/outpass/queues'             : 2,
+    '/api/teacher/helpdesk/all'               : 3,
+    '/api/teacher/helpdesk/counts'            : 2,
+    '/api/teacher/find/<teacher_name>'        : 4,
+    '/api/faculty/roles'                      : 2,
+    '/api/teacher/analytics/cohort'           : 5,
+    '/api/ai/recommendations/<int:student_id>': 6,
+    '/api/ai/outpass-risk/batch'              : 4,
+    '/api/chatbot'                            : 12,
+    '/api/student/<int:student_id>/bundle'    : 15,
+}
+QUERY_AUDIT = None
+if os.getenv('QUERY_AUDIT', '0') not in ('', '0'):
+    QUERY_AUDIT = query_audit.QueryAudit(get_db, mode=os.getenv('QUERY_AUDIT').lower(),
+                                         repeat_limit=int(os.getenv('QUERY_REPEAT_LIMIT', '5')),
+                                         default_budget=int(os.getenv('QUERY_BUDGET', '20')), budgets=QUERY_BUDGETS,
+                                         allow_scans=[t for t in os.getenv('QUERY_ALLOW_SCANS', '').split(',') if t])
+    QUERY_AUDIT.install(app)
 
 def row_to_dict(row):
     return dict(row) if row else None
 
-def init_db():
+SCHEMA_SQL = '''
+    CREATE TABLE IF NOT EXISTS students (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        reg_no TEXT UNIQUE NOT NULL, name TEXT NOT NULL,
+        email TEXT, phone TEXT, department TEXT,
+        year INTEGER, semester INTEGER, section TEXT,
+        hostel TEXT,
+        is_hosteler INTEGER DEFAULT 1,
+        password TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS teachers (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        teacher_id TEXT UNIQUE NOT NULL, name TEXT NOT NULL,
+        email TEXT, department TEXT, designation TEXT,
+        office_room TEXT, password TEXT NOT NULL
+    );
+    CREATE TABLE IF NOT EXISTS faculty_roles (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        teacher_id INTEGER, role_type TEXT,
+        role_name TEXT, department TEXT
+    );
+    CREATE TABLE IF NOT EXISTS teacher_status (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        teacher_id INTEGER UNIQUE,
+        current_status TEXT DEFAULT "In Office",
+        location TEXT, available_from TEXT, available_to TEXT
+    );
+    CREATE TABLE IF NOT EXISTS attendance (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        student_id INTEGER, subject TEXT,
+        total_classes INTEGER, attended_classes INTEGER, percentage REAL
+    );
+    CREATE TABLE IF NOT EXISTS marks (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        student_id INTEGER, subject TEXT,
+        internal_marks INTEGER, external_marks INTEGER,
+        total_marks INTEGER, grade TEXT, credits INTEGER
+    );
+    CREATE TABLE IF NOT EXISTS timetable (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        student_id INTEGER, day TEXT, time_slot TEXT,
+        subject TEXT, teacher_name TEXT, room TEXT
+    );
+    CREATE TABLE IF NOT EXISTS exam_schedule (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        subject TEXT, exam_date TEXT, time TEXT,
+        hall TEXT, semester INTEGER, department TEXT
+    );
+    CREATE TABLE IF NOT EXISTS fees (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        student_id INTEGER, total_fee REAL, paid_amount REAL,
+        pending_amount REAL, status TEXT, due_date TEXT
+    );
+
+    -- OUTPASS: 4-stage approval flow
+    CREATE TABLE IF NOT EXISTS outpass_requests (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        student_id INTEGER, reason TEXT, destination TEXT,
+        out_date TEXT, out_time TEXT,
+        return_date TEXT, return_time TEXT,
+
+        -- Stage tracking
+        stage TEXT DEFAULT "Faculty Advisor",
+        overall_status TEXT DEFAULT "Pending",
+
+        -- Stage 1: Faculty Advisor
+        faculty_status TEXT DEFAULT "Pending",
+        faculty_approved_by TEXT,
+        faculty_approved_at DATETIME,
+
+        -- Stage 2: Hostel Coordinator
+        hostel_coord_status TEXT DEFAULT "Waiting",
+        hostel_coord_approved_by TEXT,
+        hostel_coord_approved_at DATETIME,
+
+        -- Stage 3: HOD
+        hod_status TEXT DEFAULT "Waiting",
+        hod_approved_by TEXT,
+        hod_approved_at DATETIME,
+
+        -- Stage 4: Hostel Warden
+        warden_status TEXT DEFAULT "Waiting",
+        warden_approved_by TEXT,
+        warden_approved_at DATETIME,
+
+        submitted_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    );
+
+    CREATE TABLE IF NOT EXISTS onduty_requests (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        student_id INTEGER, event_name TEXT, date TEXT,
+        description TEXT, status TEXT DEFAULT "Pending",
+        submitted_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    );
+    CREATE TABLE IF NOT EXISTS helpdesk_tickets (
+        id INTEGER PRIMARY KEY AUTOINCREMENT,
+        student_id INTEGER, category TEXT, subject TEXT,
+        description TEXT, status TEXT DEFAULT "Open",
+        submitted_at DATETIME DEFAULT CURRENT_TIMESTAMP
+    );
+'''
+
+def init_db(bootstrap=None):
     os.makedirs(os.path.dirname(DB_PATH), exist_ok=True)
     conn = get_db(); c = conn.cursor()
-    c.executescript('''
-        CREATE TABLE IF NOT EXISTS students (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            reg_no TEXT UNIQUE NOT NULL, name TEXT NOT NULL,
-            email TEXT, phone TEXT, department TEXT,
-            year INTEGER, semester INTEGER, section TEXT,
-            hostel TEXT,
-            is_hosteler INTEGER DEFAULT 1,
-            password TEXT NOT NULL
-        );
-        CREATE TABLE IF NOT EXISTS teachers (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            teacher_id TEXT UNIQUE NOT NULL, name TEXT NOT NULL,
-            email TEXT, department TEXT, designation TEXT,
-            office_room TEXT, password TEXT NOT NULL
-        );
-        CREATE TABLE IF NOT EXISTS faculty_roles (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            teacher_id INTEGER, role_type TEXT,
-            role_name TEXT, department TEXT
-        );
-        CREATE TABLE IF NOT EXISTS teacher_status (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            teacher_id INTEGER UNIQUE,
-            current_status TEXT DEFAULT "In Office",
-            location TEXT, available_from TEXT, available_to TEXT
-        );
-        CREATE TABLE IF NOT EXISTS attendance (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            student_id INTEGER, subject TEXT,
-            total_classes INTEGER, attended_classes INTEGER, percentage REAL
-        );
-        CREATE TABLE IF NOT EXISTS marks (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            student_id INTEGER, subject TEXT,
-            internal_marks INTEGER, external_marks INTEGER,
-            total_marks INTEGER, grade TEXT, credits INTEGER
-        );
-        CREATE TABLE IF NOT EXISTS timetable (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            student_id INTEGER, day TEXT, time_slot TEXT,
-            subject TEXT, teacher_name TEXT, room TEXT
-        );
-        CREATE TABLE IF NOT EXISTS exam_schedule (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            subject TEXT, exam_date TEXT, time TEXT,
-            hall TEXT, semester INTEGER, department TEXT
-        );
-        CREATE TABLE IF NOT EXISTS fees (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            student_id INTEGER, total_fee REAL, paid_amount REAL,
-            pending_amount REAL, status TEXT, due_date TEXT
-        );
-
-        -- OUTPASS: 4-stage approval flow
-        CREATE TABLE IF NOT EXISTS outpass_requests (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            student_id INTEGER, reason TEXT, destination TEXT,
-            out_date TEXT, out_time TEXT,
-            return_date TEXT, return_time TEXT,
-
-            -- Stage tracking
-            stage TEXT DEFAULT "Faculty Advisor",
-            overall_status TEXT DEFAULT "Pending",
-
-            -- Stage 1: Faculty Advisor
-            faculty_status TEXT DEFAULT "Pending",
-            faculty_approved_by TEXT,
-            faculty_approved_at DATETIME,
-
-            -- Stage 2: Hostel Coordinator
-            hostel_coord_status TEXT DEFAULT "Waiting",
-            hostel_coord_approved_by TEXT,
-            hostel_coord_approved_at DATETIME,
-
-            -- Stage 3: HOD
-            hod_status TEXT DEFAULT "Waiting",
-            hod_approved_by TEXT,
-            hod_approved_at DATETIME,
-
-            -- Stage 4: Hostel Warden
-            warden_status TEXT DEFAULT "Waiting",
-            warden_approved_by TEXT,
-            warden_approved_at DATETIME,
-
-            submitted_at DATETIME DEFAULT CURRENT_TIMESTAMP
-        );
-
-        CREATE TABLE IF NOT EXISTS onduty_requests (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            student_id INTEGER, event_name TEXT, date TEXT,
-            description TEXT, status TEXT DEFAULT "Pending",
-            submitted_at DATETIME DEFAULT CURRENT_TIMESTAMP
-        );
-        CREATE TABLE IF NOT EXISTS helpdesk_tickets (
-            id INTEGER PRIMARY KEY AUTOINCREMENT,
-            student_id INTEGER, category TEXT, subject TEXT,
-            description TEXT, status TEXT DEFAULT "Open",
-            submitted_at DATETIME DEFAULT CURRENT_TIMESTAMP
-        );
-    ''')
+    c.executescript(SCHEMA_SQL)
 
     if c.execute('SELECT COUNT(*) FROM students').fetchone()[0] == 0:
         c.executescript('''
@@ -208,136 +271,106 @@ def init_db():
                 (2,95000,95000,0,"Paid","2024-11-30"),
                 (3,95000,0,95000,"Pending","2024-11-30");
         ''')
-    conn.commit(); conn.close()
+    conn.commit()
+    migrations.migrate(conn)
+    conn.close()
 
-    # Auto-import students and teachers from CSV if available
-    _auto_import()
+    # Auto-import students and teachers from CSV if available.
+    # BOOTSTRAP_MODE: background (default) | sync | skip — ``bootstrap`` overrides it
+    mode = (bootstrap or os.getenv('BOOTSTRAP_MODE', 'background')).strip().lower()
+    if mode == 'sync':
+        _auto_import()
+    elif mode == 'background':
+        backfill.start_background(_auto_import)
     print("Database ready!")
 
 
-def _auto_import():
-    """Auto-imports students.csv and teachers.csv, fills missing data for ALL students."""
-    import csv as _csv, random as _r
-
+def _auto_import(stop=None):
+    """Auto-imports students.csv and teachers.csv, then fills missing data for ALL students."""
     base         = os.path.dirname(__file__)
     students_csv = os.path.join(base, 'students.csv')
     teachers_csv = os.path.join(base, 'teachers.csv')
 
-    SUBJECTS = {
-        "CSE":  ["Data Structures","Database Systems","Computer Networks","Operating Systems","Software Engineering"],
-        "ECE":  ["Circuit Theory","Digital Electronics","Signals & Systems","Microprocessors","Communication Systems"],
-        "MECH": ["Engineering Mechanics","Thermodynamics","Fluid Mechanics","Manufacturing Processes","Machine Design"],
-        "CIVIL":["Surveying","Structural Analysis","Concrete Technology","Geotechnical Engineering","Fluid Mechanics"],
-        "EEE":  ["Circuit Analysis","Electrical Machines","Power Systems","Control Systems","Power Electronics"],
-        "IT":   ["Web Technologies","Database Management","Computer Networks","Software Testing","Cloud Computing"],
-        "AIDS": ["Machine Learning","Data Analytics","Deep Learning","Natural Language Processing","Computer Vision"],
-        "CSBS": ["Business Analytics","Data Science","Blockchain","IoT","Cyber Security"],
-    }
-    GRADE_MARKS = {
-        "A+": (22,80,25,100), "A":  (18,68,24,85),
-        "B+": (16,56,22,75),  "B":  (14,45,20,65), "C": (12,35,18,55),
-    }
-    GRADES   = ["A+","A","B+","B","C"]
-    DAYS     = ["MON","TUE","WED","THU","FRI"]
-    SLOTS    = ["8.00-8.50","8.50-9.40","9.50-10.40","10.40-11.30","12.20-1.10","1.10-2.00"]
-    TEACHERS = ["Dr. Rajesh Kumar","Prof. Priya Sharma","Dr. Suresh Reddy","Prof. Anita Desai","Dr. Vikram Singh"]
-
     conn = get_db()
-    c    = conn.cursor()
-
-    # ── Step 1: Insert any students from CSV not yet in DB ─────────────
-    if os.path.exists(students_csv):
-        with open(students_csv, newline='', encoding='utf-8') as f:
-            for row in _csv.DictReader(f):
-                reg = row['reg_no'].strip()
-                if not c.execute('SELECT id FROM students WHERE reg_no=?',(reg,)).fetchone():
-                    try:
-                        c.execute(
-                            'INSERT INTO students (reg_no,name,email,phone,department,year,semester,section,hostel,is_hosteler,password) VALUES (?,?,?,?,?,?,?,?,?,?,?)',
-                            (reg, row['name'].strip(), row['email'].strip(), row['phone'].strip(),
-                             row['department'].strip(), int(row['year']), int(row['semester']),
-                             row['section'].strip(), row['hostel'].strip(),
-                             int(row['is_hosteler']), row['password'].strip())
-                        )
-                    except Exception:
-                        pass
-        conn.commit()
-
-    # ── Step 2: Fill missing attendance/marks/fees/timetable for ALL students ──
-    all_students = c.execute('SELECT id, department FROM students').fetchall()
-    filled = 0
-    for (sid, dept) in all_students:
-        dept     = dept or 'CSE'
-        subjects = SUBJECTS.get(dept, SUBJECTS['CSE'])
-
-        if c.execute('SELECT COUNT(*) FROM attendance WHERE student_id=?',(sid,)).fetchone()[0] == 0:
-            for subj in subjects:
-                total    = _r.choice([38,40,42,44])
-                pct_val  = _r.choices([_r.uniform(60,74),_r.uniform(75,95)],weights=[25,75])[0]
-                attended = max(0, min(int(pct_val/100*total), total))
-                pct      = round(attended/total*100, 1)
-                c.execute('INSERT INTO attendance (student_id,subject,total_classes,attended_classes,percentage) VALUES (?,?,?,?,?)',
-                          (sid,subj,total,attended,pct))
-            filled += 1
-
-        if c.execute('SELECT COUNT(*) FROM marks WHERE student_id=?',(sid,)).fetchone()[0] == 0:
-            for subj in subjects:
-                grade = _r.choices(GRADES, weights=[20,30,25,15,10])[0]
-                i_min,e_min,i_max,e_max = GRADE_MARKS[grade]
-                internal = _r.randint(i_min, i_max)
-                external = _r.randint(e_min, e_max)
-                credits  = _r.choice([3,4])
-                c.execute('INSERT INTO marks (student_id,subject,internal_marks,external_marks,total_marks,grade,credits) VALUES (?,?,?,?,?,?,?)',
-                          (sid,subj,internal,external,internal+external,grade,credits))
-
-        if c.execute('SELECT COUNT(*) FROM fees WHERE student_id=?',(sid,)).fetchone()[0] == 0:
-            total_fee = _r.choice([85000,90000,95000,100000])
-            paid      = _r.randint(0, total_fee)
-            pending   = total_fee - paid
-            status    = "Paid" if pending==0 else ("Partial" if paid>0 else "Pending")
-            c.execute('INSERT INTO fees (student_id,total_fee,paid_amount,pending_amount,status,due_date) VALUES (?,?,?,?,?,?)',
-                      (sid,total_fee,paid,pending,status,"2024-11-30"))
-
-        if c.execute('SELECT COUNT(*) FROM timetable WHERE student_id=?',(sid,)).fetchone()[0] == 0:
-            for day in DAYS:
-                for slot in _r.sample(SLOTS, k=_r.randint(3,5)):
-                    c.execute('INSERT INTO timetable (student_id,day,time_slot,subject,teacher_name,room) VALUES (?,?,?,?,?,?)',
-                              (sid,day,slot,_r.choice(subjects),_r.choice(TEACHERS),
-                               f"{dept}-{_r.randint(1,5)}0{_r.randint(1,9)}"))
-
-    if filled > 0:
-        print(f"  Filled data for {filled} students!")
-    conn.commit()
-
-    # ── Step 3: Import teachers from CSV ──────────────────────────────
-    if os.path.exists(teachers_csv):
-        added_t = 0
-        with open(teachers_csv, newline='', encoding='utf-8') as f:
-            for row in _csv.DictReader(f):
-                tid = row['teacher_id'].strip()
-                if c.execute('SELECT id FROM teachers WHERE teacher_id=?',(tid,)).fetchone():
-                    continue
-                c.execute('INSERT INTO teachers (teacher_id,name,email,department,designation,office_room,password) VALUES (?,?,?,?,?,?,?)',
-                          (tid,row['name'].strip(),row['email'].strip(),row['department'].strip(),
-                           row['designation'].strip(),row['office_room'].strip(),row['password'].strip()))
-                db_id = c.lastrowid
-                if row.get('role_type','').strip():
-                    c.execute('INSERT INTO faculty_roles (teacher_id,role_type,role_name,department) VALUES (?,?,?,?)',
-                              (db_id,row['role_type'].strip(),row['role_name'].strip(),row['department'].strip()))
-                c.execute('INSERT OR IGNORE INTO teacher_status (teacher_id,current_status,location,available_from,available_to) VALUES (?,?,?,?,?)',
-                          (db_id,"Available",row['office_room'].strip(),"9:00 AM","5:00 PM"))
-                added_t += 1
-        if added_t > 0:
-            print(f"  Auto-imported {added_t} teachers!")
-        conn.commit()
-
-    conn.close()
+    try:
+        # ── Step 1: Insert any students from CSV not yet in DB ─────────────
+        if os.path.exists(students_csv):
+            report = importer.import_students(conn, students_csv)
+            if report['added']:
+                response_cache.clear()     # new ids may have cached empty responses
+            if report['added'] or report['rejected']:
+                print(importer.format_report('Students', report))
+
+        # ── Step 2: Import teachers from CSV ──────────────────────────────
+        if os.path.exists(teachers_csv):
+            report = importer.import_teachers(conn, teachers_csv)
+            if report['added'] or report['rejected']:
+                print(importer.format_report('Teachers', report))
+
+        # ── Step 3: Fill missing attendance/marks/fees/timetable (resumable) ──
+        result = backfill.run_backfill(conn, stop=stop, on_batch=response_cache.invalidate_students)
+        if result['students']:
+            print(f"  Filled data for {result['students']} students in {result['seconds']}s!")
+    finally:
+        conn.close()
 
 # ─── ROOT ─────────────────────────────────────────────────────────────
 @app.route('/')
 def home():
     return jsonify({"message":"SmartCampus AI Running!","status":"ok"})
 
+@app.route('/api/system/db-pool')
+def db_pool_stats():
+    return jsonify(db_pool.stats())
+
+@app.route('/api/system/response-cache')
+def response_cache_stats():
+    return jsonify(response_cache.stats())
+
+@app.route('/api/system/llm')
+def llm_stats():
+    return jsonify(LLM.stats())
+
+@app.route('/api/system/answer-cache')
+def answer_cache_stats():
+    return jsonify(ANSWER_CACHE.stats())
+
+@app.route('/api/system/events')
+def event_stats():
+    return jsonify(events.stats())
+
+@app.route('/metrics')
+def prometheus_metrics():
+    body = REQUEST_METRICS.registry.render({
+        'db_pool': db_pool.stats(), 'response_cache': response_cache.stats(), 'answer_cache': ANSWER_CACHE.stats(),
+        'llm': LLM.stats(), 'events': events.stats()})
+    return Response(body, mimetype='text/plain; version=0.0.4')
+
+@app.route('/api/system/query-audit')
+def query_audit_report():
+    if not QUERY_AUDIT:
+        return jsonify({'error': 'Query audit is off (set QUERY_AUDIT=warn or strict)'}), 404
+    return jsonify(QUERY_AUDIT.report())
+
+# ─── LIVE UPDATES (server-sent events) ────────────────────────────────
+# GET /api/events?topics=outpass,onduty → `event: <topic>` / `data: {"type", "data"}`
+# Events go through the event_log table, so a stream on any worker sees writes made on every worker.
+# Reconnects resume from Last-Event-ID; an `event: resync` means re-fetch the lists.
+@app.route('/api/events')
+def event_stream():
+    topics  = [t for t in request.args.get('topics', ','.join(EVENT_TOPICS)).split(',') if t]
+    unknown = [t for t in topics if t not in EVENT_TOPICS]
+    if unknown or not topics:
+        return jsonify({'error': f"Unknown topics: {','.join(unknown)}", 'topics': list(EVENT_TOPICS)}), 400
+    last_id = request.headers.get('Last-Event-ID') or request.args.get('last_event_id')
+    last_id = int(last_id) if last_id and last_id.isdigit() else None
+    try:
+        body = events.stream(topics, last_id)
+    except BusFull:
+        return jsonify({'error': 'Too many live-update connections, please retry shortly.'}), 503, {'Retry-After': '30'}
+    return Response(body, mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
 # ─── STUDENT LOGIN ─────────────────────────────────────────────────────
 @app.route('/api/student/login', methods=['POST'])
 def student_login():
@@ -381,57 +414,242 @@ def teacher_login():
 
 # ─── DASHBOARD SUMMARY (fees removed) ─────────────────────────────────
 @app.route('/api/dashboard/summary/<int:student_id>')
+@cached(response_cache, 'student:{student_id}')
 def dashboard_summary(student_id):
     conn    = get_db()
-    student = row_to_dict(conn.execute('SELECT * FROM students WHERE id=?',(student_id,)).fetchone())
-    att     = [dict(r) for r in conn.execute('SELECT * FROM attendance WHERE student_id=?',(student_id,)).fetchall()]
-    marks   = [dict(r) for r in conn.execute('SELECT * FROM marks WHERE student_id=?',(student_id,)).fetchall()]
+    student = _student_profile(conn, student_id)
+    result  = _summary_section(conn, student) if student else None
     conn.close()
     if not student: return jsonify({'error':'Not found'}), 404
-    gp   = {'A+':10,'A':9,'B+':8,'B':7,'C':6}
-    tc   = sum(m['credits'] for m in marks)
-    cgpa = round(sum(gp.get(m['grade'],7)*m['credits'] for m in marks)/tc,2) if tc else 0
-    low  = [a for a in att if a['percentage'] < 75]
-    return jsonify({'student':student,'total_subjects':len(att),'cgpa':cgpa,
-                    'low_attendance_count':len(low),'low_attendance_subjects':low})
+    return jsonify(result)
     # NOTE: fees intentionally removed from summary
 
+# Everything about a student except the password
+STUDENT_PROFILE_FIELDS = 'id,reg_no,name,email,phone,department,year,semester,section,hostel,is_hosteler'
+
+def _student_profile(conn, student_id):
+    return row_to_dict(conn.execute(f'SELECT {STUDENT_PROFILE_FIELDS} FROM students WHERE id=?',(student_id,)).fetchone())
+
+def _summary_section(conn, student):
+    summ = summary.get_summary(conn, student['id'])
+    return {'student':student,'total_subjects':summ['total_subjects'],'cgpa':summ['cgpa'],
+            'low_attendance_count':summ['low_attendance_count'],
+            'low_attendance_subjects':summ['low_attendance']}
+
 # ─── ATTENDANCE ────────────────────────────────────────────────────────
 @app.route('/api/attendance/<int:student_id>')
+@cached(response_cache, 'student:{student_id}')
 def get_attendance(student_id):
     conn = get_db()
-    rows = [dict(r) for r in conn.execute('SELECT * FROM attendance WHERE student_id=?',(student_id,)).fetchall()]
-    conn.close()
+    rows = _attendance_rows(conn, student_id)
+    conn.close(); return jsonify(rows)
+
+def _attendance_rows(conn, student_id):
+    rows = [dict(r) for r in conn.execute('SELECT * FROM attendance WHERE student_id=? ORDER BY id',(student_id,)).fetchall()]
     for r in rows:
         T,A = r['total_classes'],r['attended_classes']
         r['classes_needed'] = max(0,int((0.75*T-A)/0.25)+1) if r['percentage']<75 else 0
-    return jsonify(rows)
+    return rows
 
 @app.route('/api/marks/<int:student_id>')
+@cached(response_cache, 'student:{student_id}')
 def get_marks(student_id):
     conn = get_db()
-    rows = [dict(r) for r in conn.execute('SELECT * FROM marks WHERE student_id=?',(student_id,)).fetchall()]
+    rows = _marks_rows(conn, student_id)
     conn.close(); return jsonify(rows)
 
+def _marks_rows(conn, student_id):
+    return [dict(r) for r in conn.execute('SELECT * FROM marks WHERE student_id=? ORDER BY id',(student_id,)).fetchall()]
+
 @app.route('/api/timetable/<int:student_id>')
+@cached(response_cache, 'student:{student_id}')
 def get_timetable(student_id):
     conn = get_db()
-    rows = [dict(r) for r in conn.execute(
-        'SELECT * FROM timetable WHERE student_id=? ORDER BY day,time_slot',(student_id,)).fetchall()]
+    rows = _timetable_rows(conn, student_id)
     conn.close(); return jsonify(rows)
 
+def _timetable_rows(conn, student_id):
+    return [dict(r) for r in conn.execute(
+        'SELECT * FROM timetable WHERE student_id=? ORDER BY COALESCE(day_idx,9),COALESCE(slot_idx,99),time_slot',
+        (student_id,)).fetchall()]
+
 @app.route('/api/exam-schedule/<int:semester>')
+@cached(response_cache, 'semester:{semester}')
 def get_exam_schedule(semester):
     conn = get_db()
-    rows = [dict(r) for r in conn.execute(
-        'SELECT * FROM exam_schedule WHERE semester=? ORDER BY exam_date',(semester,)).fetchall()]
+    rows = _exam_rows(conn, semester)
     conn.close(); return jsonify(rows)
 
+def _exam_rows(conn, semester):
+    return [dict(r) for r in conn.execute(
+        'SELECT * FROM exam_schedule WHERE semester=? ORDER BY exam_date',(semester,)).fetchall()]
+
 @app.route('/api/fees/<int:student_id>')
+@cached(response_cache, 'student:{student_id}')
 def get_fees(student_id):
     conn = get_db()
-    row  = row_to_dict(conn.execute('SELECT * FROM fees WHERE student_id=?',(student_id,)).fetchone())
-    conn.close(); return jsonify(row or {})
+    row  = _fees_row(conn, student_id)
+    conn.close(); return jsonify(row)
+
+def _fees_row(conn, student_id):
+    return row_to_dict(conn.execute('SELECT * FROM fees WHERE student_id=?',(student_id,)).fetchone()) or {}
+
+# ─── STUDENT DASHBOARD BUNDLE ─────────────────────────────────────────
+# GET /api/student/<id>/bundle?sections=summary,attendance,fees&fields[attendance]=subject,percentage
+# Any subset of the dashboard's sections (all by default) from one connection and one read
+# transaction, so the sections agree with each other. fields[<section>] keeps only those keys of
+# every row (or of the section object); unknown sections or fields are a 400.
+def _timetable_grid_section(conn, student):
+    TIMETABLE.refresh(conn)
+    grid = TIMETABLE.grid('student', student['id'])
+    if grid is None:
+        return None
+    return {'days': timetable_index.DAYS, 'slots': timetable_index.SLOTS, 'grid': grid,
+            **TIMETABLE.now_next('student', student['id'])}
+
+# section → (builder(conn, student), table whose columns it returns, computed fields)
+BUNDLE_SECTIONS = {
+    'summary'       : (_summary_section, None,
+                       ('student','total_subjects','cgpa','low_attendance_count','low_attendance_subjects')),
+    'attendance'    : (lambda conn, s: _attendance_rows(conn, s['id']), 'attendance',       ('classes_needed',)),
+    'marks'         : (lambda conn, s: _marks_rows(conn, s['id']),      'marks',            ()),
+    'timetable'     : (lambda conn, s: _timetable_rows(conn, s['id']),  'timetable',        ()),
+    'timetable_grid': (_timetable_grid_section, None,                   ('days','slots','grid','slot','now','next')),
+    'exams'         : (lambda conn, s: _exam_rows(conn, s['semester']), 'exam_schedule',    ()),
+    'fees'          : (lambda conn, s: _fees_row(conn, s['id']),        'fees',             ()),
+    'outpasses'     : (lambda conn, s: _outpass_history(conn, s['id']), 'outpass_requests', ('approval_trail','current_stage')),
+    'onduty'        : (lambda conn, s: _onduty_rows(conn, s['id']),     'onduty_requests',  ()),
+    'helpdesk'      : (lambda conn, s: _ticket_rows(conn, s['id']),     'helpdesk_tickets', ()),
+}
+_bundle_fields = {}
+
+def _section_fields(conn, name):
+    if not _bundle_fields:
+        tables  = {table for _, table, _ in BUNDLE_SECTIONS.values() if table}
+        columns = {}
+        for table, column in conn.execute(f'''
+                SELECT m.name, p.name FROM sqlite_master m, pragma_table_info(m.name) p
+                WHERE m.name IN ({','.join('?' * len(tables))})''', sorted(tables)):
+            columns.setdefault(table, set()).add(column)
+        _bundle_fields.update({n: columns.get(table, set()) | set(extra)
+                               for n, (_, table, extra) in BUNDLE_SECTIONS.items()})
+    return _bundle_fields[name]
+
+def _project(value, fields):
+    if isinstance(value, list):
+        return [{k: r[k] for k in fields if k in r} for r in value]
+    if isinstance(value, dict):
+        return {k: value[k] for k in fields if k in value}
+    return value
+
+@app.route('/api/student/<int:student_id>/bundle')
+def student_bundle(student_id):
+    names   = [n for n in request.args.get('sections', ','.join(BUNDLE_SECTIONS)).split(',') if n]
+    fields  = {key[7:-1]: [f for f in value.split(',') if f] for key, value in request.args.items()
+               if key.startswith('fields[') and key.endswith(']')}
+    unknown = [n for n in names + list(fields) if n not in BUNDLE_SECTIONS]
+    if unknown or not names:
+        error = f"Unknown sections: {','.join(unknown)}" if unknown else 'Pass at least one section'
+        return jsonify({'error': error, 'sections': list(BUNDLE_SECTIONS)}), 400
+
+    conn = get_db()
+    try:
+        for name, wanted in fields.items():
+            bad = [f for f in wanted if f not in _section_fields(conn, name)]
+            if bad:
+                return jsonify({'error': f"Unknown fields for {name}: {','.join(bad)}",
+                                'fields': sorted(_section_fields(conn, name))}), 400
+        conn.execute('BEGIN')          # one snapshot for every section
+        student = _student_profile(conn, student_id)
+        if not student:
+            return jsonify({'error': 'Not found'}), 404
+        result = {}
+        for name in dict.fromkeys(names):
+            value = BUNDLE_SECTIONS[name][0](conn, student)
+            result[name] = _project(value, fields[name]) if fields.get(name) else value
+    finally:
+        conn.rollback()
+        conn.close()
+    return jsonify(result)
+
+# ─── TIMETABLE GRIDS / NOW-NEXT / CLASHES ──────────────────────────────
+# Served from the in-memory TimetableIndex (refreshed when the timetable changes).
+# `at` (ISO datetime) overrides "now" for the now/next lookups.
+TIMETABLE = timetable_index.TimetableIndex()
+
+def _timetable():
+    conn = get_db()
+    try:
+        TIMETABLE.refresh(conn)
+    finally:
+        conn.close()
+    return TIMETABLE
+
+def _at_param():
+    at = request.args.get('at')
+    if not at:
+        return None, None
+    try:
+        return datetime.datetime.fromisoformat(at), None
+    except ValueError:
+        return None, (jsonify({'error': 'at must be an ISO datetime, e.g. 2024-11-04T09:15'}), 400)
+
+def _grid_response(kind, key):
+    when, err = _at_param()
+    if err:
+        return err
+    tt   = _timetable()
+    grid = tt.grid(kind, key)
+    if grid is None:
+        return jsonify({'error': f'No timetable for {kind} {key}'}), 404
+    return jsonify({'days': timetable_index.DAYS, 'slots': timetable_index.SLOTS, 'grid': grid,
+                    **tt.now_next(kind, key, when)})
+
+@app.route('/api/timetable/<int:student_id>/grid')
+def student_timetable_grid(student_id):
+    return _grid_response('student', student_id)
+
+@app.route('/api/timetable/room/<path:room>')
+def room_timetable(room):
+    return _grid_response('room', room)
+
+@app.route('/api/timetable/teacher/<path:teacher_name>')
+def teacher_timetable(teacher_name):
+    return _grid_response('teacher', teacher_name)
+
+@app.route('/api/timetable/now')
+def timetable_now():
+    """?student_id= | room= | teacher= → the current and next class (room: free now or not)."""
+    when, err = _at_param()
+    if err:
+        return err
+    for kind, arg in (('student', 'student_id'), ('room', 'room'), ('teacher', 'teacher')):
+        key = request.args.get(arg)
+        if key:
+            break
+    else:
+        return jsonify({'error': 'Pass student_id, room or teacher'}), 400
+    if kind == 'student':
+        if not key.isdigit():
+            return jsonify({'error': 'student_id must be a number'}), 400
+        key = int(key)
+    tt     = _timetable()
+    result = {kind: key, **tt.now_next(kind, key, when)}
+    if kind == 'room':
+        result['free'] = not result['now']
+    return jsonify(result)
+
+@app.route('/api/timetable/clashes')
+def timetable_clashes():
+    kind = request.args.get('kind', 'room')
+    if kind not in ('student', 'room', 'teacher'):
+        return jsonify({'error': 'kind must be student, room or teacher'}), 400
+    rows = _timetable().clashes(kind)
+    return jsonify({'kind': kind, 'count': len(rows), 'clashes': rows})
+
+@app.route('/api/system/timetable')
+def timetable_stats():
+    return jsonify(_timetable().stats())
 
 # ─── OUTPASS — 4-STAGE FLOW ────────────────────────────────────────────
 # Stage flow: Faculty Advisor → Hostel Coordinator → HOD → Warden
@@ -446,22 +664,27 @@ def submit_outpass():
     if not student or not student.get('is_hosteler'):
         conn.close()
         return jsonify({'success':False,'message':'Non-hostelers cannot apply for outpass.'}), 400
-    conn.execute('''INSERT INTO outpass_requests
+    cur = conn.execute('''INSERT INTO outpass_requests
         (student_id,reason,destination,out_date,out_time,return_date,return_time,
          stage,overall_status,faculty_status,hostel_coord_status,hod_status,warden_status)
         VALUES (?,?,?,?,?,?,?,"Faculty Advisor","Pending","Pending","Waiting","Waiting","Waiting")''',
         (d.get('student_id'),d.get('reason'),d.get('destination'),
          d.get('out_date'),d.get('out_time'),d.get('return_date'),d.get('return_time')))
-    conn.commit(); conn.close()
+    conn.commit()
+    _publish_outpass(conn, [cur.lastrowid], 'created')
+    conn.close()
     return jsonify({'success':True,'message':'Outpass submitted! Waiting for Faculty Advisor approval.'})
 
 
 @app.route('/api/outpass/student/<int:student_id>')
 def get_student_outpasses(student_id):
     conn = get_db()
+    rows = _outpass_history(conn, student_id)
+    conn.close(); return jsonify(rows)
+
+def _outpass_history(conn, student_id):
     rows = [dict(r) for r in conn.execute(
         'SELECT * FROM outpass_requests WHERE student_id=? ORDER BY submitted_at DESC',(student_id,)).fetchall()]
-    conn.close()
     # Build a readable approval trail for each request
     for r in rows:
         trail = []
@@ -495,131 +718,221 @@ def get_student_outpasses(student_id):
 
         r['approval_trail'] = trail
         r['current_stage']  = r['stage']
-    return jsonify(rows)
+    return rows
 
 
-# Teacher sees outpass pending for their role + student attendance
-@app.route('/api/teacher/outpass/pending')
-def pending_outpass():
-    conn = get_db()
-    # Get all pending at each stage, joined with student attendance
-    rows = [dict(r) for r in conn.execute('''
-        SELECT o.*, s.name, s.reg_no, s.department, s.year, s.section
-        FROM outpass_requests o JOIN students s ON o.student_id=s.id
-        WHERE o.overall_status="Pending"
-        ORDER BY o.submitted_at DESC
-    ''').fetchall()]
+# Stage filter values accepted by /api/teacher/outpass/pending → outpass_flow.STAGES key
+OUTPASS_STAGES = {
+    'faculty': 'faculty', 'faculty advisor': 'faculty',
+    'hostel': 'hostel', 'hostel coordinator': 'hostel',
+    'hod': 'hod',
+    'warden': 'warden', 'hostel warden': 'warden',
+}
 
-    # Attach student attendance to each row so teacher can decide
+def _encode_cursor(*parts):
+    return base64.urlsafe_b64encode(json.dumps(parts).encode()).decode()
+
+def _decode_cursor(cursor):
+    """The (submitted_at, id) pair from _encode_cursor, or None for anything else (callers answer 400)."""
+    try:
+        after = json.loads(base64.urlsafe_b64decode(cursor.encode()))
+    except Exception:
+        return None
+    if (isinstance(after, list) and len(after) == 2 and isinstance(after[0], str)
+            and isinstance(after[1], int) and not isinstance(after[1], bool)):
+        return after
+    return None
+
+def _attendance_by_student(conn, student_ids):
+    """One set-based attendance read for many students → {student_id: [{subject, percentage}]}."""
+    grouped = {sid: [] for sid in student_ids}
+    for a in conn.execute(
+            'SELECT student_id,subject,percentage FROM attendance '
+            'WHERE student_id IN (SELECT value FROM json_each(?))', (json.dumps(list(grouped)),)):
+        grouped[a['student_id']].append({'subject': a['subject'], 'percentage': a['percentage']})
+    return grouped
+
+
+def _with_attendance(conn, rows, risk=False):
+    """Attach student attendance (and optionally the risk score) to each outpass row so the teacher can decide."""
+    att_by_student = _attendance_by_student(conn, {r['student_id'] for r in rows})
     for r in rows:
-        att = [dict(a) for a in conn.execute(
-            'SELECT subject,percentage FROM attendance WHERE student_id=?',(r['student_id'],)).fetchall()]
+        att = att_by_student[r['student_id']]
         low = [a for a in att if a['percentage'] < 75]
         r['attendance_summary'] = att
         r['low_attendance']     = low
         r['can_approve']        = len(low) == 0  # suggestion only, teacher decides
+        if risk:
+            report = outpass_risk.score(r['reason'], r['destination'], r['out_time'], len(low))
+            r['risk_score']    = report['risk_score']
+            r['risk_level']    = report['risk_level']
+            r['risk_decision'] = report['decision']
+            r['risk_factors']  = report['risk_factors']
+    return rows
+
+def _outpass_rows(conn, ids, risk=False):
+    """Outpass rows for ``ids`` (in that order) in the /api/teacher/outpass/pending shape."""
+    by_id = {r['id']: dict(r) for r in conn.execute('''
+        SELECT o.*, s.name, s.reg_no, s.department, s.year, s.section
+        FROM outpass_requests o JOIN students s ON o.student_id=s.id
+        WHERE o.id IN (SELECT value FROM json_each(?))''', (json.dumps(list(ids)),))}
+    return _with_attendance(conn, [by_id[i] for i in ids if i in by_id], risk)
+
+def _publish_outpass(conn, ids, type):
+    """Push the changed outpass rows (with risk score) to live subscribers."""
+    events.publish_many('outpass', type, _outpass_rows(conn, ids, risk=True))
 
-    conn.close()
-    return jsonify(rows)
 
+# Teacher sees outpass pending for their role + student attendance
+# Optional query params: stage, department, limit, cursor (next page in X-Next-Cursor),
+# risk=1 (adds risk_score/risk_level/risk_decision/risk_factors to every row).
+# With a stage the rows come from that stage's work queue (outpass_queue).
+@app.route('/api/teacher/outpass/pending')
+def pending_outpass():
+    stage = request.args.get('stage', '').strip().lower()
+    if stage and stage not in OUTPASS_STAGES:
+        return jsonify({'error': f'Unknown stage: {stage}'}), 400
+    department = request.args.get('department')
+    after  = None
+    cursor = request.args.get('cursor')
+    if cursor:
+        after = _decode_cursor(cursor)
+        if not after:
+            return jsonify({'error': 'Invalid cursor'}), 400
+    limit = request.args.get('limit', type=int)
+    if limit:
+        limit = max(1, min(limit, 500))
+    risk = request.args.get('risk', '').lower() in ('1', 'true', 'yes')
 
-def _approve_stage(oid, stage_col, next_stage_col, next_stage_name, approver_name, final=False):
-    """Helper: advance one stage in the 4-stage outpass flow."""
     conn = get_db()
-    if final:
-        conn.execute(f'''UPDATE outpass_requests SET
-            {stage_col}_status="Approved", {stage_col}_approved_by=?,
-            {stage_col}_approved_at=CURRENT_TIMESTAMP,
-            overall_status="Approved", stage="Completed"
-            WHERE id=?''', (approver_name, oid))
+    if stage:
+        ids  = outpass_flow.queue_ids(conn, OUTPASS_STAGES[stage], department, limit and limit + 1, after)
+        rows = _outpass_rows(conn, ids, risk)
     else:
-        conn.execute(f'''UPDATE outpass_requests SET
-            {stage_col}_status="Approved", {stage_col}_approved_by=?,
-            {stage_col}_approved_at=CURRENT_TIMESTAMP,
-            {next_stage_col}_status="Pending",
-            stage=?
-            WHERE id=?''', (approver_name, next_stage_name, oid))
-    conn.commit(); conn.close()
+        where, params = ['o.overall_status="Pending"'], []
+        if department:
+            where.append('s.department=?'); params.append(department)
+        if after:
+            where.append('(o.submitted_at, o.id) < (?, ?)'); params.extend(after)
+        rows = [dict(r) for r in conn.execute(f'''
+            SELECT o.*, s.name, s.reg_no, s.department, s.year, s.section
+            FROM outpass_requests o JOIN students s ON o.student_id=s.id
+            WHERE {' AND '.join(where)}
+            ORDER BY o.submitted_at DESC, o.id DESC
+            {'LIMIT ?' if limit else ''}
+        ''', params + ([limit + 1] if limit else [])).fetchall()]
+        _with_attendance(conn, rows, risk)
+    conn.close()
+    next_cursor = None
+    if limit and len(rows) > limit:
+        rows = rows[:limit]
+        next_cursor = _encode_cursor(rows[-1]['submitted_at'], rows[-1]['id'])
+
+    resp = jsonify(rows)
+    if next_cursor:
+        resp.headers['X-Next-Cursor'] = next_cursor
+    return resp
+
+@app.route('/api/teacher/outpass/queues')
+def outpass_queue_counts():
+    """Pending count per stage and department."""
+    conn = get_db()
+    counts = outpass_flow.queue_counts(conn)
+    conn.close(); return jsonify(counts)
 
 
-def _reject_stage(oid, stage_col, approver_name):
+def _transition(stage, action, ids, approver):
+    """Apply one compare-and-set transition to ``ids`` in a single transaction → (moved, skipped)."""
     conn = get_db()
-    conn.execute(f'''UPDATE outpass_requests SET
-        {stage_col}_status="Rejected", {stage_col}_approved_by=?,
-        {stage_col}_approved_at=CURRENT_TIMESTAMP,
-        overall_status="Rejected"
-        WHERE id=?''', (approver_name, oid))
-    conn.commit(); conn.close()
+    try:
+        moved = outpass_flow.transition(conn, stage, action, ids, approver)
+        conn.commit()
+        _publish_outpass(conn, moved, 'updated')
+    finally:
+        conn.close()
+    return moved, [i for i in dict.fromkeys(ids) if i not in moved]
+
+
+def _stage_action(oid, stage, action, default_name, message):
+    """Single-request approve/reject; 409 when the request is no longer waiting at ``stage``."""
+    d = request.json or {}
+    moved, _ = _transition(stage, action, [oid], d.get('teacher_name', default_name))
+    if not moved:
+        return jsonify({'success': False, 'message':
+                        f'Outpass #{oid} is not waiting for {outpass_flow.STAGES[stage].label} — '
+                        f'it was already processed or is at another stage.'}), 409
+    return jsonify({'success': True, 'message': message})
 
 
 # Stage 1: Faculty Advisor
 @app.route('/api/teacher/outpass/faculty/approve/<int:oid>', methods=['POST'])
 def faculty_approve_outpass(oid):
-    d = request.json or {}
-    _approve_stage(oid,'faculty','hostel_coord','Hostel Coordinator',d.get('teacher_name','Faculty'))
-    return jsonify({'success':True,'message':'Approved! Moved to Hostel Coordinator.'})
+    return _stage_action(oid, 'faculty', 'approve', 'Faculty', 'Approved! Moved to Hostel Coordinator.')
 
 @app.route('/api/teacher/outpass/faculty/reject/<int:oid>', methods=['POST'])
 def faculty_reject_outpass(oid):
-    d = request.json or {}
-    _reject_stage(oid,'faculty',d.get('teacher_name','Faculty'))
-    return jsonify({'success':True,'message':'Outpass rejected at Faculty Advisor stage.'})
+    return _stage_action(oid, 'faculty', 'reject', 'Faculty', 'Outpass rejected at Faculty Advisor stage.')
 
 
 # Stage 2: Hostel Coordinator
 @app.route('/api/teacher/outpass/hostel/approve/<int:oid>', methods=['POST'])
 def hostel_approve_outpass(oid):
-    d = request.json or {}
-    _approve_stage(oid,'hostel_coord','hod','HOD',d.get('teacher_name','Hostel Coordinator'))
-    return jsonify({'success':True,'message':'Approved! Moved to HOD.'})
+    return _stage_action(oid, 'hostel', 'approve', 'Hostel Coordinator', 'Approved! Moved to HOD.')
 
 @app.route('/api/teacher/outpass/hostel/reject/<int:oid>', methods=['POST'])
 def hostel_reject_outpass(oid):
-    d = request.json or {}
-    _reject_stage(oid,'hostel_coord',d.get('teacher_name','Hostel Coordinator'))
-    return jsonify({'success':True,'message':'Outpass rejected at Hostel Coordinator stage.'})
+    return _stage_action(oid, 'hostel', 'reject', 'Hostel Coordinator', 'Outpass rejected at Hostel Coordinator stage.')
 
 
 # Stage 3: HOD
 @app.route('/api/teacher/outpass/hod/approve/<int:oid>', methods=['POST'])
 def hod_approve_outpass(oid):
-    d = request.json or {}
-    _approve_stage(oid,'hod','warden','Hostel Warden',d.get('teacher_name','HOD'))
-    return jsonify({'success':True,'message':'Approved! Moved to Hostel Warden.'})
+    return _stage_action(oid, 'hod', 'approve', 'HOD', 'Approved! Moved to Hostel Warden.')
 
 @app.route('/api/teacher/outpass/hod/reject/<int:oid>', methods=['POST'])
 def hod_reject_outpass(oid):
-    d = request.json or {}
-    _reject_stage(oid,'hod',d.get('teacher_name','HOD'))
-    return jsonify({'success':True,'message':'Outpass rejected at HOD stage.'})
+    return _stage_action(oid, 'hod', 'reject', 'HOD', 'Outpass rejected at HOD stage.')
 
 
 # Stage 4: Warden (Final)
 @app.route('/api/teacher/outpass/warden/approve/<int:oid>', methods=['POST'])
 def warden_approve_outpass(oid):
-    d = request.json or {}
-    _approve_stage(oid,'warden',None,None,d.get('teacher_name','Warden'),final=True)
-    return jsonify({'success':True,'message':'FINAL APPROVED by Warden! Outpass granted.'})
+    return _stage_action(oid, 'warden', 'approve', 'Warden', 'FINAL APPROVED by Warden! Outpass granted.')
 
 @app.route('/api/teacher/outpass/warden/reject/<int:oid>', methods=['POST'])
 def warden_reject_outpass(oid):
-    d = request.json or {}
-    _reject_stage(oid,'warden',d.get('teacher_name','Warden'))
-    return jsonify({'success':True,'message':'Outpass rejected at Warden stage.'})
+    return _stage_action(oid, 'warden', 'reject', 'Warden', 'Outpass rejected at Warden stage.')
+
+
+# Bulk: {"ids": [...], "teacher_name": "..."} → every id that is still waiting at this stage moves, in one transaction
+@app.route('/api/teacher/outpass/<stage>/bulk/<action>', methods=['POST'])
+def bulk_outpass(stage, action):
+    d   = request.json or {}
+    ids = d.get('ids')
+    if stage not in outpass_flow.STAGES or action not in ('approve', 'reject'):
+        return jsonify({'success': False, 'message': f'Unknown stage/action: {stage}/{action}'}), 404
+    if not isinstance(ids, list) or not ids or not all(isinstance(i, int) for i in ids):
+        return jsonify({'success': False, 'message': 'ids must be a non-empty list of outpass ids.'}), 400
+    if len(ids) > outpass_flow.MAX_BULK:
+        return jsonify({'success': False, 'message': f'At most {outpass_flow.MAX_BULK} ids per request.'}), 400
+    moved, skipped = _transition(stage, action, ids, d.get('teacher_name', outpass_flow.STAGES[stage].label))
+    return jsonify({'success': True, 'processed': moved, 'skipped': skipped,
+                    'message': f"{len(moved)} outpass(es) {'approved' if action == 'approve' else 'rejected'}, "
+                               f"{len(skipped)} skipped."})
 
 
 # Legacy approve/reject (kept for backward compat)
 @app.route('/api/teacher/outpass/approve/<int:oid>', methods=['POST'])
 def approve_outpass(oid):
     d = request.json or {}
-    _approve_stage(oid,'faculty','hostel_coord','Hostel Coordinator',d.get('teacher_name','Faculty'))
-    return jsonify({'success':True})
+    moved, _ = _transition('faculty', 'approve', [oid], d.get('teacher_name','Faculty'))
+    return jsonify({'success': bool(moved)}), 200 if moved else 409
 
 @app.route('/api/teacher/outpass/reject/<int:oid>', methods=['POST'])
 def reject_outpass(oid):
     d = request.json or {}
-    _reject_stage(oid,'faculty',d.get('teacher_name','Faculty'))
-    return jsonify({'success':True})
+    moved, _ = _transition('faculty', 'reject', [oid], d.get('teacher_name','Faculty'))
+    return jsonify({'success': bool(moved)}), 200 if moved else 409
 
 
 # ─── ON-DUTY ───────────────────────────────────────────────────────────
@@ -627,18 +940,26 @@ def reject_outpass(oid):
 def submit_onduty():
     d = request.json or {}
     conn = get_db()
-    conn.execute('INSERT INTO onduty_requests (student_id,event_name,date,description) VALUES (?,?,?,?)',
-                 (d.get('student_id'),d.get('event_name'),d.get('date'),d.get('description','')))
-    conn.commit(); conn.close()
+    cur = conn.execute('INSERT INTO onduty_requests (student_id,event_name,date,description) VALUES (?,?,?,?)',
+                       (d.get('student_id'),d.get('event_name'),d.get('date'),d.get('description','')))
+    conn.commit()
+    row = conn.execute('''SELECT o.*,s.name,s.reg_no FROM onduty_requests o
+        JOIN students s ON o.student_id=s.id WHERE o.id=?''', (cur.lastrowid,)).fetchone()
+    conn.close()
+    if row:
+        events.publish('onduty', 'created', dict(row))
     return jsonify({'success':True,'message':'On-Duty request submitted!'})
 
 @app.route('/api/onduty/student/<int:student_id>')
 def get_student_onduty(student_id):
     conn = get_db()
-    rows = [dict(r) for r in conn.execute(
-        'SELECT * FROM onduty_requests WHERE student_id=? ORDER BY submitted_at DESC',(student_id,)).fetchall()]
+    rows = _onduty_rows(conn, student_id)
     conn.close(); return jsonify(rows)
 
+def _onduty_rows(conn, student_id):
+    return [dict(r) for r in conn.execute(
+        'SELECT * FROM onduty_requests WHERE student_id=? ORDER BY submitted_at DESC',(student_id,)).fetchall()]
+
 @app.route('/api/teacher/onduty/pending')
 def pending_onduty():
     conn = get_db()
@@ -652,8 +973,10 @@ def pending_onduty():
 @app.route('/api/teacher/onduty/approve/<int:oid>', methods=['POST'])
 def approve_onduty(oid):
     conn = get_db()
-    conn.execute('UPDATE onduty_requests SET status="Approved" WHERE id=?',(oid,))
+    cur = conn.execute('UPDATE onduty_requests SET status="Approved" WHERE id=?',(oid,))
     conn.commit(); conn.close()
+    if cur.rowcount:
+        events.publish('onduty', 'updated', {'id': oid, 'status': 'Approved'})
     return jsonify({'success':True,'message':'On-Duty approved!'})
 
 # ─── HELP DESK ─────────────────────────────────────────────────────────
@@ -661,26 +984,177 @@ def approve_onduty(oid):
 def submit_ticket():
     d = request.json or {}
     conn = get_db()
-    conn.execute('INSERT INTO helpdesk_tickets (student_id,category,subject,description) VALUES (?,?,?,?)',
-                 (d.get('student_id'),d.get('category'),d.get('subject'),d.get('description')))
-    conn.commit(); conn.close()
+    cur = conn.execute('INSERT INTO helpdesk_tickets (student_id,category,subject,description) VALUES (?,?,?,?)',
+                       (d.get('student_id'),d.get('category'),d.get('subject'),d.get('description')))
+    conn.commit()
+    row = conn.execute('''SELECT h.*,s.name,s.reg_no FROM helpdesk_tickets h
+        JOIN students s ON h.student_id=s.id WHERE h.id=?''', (cur.lastrowid,)).fetchone()
+    conn.close()
+    if row:
+        events.publish('helpdesk', 'created', dict(row))
     return jsonify({'success':True,'message':'Ticket raised successfully!'})
 
 @app.route('/api/helpdesk/student/<int:student_id>')
 def get_student_tickets(student_id):
     conn = get_db()
-    rows = [dict(r) for r in conn.execute(
-        'SELECT * FROM helpdesk_tickets WHERE student_id=? ORDER BY submitted_at DESC',(student_id,)).fetchall()]
+    rows = _ticket_rows(conn, student_id)
     conn.close(); return jsonify(rows)
 
+def _ticket_rows(conn, student_id):
+    return [dict(r) for r in conn.execute(
+        'SELECT * FROM helpdesk_tickets WHERE student_id=? ORDER BY submitted_at DESC',(student_id,)).fetchall()]
+
+# Filters shared by the ticket list, counts and export:
+#   category, status, department, student_id, from / to (YYYY-MM-DD, inclusive)
+HELPDESK_EXPORT_FIELDS = ['id','student_id','reg_no','name','department','category','subject','description',
+                          'status','submitted_at']
+
+def _ticket_filters(args):
+    """(where clauses, params) for the helpdesk filters in ``args``, or (None, error message)."""
+    where, params = [], []
+    for col in ('category', 'status'):
+        if args.get(col):
+            where.append(f'h.{col}=?'); params.append(args[col])
+    if args.get('student_id'):
+        if not args['student_id'].isdigit():
+            return None, 'student_id must be a number'
+        where.append('h.student_id=?'); params.append(int(args['student_id']))
+    if args.get('department'):
+        where.append('h.student_id IN (SELECT id FROM students WHERE department=?)'); params.append(args['department'])
+    for key, op, bound in (('from', '>=', '?'), ('to', '<', "date(?, '+1 day')")):
+        if args.get(key):
+            try:
+                datetime.date.fromisoformat(args[key])
+            except ValueError:
+                return None, f'{key} must be a YYYY-MM-DD date'
+            where.append(f'h.submitted_at {op} {bound}'); params.append(args[key])
+    return where, params
+
+# Newest first, keyset-paginated: limit (default 100, max 500), cursor from X-Next-Cursor
 @app.route('/api/teacher/helpdesk/all')
 def all_tickets():
+    where, params = _ticket_filters(request.args)
+    if where is None:
+        return jsonify({'error': params}), 400
+    cursor = request.args.get('cursor')
+    if cursor:
+        after = _decode_cursor(cursor)
+        if not after:
+            return jsonify({'error': 'Invalid cursor'}), 400
+        where.append('(h.submitted_at, h.id) < (?, ?)'); params.extend(after)
+    limit = max(1, min(request.args.get('limit', 100, type=int), 500))
+
     conn = get_db()
-    rows = [dict(r) for r in conn.execute('''
+    rows = [dict(r) for r in conn.execute(f'''
         SELECT h.*,s.name,s.reg_no FROM helpdesk_tickets h
-        JOIN students s ON h.student_id=s.id ORDER BY h.submitted_at DESC
-    ''').fetchall()]
-    conn.close(); return jsonify(rows)
+        JOIN students s ON h.student_id=s.id
+        {'WHERE ' + ' AND '.join(where) if where else ''}
+        ORDER BY h.submitted_at DESC, h.id DESC LIMIT ?
+    ''', params + [limit + 1]).fetchall()]
+    conn.close()
+    resp = jsonify(rows[:limit])
+    if len(rows) > limit:
+        resp.headers['X-Next-Cursor'] = _encode_cursor(rows[limit-1]['submitted_at'], rows[limit-1]['id'])
+    return resp
+
+@app.route('/api/teacher/helpdesk/counts')
+def ticket_counts():
+    """Ticket totals by status, by category and by both, from one grouped query (same filters as /all)."""
+    where, params = _ticket_filters(request.args)
+    if where is None:
+        return jsonify({'error': params}), 400
+    conn = get_db()
+    groups = conn.execute(f'''SELECT h.category, h.status, COUNT(*) FROM helpdesk_tickets h
+        {'WHERE ' + ' AND '.join(where) if where else ''} GROUP BY h.category, h.status''', params).fetchall()
+    conn.close()
+    out = {'total': 0, 'by_status': {}, 'by_category': {}, 'by_category_status': {}}
+    for category, status, n in groups:
+        category, status = category or '', status or ''
+        out['total'] += n
+        out['by_status'][status]     = out['by_status'].get(status, 0) + n
+        out['by_category'][category] = out['by_category'].get(category, 0) + n
+        out['by_category_status'].setdefault(category, {})[status] = n
+    return jsonify(out)
+
+@app.route('/api/teacher/helpdesk/export')
+def export_tickets():
+    """Stream every matching ticket as NDJSON (default) or CSV, rows written as they are read."""
+    fmt = request.args.get('format', 'ndjson').lower()
+    if fmt not in ('ndjson', 'csv'):
+        return jsonify({'error': 'format must be ndjson or csv'}), 400
+    where, params = _ticket_filters(request.args)
+    if where is None:
+        return jsonify({'error': params}), 400
+    sql = f'''SELECT h.id,h.student_id,s.reg_no,s.name,s.department,h.category,h.subject,h.description,
+                      h.status,h.submitted_at
+               FROM helpdesk_tickets h JOIN students s ON h.student_id=s.id
+               {'WHERE ' + ' AND '.join(where) if where else ''}
+               ORDER BY h.submitted_at DESC, h.id DESC'''
+
+    def rows():
+        conn = get_db()
+        try:
+            cur = conn.execute(sql, params)
+            while True:
+                batch = cur.fetchmany(500)
+                if not batch:
+                    break
+                yield batch
+        finally:
+            conn.close()
+
+    def ndjson():
+        for batch in rows():
+            yield ''.join(json.dumps(dict(r)) + '\n' for r in batch)
+
+    def csv_lines():
+        buf = io.StringIO()
+        out = csv.writer(buf)
+        out.writerow(HELPDESK_EXPORT_FIELDS)
+        for batch in rows():
+            out.writerows(tuple(r) for r in batch)
+            yield buf.getvalue()
+            buf.seek(0); buf.truncate()
+        yield buf.getvalue()
+
+    stamp = datetime.date.today().isoformat()
+    if fmt == 'csv':
+        return Response(csv_lines(), mimetype='text/csv',
+                        headers={'Content-Disposition': f'attachment; filename=helpdesk-{stamp}.csv'})
+    return Response(ndjson(), mimetype='application/x-ndjson',
+                    headers={'Content-Disposition': f'attachment; filename=helpdesk-{stamp}.ndjson'})
+
+# ─── COHORT ANALYTICS (HOD dashboards) ────────────────────────────────
+# Department / semester reports from columnar copies of attendance and marks,
+# cached until the 'cohort' data version moves.
+COHORT = cohort_analytics.CohortAnalytics()
+
+def _cohort():
+    conn = get_db()
+    try:
+        COHORT.refresh(conn)
+    finally:
+        conn.close()
+    return COHORT
+
+@app.route('/api/teacher/analytics/cohort')
+def cohort_report():
+    """?department=CSE&semester=5&limit=50 → attendance/marks distributions, detentions and at-risk students."""
+    department = request.args.get('department') or None
+    semester   = request.args.get('semester', type=int)
+    limit      = max(0, min(request.args.get('limit', 50, type=int), 1000))
+    result     = _cohort().report(department, semester, limit)
+    if result is None:
+        return jsonify({'error': 'No students in this cohort'}), 404
+    return jsonify(result)
+
+@app.route('/api/teacher/analytics/departments')
+def cohort_departments():
+    return jsonify(_cohort().departments())
+
+@app.route('/api/system/analytics')
+def cohort_stats():
+    return jsonify(_cohort().stats())
 
 # ─── TEACHER STATUS ────────────────────────────────────────────────────
 @app.route('/api/teacher/status/update', methods=['POST'])
@@ -693,19 +1167,25 @@ def update_teacher_status():
         available_from=excluded.available_from, available_to=excluded.available_to''',
         (d.get('teacher_id'),d.get('status','In Office'),d.get('location',''),
          d.get('available_from',''),d.get('available_to','')))
-    conn.commit(); conn.close()
+    conn.commit()
+    row = conn.execute('''SELECT ts.teacher_id,t.name,t.department,t.office_room,
+               ts.current_status,ts.location,ts.available_from,ts.available_to
+        FROM teacher_status ts JOIN teachers t ON t.id=ts.teacher_id WHERE ts.teacher_id=?''',
+        (d.get('teacher_id'),)).fetchone()
+    conn.close()
+    if row:
+        events.publish('teacher_status', 'updated', dict(row))
     return jsonify({'success':True,'message':'Status updated!'})
 
+FACULTY_INDEX = faculty_index.FacultyIndex()
+
 @app.route('/api/teacher/find/<teacher_name>')
 def find_teacher(teacher_name):
-    conn     = get_db()
-    teachers = [dict(r) for r in conn.execute(
-        "SELECT * FROM teachers WHERE LOWER(name) LIKE ?",(f'%{teacher_name.lower()}%',)).fetchall()]
-    result = []
-    for t in teachers:
-        st    = row_to_dict(conn.execute('SELECT * FROM teacher_status WHERE teacher_id=?',(t['id'],)).fetchone())
-        roles = [dict(r) for r in conn.execute('SELECT * FROM faculty_roles WHERE teacher_id=?',(t['id'],)).fetchall()]
-        result.append({**t,'status':st or {},'roles':roles})
+    """Prefix/typo-tolerant name search; honorifics like "Dr." or "sir" are ignored."""
+    conn = get_db()
+    FACULTY_INDEX.refresh(conn)
+    ids    = [tid for tid, _ in FACULTY_INDEX.search(teacher_name, limit=50)]
+    result = faculty_index.details(conn, ids)
     conn.close(); return jsonify(result)
 
 @app.route('/api/faculty/roles')
@@ -722,37 +1202,21 @@ def all_faculty_roles():
 # ─── CHATBOT — FULLY UPGRADED ──────────────────────────────────────────
 
 
-def build_full_student_context(student_id):
-    """Pull ALL student data from DB and format it as a readable context string."""
-    conn = get_db()
-    try:
-        student = row_to_dict(conn.execute('SELECT * FROM students WHERE id=?',(student_id,)).fetchone())
-        att     = [dict(r) for r in conn.execute('SELECT * FROM attendance WHERE student_id=?',(student_id,)).fetchall()]
-        marks   = [dict(r) for r in conn.execute('SELECT * FROM marks WHERE student_id=?',(student_id,)).fetchall()]
-        fees    = row_to_dict(conn.execute('SELECT * FROM fees WHERE student_id=?',(student_id,)).fetchone())
-        tt      = [dict(r) for r in conn.execute('SELECT * FROM timetable WHERE student_id=? ORDER BY day,time_slot',(student_id,)).fetchall()]
-        exams   = [dict(r) for r in conn.execute('SELECT * FROM exam_schedule WHERE semester=?',(student.get('semester',4),)).fetchall()]
-        outpass = [dict(r) for r in conn.execute('SELECT * FROM outpass_requests WHERE student_id=? ORDER BY submitted_at DESC LIMIT 5',(student_id,)).fetchall()]
-        teachers = [dict(r) for r in conn.execute('''
-            SELECT t.name,t.designation,t.office_room,ts.current_status,ts.location,
-                   ts.available_from,ts.available_to,fr.role_name
-            FROM teachers t
-            LEFT JOIN teacher_status ts ON t.id=ts.teacher_id
-            LEFT JOIN faculty_roles fr ON t.id=fr.teacher_id
-        ''').fetchall()]
-    finally:
-        conn.close()
-
+def _student_context_sections(conn, student_id):
+    """Pull the student's own data from DB and format each part as a context section."""
+    student = row_to_dict(conn.execute('SELECT * FROM students WHERE id=?',(student_id,)).fetchone())
     if not student:
-        return ""
-
-    # ── Calculate CGPA ──────────────────────────────────────────────
-    gp = {'A+':10,'A':9,'B+':8,'B':7,'C':6}
-    tc = sum(m['credits'] for m in marks)
-    cgpa = round(sum(gp.get(m['grade'],7)*m['credits'] for m in marks)/tc,2) if tc else 0
-
-    # ── Build context string ─────────────────────────────────────────
-    ctx = f"""
+        return None
+    att     = [dict(r) for r in conn.execute('SELECT * FROM attendance WHERE student_id=? ORDER BY id',(student_id,)).fetchall()]
+    marks   = [dict(r) for r in conn.execute('SELECT * FROM marks WHERE student_id=? ORDER BY id',(student_id,)).fetchall()]
+    summ    = summary.get_summary(conn, student_id)
+    fees    = row_to_dict(conn.execute('SELECT * FROM fees WHERE student_id=?',(student_id,)).fetchone())
+    tt      = [dict(r) for r in conn.execute('SELECT * FROM timetable WHERE student_id=? ORDER BY COALESCE(day_idx,9),COALESCE(slot_idx,99),time_slot',(student_id,)).fetchall()]
+    exams   = [dict(r) for r in conn.execute('SELECT * FROM exam_schedule WHERE semester=?',(student.get('semester',4),)).fetchall()]
+    outpass = [dict(r) for r in conn.execute('SELECT * FROM outpass_requests WHERE student_id=? ORDER BY submitted_at DESC LIMIT 5',(student_id,)).fetchall()]
+
+    cgpa = summ['cgpa']
+    sections = [('profile', f"""
 === STUDENT PROFILE ===
 Name       : {student['name']}
 Reg No     : {student['reg_no']}
@@ -761,54 +1225,69 @@ Year/Sem   : Year {student['year']}, Semester {student['semester']}
 Section    : {student['section']}
 Hostel     : {student['hostel']} ({'Hosteler' if student.get('is_hosteler') else 'Day Scholar'})
 CGPA       : {cgpa}
+""")]
 
-=== ATTENDANCE (out of 100%) ===
-"""
-    low_subjects = []
+    ctx = "\n=== ATTENDANCE (out of 100%) ===\n"
+    needed_by_id = {a['id']: a['classes_needed'] for a in summ['low_attendance']}
+    low_subjects = [a['subject'] for a in summ['low_attendance']]
     for a in att:
         T,A,pct = a['total_classes'],a['attended_classes'],a['percentage']
-        needed = max(0,int((0.75*T-A)/0.25)+1) if pct<75 else 0
+        needed = needed_by_id.get(a['id'], 0)
         status = "⚠️ BELOW 75%" if pct<75 else "✅ Safe"
         ctx += f"  {a['subject']}: {pct}% ({A}/{T} classes) {status}"
         if needed: ctx += f" — needs {needed} more classes"
         ctx += "\n"
-        if pct<75: low_subjects.append(a['subject'])
-
     if low_subjects:
         ctx += f"\n  *** DETENTION RISK in: {', '.join(low_subjects)} ***\n"
+    sections.append(('attendance', ctx))
 
-    ctx += "\n=== MARKS & GRADES ===\n"
+    ctx = "\n=== MARKS & GRADES ===\n"
     for m in marks:
         ctx += f"  {m['subject']}: {m['total_marks']}/100, Grade {m['grade']}, {m['credits']} credits\n"
     ctx += f"  Overall CGPA: {cgpa}\n"
+    sections.append(('marks', ctx))
 
     if fees:
-        ctx += f"""
+        sections.append(('fees', f"""
 === FEES ===
   Total: Rs.{fees['total_fee']:,.0f}
   Paid : Rs.{fees['paid_amount']:,.0f}
   Due  : Rs.{fees['pending_amount']:,.0f}
   Status: {fees['status']} | Due date: {fees['due_date']}
-"""
+"""))
 
     if tt:
-        ctx += "\n=== TODAY'S TIMETABLE (sample) ===\n"
+        ctx = "\n=== TODAY'S TIMETABLE (sample) ===\n"
         for t in tt[:6]:
             ctx += f"  {t['day']} {t['time_slot']}: {t['subject']} ({t['teacher_name']}) Room {t['room']}\n"
+        sections.append(('timetable', ctx))
 
     if exams:
-        ctx += "\n=== UPCOMING EXAMS ===\n"
+        ctx = "\n=== UPCOMING EXAMS ===\n"
         for e in exams[:5]:
             ctx += f"  {e['subject']}: {e['exam_date']} at {e['time']}, Hall {e['hall']}\n"
+        sections.append(('exams', ctx))
 
     if outpass:
-        ctx += "\n=== RECENT OUTPASS REQUESTS ===\n"
+        ctx = "\n=== RECENT OUTPASS REQUESTS ===\n"
         for o in outpass[:3]:
             ctx += f"  {o['reason']} → {o['destination']} | Status: {o['overall_status']} | Stage: {o['stage']}\n"
+        sections.append(('outpass', ctx))
+    return sections
 
+
+def _faculty_context(conn):
+    """Faculty directory section — identical for every student, so built once per change."""
+    teachers = conn.execute('''
+        SELECT t.name,t.designation,t.office_room,ts.current_status,ts.location,
+               ts.available_from,ts.available_to,fr.role_name
+        FROM teachers t
+        LEFT JOIN teacher_status ts ON t.id=ts.teacher_id
+        LEFT JOIN faculty_roles fr ON t.id=fr.teacher_id
+    ''').fetchall()
     # Deduplicate teachers
     seen = set()
-    ctx += "\n=== FACULTY / TEACHERS ===\n"
+    ctx  = "\n=== FACULTY / TEACHERS ===\n"
     for t in teachers:
         if t['name'] not in seen:
             seen.add(t['name'])
@@ -816,10 +1295,24 @@ CGPA       : {cgpa}
             ctx += f"  {t['name']} ({t['designation'] or ''}) — {t['current_status'] or 'Unknown'} at {loc}"
             if t['role_name']: ctx += f" [{t['role_name']}]"
             ctx += "\n"
-
     return ctx
 
 
+CONTEXT_CACHE        = chat_context.ContextCache(_student_context_sections, _faculty_context)
+CONTEXT_TOKEN_BUDGET = int(os.getenv('CHAT_CONTEXT_TOKENS', '1500'))
+
+def build_full_student_context(student_id, question=''):
+    """Student + faculty context string for the GPT prompt, trimmed to the token budget."""
+    conn = get_db()
+    try:
+        sections = CONTEXT_CACHE.sections(conn, student_id)
+    finally:
+        conn.close()
+    if not sections:
+        return ""
+    return chat_context.select_sections(sections, question, CONTEXT_TOKEN_BUDGET)
+
+
 SYSTEM_PROMPT = """You are SmartCampus AI, an intelligent assistant for SRM University students.
 
 You have access to the student's COMPLETE real-time data including their attendance, 
@@ -845,6 +1338,45 @@ HOW TO RESPOND:
 - If asked in Tamil or Hindi, respond in that language.
 """
 
+LLM          = llm_client.LLMClient.from_env()
+LLM.observer = REQUEST_METRICS.observe_llm
+ANSWER_CACHE = answer_cache.AnswerCache(max_entries=int(os.getenv('CHAT_CACHE_SIZE', '5000')),
+                                        ttl=int(os.getenv('CHAT_CACHE_TTL', '3600')),
+                                        fuzzy=float(os.getenv('CHAT_CACHE_FUZZY', '0')) or None)  # e.g. 0.93
+
+def _chat_messages(student_id, message, history):
+    """(answer-cache scope, GPT messages): system prompt + context, the last few turns and the new message.
+
+    Student-independent questions get no student data so their answer can be
+    shared; faculty questions get only the faculty directory.
+    """
+    kind = answer_cache.classify(message) if student_id else 'shared'
+    conn = get_db()
+    try:
+        versions = CONTEXT_CACHE.versions(conn, student_id)
+        if kind == 'student':
+            sections = CONTEXT_CACHE.sections(conn, student_id, versions)
+            context  = chat_context.select_sections(sections, message, CONTEXT_TOKEN_BUDGET) if sections else ""
+            scope    = f"student:{student_id}:{'.'.join(map(str, versions))}"
+        elif kind == 'faculty':
+            context  = CONTEXT_CACHE.faculty(conn, versions[2])
+            scope    = f"faculty:{versions[2]}"
+        else:
+            context, scope = "", 'shared'
+    finally:
+        conn.close()
+
+    system = SYSTEM_PROMPT
+    if context:
+        system += f"\n\n=== CURRENT STUDENT DATA ===\n{context}"
+
+    messages = [{"role": "system", "content": system}]
+    for h in history[-6:]:
+        if h.get('role') in ('user', 'assistant'):
+            messages.append({'role': h['role'], 'content': h['content']})
+    messages.append({'role': 'user', 'content': message})
+    return scope, messages
+
 @app.route('/api/chatbot', methods=['POST'])
 def chatbot():
     data       = request.json or {}
@@ -855,186 +1387,223 @@ def chatbot():
     if not message:
         return jsonify({'response': 'Please type a message.'})
 
-    api_key = os.getenv('OPENAI_API_KEY','').strip()
-
-
-    # DEBUG — remove after fixing
-    print(f'[CHATBOT DEBUG] api_key found: {bool(api_key)}, starts: {api_key[:15] if api_key else "EMPTY"}')
-    print(f'[CHATBOT DEBUG] message: {message[:40]}')
-
     # OpenAI GPT PATH (real AI)
-    if api_key and api_key != 'your-key-here':
-        print("  -> Trying OpenAI GPT...")
+    if LLM.enabled:
+        scope, messages = _chat_messages(student_id, message, history)
+        reply = ANSWER_CACHE.get(scope, message, history)
+        if reply is not None:
+            REQUEST_METRICS.reply('gpt_cached')
+            return jsonify({'response': reply, 'source': 'openai_gpt', 'cached': True})
         try:
-            import urllib.request as _ureq
-            import urllib.error   as _uerr
-            import json as _json
-
-            context = build_full_student_context(student_id) if student_id else ""
-            system  = SYSTEM_PROMPT
-            if context:
-                system += f"\n\n=== CURRENT STUDENT DATA ===\n{context}"
-
-            messages = [{"role": "system", "content": system}]
-            for h in history[-6:]:
-                if h.get('role') in ('user', 'assistant'):
-                    messages.append({'role': h['role'], 'content': h['content']})
-            messages.append({'role': 'user', 'content': message})
-
-            payload = _json.dumps({
-                "model":       "gpt-3.5-turbo",
-                "messages":    messages,
-                "max_tokens":  500,
-                "temperature": 0.7
-            }).encode('utf-8')
-
-            req = _ureq.Request(
-                "https://api.openai.com/v1/chat/completions",
-                data    = payload,
-                headers = {
-                    "Content-Type":  "application/json",
-                    "Authorization": f"Bearer {api_key}"
-                }
-            )
-
-            # Catch HTTP errors explicitly so we can read OpenAI's error message
-            try:
-                with _ureq.urlopen(req, timeout=20) as r:
-                    resp = _json.loads(r.read().decode())
-            except _uerr.HTTPError as http_err:
-                err_body = http_err.read().decode()
-                print(f"[OPENAI HTTP {http_err.code}]: {err_body[:300]}")
-                raise Exception(f"OpenAI HTTP {http_err.code}: {err_body[:200]}")
-
-            reply = resp['choices'][0]['message']['content']
-            print(f"  -> GPT replied OK ({len(reply)} chars)")
+            start = time.perf_counter()
+            reply = LLM.complete(messages)
+            if reply:
+                ANSWER_CACHE.put(scope, message, history, reply, time.perf_counter() - start)
+            REQUEST_METRICS.reply('gpt')
             return jsonify({'response': reply, 'source': 'openai_gpt'})
-
-        except Exception as e:
-            import traceback
-            print(f"[OPENAI ERROR] {type(e).__name__}: {e}")
-            print(traceback.format_exc())
+        except llm_client.UpstreamError as e:
+            print(f"[OPENAI ERROR] {e}")
             # Fall through to smart fallback below
 
-    # ── SMART RULE-BASED FALLBACK (no API key) ──────────────────────
+    REQUEST_METRICS.reply('fallback' if LLM.enabled else 'rules')
+    return jsonify(rule_based_reply(message, student_id))
 
-    msg = message.lower()
 
-    # Attendance — many ways to ask
-    att_words = ['attendance','bunked','bunk','absent','75','detention','detained',
-                 'how many class','safe','present','miss','missing','classes needed',
-                 'will i pass','can i bunk','skip']
-    if any(w in msg for w in att_words):
-        if student_id:
-            conn = get_db()
-            att  = [dict(r) for r in conn.execute('SELECT * FROM attendance WHERE student_id=?',(student_id,)).fetchall()]
-            conn.close()
-            low  = [a for a in att if a['percentage'] < 75]
-            safe = [a for a in att if a['percentage'] >= 75]
-            if low:
-                lines = [f"⚠️ You have {len(low)} subject(s) below 75%:"]
-                for a in low:
-                    T,A = a['total_classes'],a['attended_classes']
-                    needed = max(0,int((0.75*T-A)/0.25)+1)
-                    lines.append(f"• {a['subject']}: {a['percentage']:.1f}% — attend {needed} more classes")
-                lines.append(f"✅ {len(safe)} subject(s) are safe.")
-                return jsonify({'response':'\n'.join(lines), 'source':'rule'})
-            return jsonify({'response':f"✅ All {len(att)} subjects are above 75%! You are completely safe from detention.", 'source':'rule'})
-        return jsonify({'response':'Minimum attendance required is 75% in every subject. Below 75% means you cannot write the exam.', 'source':'rule'})
-
-    # Marks / CGPA — many ways to ask
-    marks_words = ['marks','grade','cgpa','gpa','score','result','perform','rank',
-                   'how am i doing','doing well','subject','internal','external']
-    if any(w in msg for w in marks_words):
-        if student_id:
-            conn  = get_db()
-            marks = [dict(r) for r in conn.execute('SELECT * FROM marks WHERE student_id=?',(student_id,)).fetchall()]
-            conn.close()
-            if marks:
-                gp = {'A+':10,'A':9,'B+':8,'B':7,'C':6}
-                tc   = sum(m['credits'] for m in marks)
-                cgpa = round(sum(gp.get(m['grade'],7)*m['credits'] for m in marks)/tc,2) if tc else 0
-                best = max(marks,key=lambda x:x['total_marks'])
-                weak = min(marks,key=lambda x:x['total_marks'])
-                lines = [f"📊 Your CGPA: {cgpa}"]
-                for m in marks:
-                    lines.append(f"• {m['subject']}: {m['total_marks']}/100 ({m['grade']})")
-                lines.append(f"🏆 Best: {best['subject']} | 📉 Needs work: {weak['subject']}")
-                return jsonify({'response':'\n'.join(lines), 'source':'rule'})
-        return jsonify({'response':'Your marks and CGPA are shown in the Marks & Grades tab.', 'source':'rule'})
-
-    # Outpass
-    if any(w in msg for w in ['outpass','outing','go out','leave','permission','exit']):
-        return jsonify({'response':'🚪 Outpass needs 4 approvals:\n1. Faculty Advisor\n2. Hostel Coordinator\n3. HOD\n4. Hostel Warden\nApply in the Outpass tab. All 4 must approve before you can leave.', 'source':'rule'})
-
-    # Fees
-    if any(w in msg for w in ['fee','money','pay','payment','due','pending','arrear']):
-        if student_id:
-            conn = get_db()
-            fees = row_to_dict(conn.execute('SELECT * FROM fees WHERE student_id=?',(student_id,)).fetchone())
-            conn.close()
-            if fees:
-                return jsonify({'response':f"💰 Fee Status: {fees['status']}\nTotal: ₹{fees['total_fee']:,.0f} | Paid: ₹{fees['paid_amount']:,.0f} | Pending: ₹{fees['pending_amount']:,.0f}\nDue date: {fees['due_date']}", 'source':'rule'})
-        return jsonify({'response':'Your fee details are in the Fee Status tab. Pay before due date to avoid penalty.', 'source':'rule'})
-
-    # Exam
-    if any(w in msg for w in ['exam','test','hall ticket','schedule','when is']):
-        if student_id:
-            conn  = get_db()
-            std   = row_to_dict(conn.execute('SELECT semester FROM students WHERE id=?',(student_id,)).fetchone())
-            exams = [dict(r) for r in conn.execute('SELECT * FROM exam_schedule WHERE semester=? ORDER BY exam_date',(std['semester'],)).fetchall()] if std else []
-            conn.close()
-            if exams:
-                lines = ["📅 Your exam schedule:"]
-                for e in exams:
-                    lines.append(f"• {e['subject']}: {e['exam_date']} at {e['time']}, {e['hall']}")
-                return jsonify({'response':'\n'.join(lines), 'source':'rule'})
-        return jsonify({'response':'Exam schedule is in the Exams tab. Carry ID card + hall ticket on exam day.', 'source':'rule'})
-
-    # Teacher finder — "where is X", "find X", "locate X"
-    find_words = ['where is','find','locate','room of','office of','sir','mam','professor','doctor','dr.','prof.']
-    if any(w in msg for w in find_words):
-        # Extract name — remove trigger words
-        name_q = msg
-        for w in ['where is','find','locate','room of','office of',' sir',' mam']:
-            name_q = name_q.replace(w,'')
-        name_q = name_q.strip().strip('?').strip()
-        if len(name_q) > 2:
-            conn = get_db()
-            t = conn.execute(
-                "SELECT t.*,ts.current_status,ts.location,ts.available_from,ts.available_to "
-                "FROM teachers t LEFT JOIN teacher_status ts ON t.id=ts.teacher_id "
-                "WHERE LOWER(t.name) LIKE ?",(f'%{name_q}%',)).fetchone()
-            conn.close()
-            if t:
-                t = dict(t)
-                return jsonify({'response':f"📍 {t['name']} ({t['designation']})\nStatus: {t['current_status'] or 'Unknown'}\nLocation: {t['location'] or t['office_room']}\nAvailable: {t['available_from'] or 'N/A'} – {t['available_to'] or 'N/A'}", 'source':'rule'})
+@app.route('/api/chatbot/stream', methods=['POST'])
+def chatbot_stream():
+    """Same as /api/chatbot but streamed as server-sent events.
 
-    # HOD
-    if any(w in msg for w in ['hod','head of department','department head']):
-        conn = get_db()
-        hod  = conn.execute('''SELECT t.name,t.department,t.office_room,ts.current_status,ts.location
-            FROM faculty_roles fr JOIN teachers t ON fr.teacher_id=t.id
-            LEFT JOIN teacher_status ts ON t.id=ts.teacher_id
-            WHERE fr.role_type="HOD" LIMIT 1''').fetchone()
-        conn.close()
-        if hod:
-            return jsonify({'response':f"👨‍🏫 HOD of {hod['department']}: {hod['name']}\nOffice: {hod['office_room']}\nStatus: {hod['current_status'] or 'Unknown'}", 'source':'rule'})
+    Events: ``data: {"delta": "..."}`` for each chunk of the reply, then
+    ``event: done`` with the source. Rule-based replies arrive as one delta.
+    """
+    data       = request.json or {}
+    message    = data.get('message','').strip()
+    student_id = data.get('student_id')
+    history    = data.get('history', [])
+
+    def sse(payload, event=None):
+        return (f"event: {event}\n" if event else '') + f"data: {json.dumps(payload)}\n\n"
 
-    # Hostel / Warden
-    if any(w in msg for w in ['hostel','warden','mess','room','accommodation','block']):
-        return jsonify({'response':'🏠 For hostel issues, raise a ticket in Help Desk → Category: Hostel. The warden will respond.', 'source':'rule'})
+    def rule_events(reply):
+        yield sse({'delta': reply['response']})
+        yield sse({'source': reply['source']}, 'done')
+
+    if not message:
+        body = rule_events({'response': 'Please type a message.', 'source': 'rule'})
+    elif not LLM.enabled:
+        REQUEST_METRICS.reply('rules')
+        body = rule_events(rule_based_reply(message, student_id))
+    else:
+        scope, messages = _chat_messages(student_id, message, history)
+        cached_reply    = ANSWER_CACHE.get(scope, message, history)
+        start, chunks   = time.perf_counter(), LLM.stream(messages)
+        try:
+            first = next(chunks, '') if cached_reply is None else None
+        except llm_client.UpstreamError as e:
+            print(f"[OPENAI ERROR] {e}")
+            REQUEST_METRICS.reply('fallback')
+            body = rule_events(rule_based_reply(message, student_id))
+        else:
+            REQUEST_METRICS.reply('gpt' if cached_reply is None else 'gpt_cached')
+            def gpt_events():
+                if cached_reply is not None:
+                    yield sse({'delta': cached_reply})
+                    yield sse({'source': 'openai_gpt', 'cached': True}, 'done')
+                    return
+                parts = [first]
+                yield sse({'delta': first})
+                try:
+                    for delta in chunks:
+                        parts.append(delta)
+                        yield sse({'delta': delta})
+                except llm_client.UpstreamError as e:
+                    print(f"[OPENAI ERROR] mid-stream: {e}")
+                    yield sse({'error': 'The AI reply was cut off. Please try again.'}, 'error')
+                else:
+                    reply = ''.join(parts)
+                    if reply:           # an empty reply is an upstream hiccup, not an answer
+                        ANSWER_CACHE.put(scope, message, history, reply, time.perf_counter() - start)
+                finally:
+                    chunks.close()      # frees the upstream slot if the browser disconnects
+                yield sse({'source': 'openai_gpt'}, 'done')
+            body = gpt_events()
+    return Response(body, mimetype='text/event-stream',
+                    headers={'Cache-Control': 'no-cache', 'X-Accel-Buffering': 'no'})
+
+
+# ─── SMART RULE-BASED FALLBACK (no API key) ─────────────────────────
+# One handler per intent in intents.CAMPUS_INTENTS. A handler returns the reply
+# text, or None to let the next-ranked intent answer.
+
+def _rule_attendance(conn, student_id, msg):
+    if not student_id:
+        return 'Minimum attendance required is 75% in every subject. Below 75% means you cannot write the exam.'
+    summ = summary.get_summary(conn, student_id)
+    low  = summ['low_attendance']
+    if low:
+        lines = [f"⚠️ You have {len(low)} subject(s) below 75%:"]
+        for a in low:
+            lines.append(f"• {a['subject']}: {a['percentage']:.1f}% — attend {a['classes_needed']} more classes")
+        lines.append(f"✅ {summ['total_subjects'] - len(low)} subject(s) are safe.")
+        return '\n'.join(lines)
+    return f"✅ All {summ['total_subjects']} subjects are above 75%! You are completely safe from detention."
+
+def _rule_marks(conn, student_id, msg):
+    if student_id:
+        marks = [dict(r) for r in conn.execute('SELECT * FROM marks WHERE student_id=? ORDER BY id',(student_id,)).fetchall()]
+        if marks:
+            cgpa = summary.get_summary(conn, student_id)['cgpa']
+            best = max(marks,key=lambda x:x['total_marks'])
+            weak = min(marks,key=lambda x:x['total_marks'])
+            lines = [f"📊 Your CGPA: {cgpa}"]
+            for m in marks:
+                lines.append(f"• {m['subject']}: {m['total_marks']}/100 ({m['grade']})")
+            lines.append(f"🏆 Best: {best['subject']} | 📉 Needs work: {weak['subject']}")
+            return '\n'.join(lines)
+    return 'Your marks and CGPA are shown in the Marks & Grades tab.'
+
+def _rule_outpass(conn, student_id, msg):
+    return '🚪 Outpass needs 4 approvals:\n1. Faculty Advisor\n2. Hostel Coordinator\n3. HOD\n4. Hostel Warden\nApply in the Outpass tab. All 4 must approve before you can leave.'
+
+def _rule_fees(conn, student_id, msg):
+    if student_id:
+        fees = row_to_dict(conn.execute('SELECT * FROM fees WHERE student_id=?',(student_id,)).fetchone())
+        if fees:
+            return f"💰 Fee Status: {fees['status']}\nTotal: ₹{fees['total_fee']:,.0f} | Paid: ₹{fees['paid_amount']:,.0f} | Pending: ₹{fees['pending_amount']:,.0f}\nDue date: {fees['due_date']}"
+    return 'Your fee details are in the Fee Status tab. Pay before due date to avoid penalty.'
 
-    # Timetable
-    if any(w in msg for w in ['timetable','time table','class','today','tomorrow','schedule']):
-        return jsonify({'response':'📅 Your class timetable is in the Timetable tab with all subjects, timings and rooms.', 'source':'rule'})
+def _rule_exam(conn, student_id, msg):
+    if student_id:
+        std   = row_to_dict(conn.execute('SELECT semester FROM students WHERE id=?',(student_id,)).fetchone())
+        exams = [dict(r) for r in conn.execute('SELECT * FROM exam_schedule WHERE semester=? ORDER BY exam_date',(std['semester'],)).fetchall()] if std else []
+        if exams:
+            lines = ["📅 Your exam schedule:"]
+            for e in exams:
+                lines.append(f"• {e['subject']}: {e['exam_date']} at {e['time']}, {e['hall']}")
+            return '\n'.join(lines)
+    return 'Exam schedule is in the Exams tab. Carry ID card + hall ticket on exam day.'
+
+def _rule_find_teacher(conn, student_id, msg):
+    # Extract name — remove trigger words
+    name_q = msg
+    for w in ['where is','find','locate','room of','office of',' sir',' mam']:
+        name_q = name_q.replace(w,'')
+    name_q = name_q.strip().strip('?').strip()
+    if sum(ch.isalnum() for ch in name_q) < 2:
+        return "👩‍🏫 Please specify the teacher's name, e.g. \"where is Dr. Kumar\"."
+    FACULTY_INDEX.refresh(conn)
+    hits = FACULTY_INDEX.search(name_q, limit=1)
+    if not hits:
+        return None
+    t = faculty_index.details(conn, [hits[0][0]])[0]
+    st = t['status']
+    reply = f"📍 {t['name']} ({t['designation']})\nStatus: {st.get('current_status') or 'Unknown'}\nLocation: {st.get('location') or t['office_room']}\nAvailable: {st.get('available_from') or 'N/A'} – {st.get('available_to') or 'N/A'}"
+    TIMETABLE.refresh(conn)
+    slot = TIMETABLE.now_next('teacher', t['name'])
+    if slot['now']:
+        c = slot['now'][0]
+        reply += f"\n🧑‍🏫 Teaching now: {c['subject']} in {c['room']} ({c['time_slot']})"
+    elif slot['next']:
+        c = slot['next'][0]
+        reply += f"\n🕒 Next class: {c['subject']} in {c['room']} at {c['time_slot']}"
+    return reply
+
+def _rule_hod(conn, student_id, msg):
+    hod = conn.execute('''SELECT t.name,t.department,t.office_room,ts.current_status,ts.location
+        FROM faculty_roles fr JOIN teachers t ON fr.teacher_id=t.id
+        LEFT JOIN teacher_status ts ON t.id=ts.teacher_id
+        WHERE fr.role_type="HOD" LIMIT 1''').fetchone()
+    if hod:
+        return f"👨‍🏫 HOD of {hod['department']}: {hod['name']}\nOffice: {hod['office_room']}\nStatus: {hod['current_status'] or 'Unknown'}"
 
-    # Greetings
-    if any(w in msg for w in ['hello','hi','hey','good morning','good evening','what can','help me']):
-        return jsonify({'response':"👋 Hi! I'm SmartCampus AI. Ask me anything about:\n• Attendance & detention risk\n• Marks & CGPA\n• Outpass rules\n• Exam schedule\n• Fees\n• Finding a teacher\n• Study tips", 'source':'rule'})
+def _rule_hostel(conn, student_id, msg):
+    return '🏠 For hostel issues, raise a ticket in Help Desk → Category: Hostel. The warden will respond.'
 
+def _rule_timetable(conn, student_id, msg):
+    if student_id:
+        TIMETABLE.refresh(conn)
+        now  = datetime.datetime.now()
+        day  = (now.weekday() + (1 if 'tomorrow' in msg else 0)) % 7
+        if day >= len(timetable_index.DAYS):
+            return "📅 No classes — it's the weekend! Your full week is in the Timetable tab."
+        classes = TIMETABLE.day('student', int(student_id), day)
+        label   = 'Tomorrow' if 'tomorrow' in msg else 'Today'
+        if not classes:
+            return f"📅 {label} ({timetable_index.DAYS[day]}) you have no classes."
+        lines = [f"📅 {label} ({timetable_index.DAYS[day]}):"]
+        lines += [f"• {c['time_slot']}: {c['subject']} — {c['teacher_name']}, {c['room']}" for c in classes]
+        if label == 'Today':
+            slot = TIMETABLE.now_next('student', int(student_id), now)
+            if slot['now']:
+                lines.append(f"Now: {slot['now'][0]['subject']} in {slot['now'][0]['room']}")
+            elif slot['next']:
+                lines.append(f"Next: {slot['next'][0]['subject']} at {slot['next'][0]['time_slot']}")
+        return '\n'.join(lines)
+    return '📅 Your class timetable is in the Timetable tab with all subjects, timings and rooms.'
+
+def _rule_greeting(conn, student_id, msg):
+    return "👋 Hi! I'm SmartCampus AI. Ask me anything about:\n• Attendance & detention risk\n• Marks & CGPA\n• Outpass rules\n• Exam schedule\n• Fees\n• Finding a teacher\n• Study tips"
+
+RULE_HANDLERS = {name: globals()[f'_rule_{name}'] for name in intents.CAMPUS.names}
+
+RULE_DEFAULT = "I didn't quite understand that. Try asking like:\n• 'Am I safe from detention?'\n• 'What is my CGPA?'\n• 'Where is Dr. Rajesh?'\n• 'When is my exam?'\n• 'How do I apply for outpass?'"
+
+
+def rule_based_reply(message, student_id):
+    """Intent-matched answer from the student's data → {'response', 'source': 'rule', 'intent', 'confidence'}."""
+    msg    = message.lower()
+    ranked = intents.CAMPUS.classify(message)
+    if ranked:
+        conn = get_db()
+        try:
+            for match in ranked:
+                reply = RULE_HANDLERS[match.intent](conn, student_id, msg)
+                if reply:
+                    return {'response': reply, 'source': 'rule', 'intent': match.intent, 'confidence': match.confidence}
+        finally:
+            conn.close()
     # Default — honest response
-    return jsonify({'response':"I didn't quite understand that. Try asking like:\n• 'Am I safe from detention?'\n• 'What is my CGPA?'\n• 'Where is Dr. Rajesh?'\n• 'When is my exam?'\n• 'How do I apply for outpass?'", 'source':'rule'})
+    return {'response': RULE_DEFAULT, 'source': 'rule', 'intent': None, 'confidence': 0}
 
 
 
@@ -1140,209 +1709,99 @@ def student_to_vector(marks, attendance_pct):
     return [beginner, intermediate, advanced, practical, theory]
 
 
+RESOURCE_INDEX = recommender.ResourceIndex(RESOURCE_DB, DEFAULT_RESOURCES, student_to_vector)
+
+
 @app.route('/api/ai/recommendations/<int:student_id>')
 def get_recommendations(student_id):
-    """
-  
-    conn = get_db()
-    marks  = [dict(r) for r in conn.execute(
-        'SELECT * FROM marks WHERE student_id=?', (student_id,)).fetchall()]
-    att    = [dict(r) for r in conn.execute(
-        'SELECT * FROM attendance WHERE student_id=?', (student_id,)).fetchall()]
-
-    # Collaborative filtering: find peers with same weak subjects
-    all_marks = [dict(r) for r in conn.execute(
-        'SELECT * FROM marks WHERE student_id != ?', (student_id,)).fetchall()]
-    conn.close()
+    """Ranked study resources per weak subject plus peer insights.
 
-    if not marks:
+    Steps 1-2 (priority + cosine ranking) come from recommendation_cache, which
+    recommender.refresh_cohort() fills in bulk; a miss is ranked on the spot.
+    Step 3 reads the per-subject grade histograms kept by peer_stats.
+    """
+    conn    = get_db()
+    payload = recommender.for_student(conn, RESOURCE_INDEX, student_id)
+    if not payload:
+        conn.close()
         return jsonify({'error': 'No marks data found'}), 404
 
-    att_map = {a['subject']: a['percentage'] for a in att}
-    gp      = {'A+': 10, 'A': 9, 'B+': 8, 'B': 7, 'C': 6}
-
-    # ── Step 1: Identify weak subjects (sorted by priority) ─────────────
-    subject_scores = []
-    for m in marks:
-        att_pct  = att_map.get(m['subject'], 80)
-        gp_score = gp.get(m['grade'], 7)
-        # Priority score — higher = needs more help
-        priority = round((100 - m['total_marks']) * 0.6 + (10 - gp_score) * 4, 1)
-        subject_scores.append({
-            'subject'    : m['subject'],
-            'marks'      : m['total_marks'],
-            'grade'      : m['grade'],
-            'attendance' : att_pct,
-            'priority'   : priority,
-            'needs_help' : m['total_marks'] < 75 or m['grade'] in ['B', 'C']
-        })
-
-    subject_scores.sort(key=lambda x: x['priority'], reverse=True)
-
-    # ── Step 2: Content-Based Filtering with Cosine Similarity ──────────
-    recommendations = []
-
-    for subj_data in subject_scores[:5]:   # top 5 subjects by priority
-        subject     = subj_data['subject']
-        student_vec = student_to_vector(subj_data['marks'], subj_data['attendance'])
-        resources   = RESOURCE_DB.get(subject, DEFAULT_RESOURCES)
-
-        # Compute cosine similarity for each resource
-        scored_resources = []
-        for res in resources:
-            sim   = cosine_similarity(student_vec, res['vector'])
-            level = 'Perfect Match' if sim >= 0.8 else 'Good Match' if sim >= 0.5 else 'Suggested'
-            scored_resources.append({
-                **res,
-                'similarity_score' : sim,
-                'match_level'      : level,
-                'youtube_url'      : f"https://www.youtube.com/results?search_query={res['url_query'].replace(' ', '+')}" if res['type'] == 'YouTube' else None,
-                'search_url'       : f"https://www.google.com/search?q={res['url_query'].replace(' ', '+')}"
-            })
-
-        # Sort by cosine similarity — highest first
-        scored_resources.sort(key=lambda x: x['similarity_score'], reverse=True)
-
-        recommendations.append({
-            'subject'         : subject,
-            'marks'           : subj_data['marks'],
-            'grade'           : subj_data['grade'],
-            'attendance'      : subj_data['attendance'],
-            'priority_score'  : subj_data['priority'],
-            'needs_help'      : subj_data['needs_help'],
-            'student_vector'  : student_vec,   # show the ML vector to user
-            'top_resources'   : scored_resources[:3],   # top 3 by cosine sim
-            'all_resources'   : scored_resources
-        })
-
     # ── Step 3: Collaborative Filtering ─────────────────────────────────
-    # Find other students who had the same weak subjects and see what worked
-    weak_subjects    = [s['subject'] for s in subject_scores if s['needs_help']]
-    peer_suggestions = []
-
-    if all_marks and weak_subjects:
-        # Group other students' marks by subject
-        peer_weak = {}
-        for m in all_marks:
-            if m['subject'] in weak_subjects and m['grade'] in ['B', 'C']:
-                subj = m['subject']
-                if subj not in peer_weak:
-                    peer_weak[subj] = 0
-                peer_weak[subj] += 1
-
-        # Subjects that many peers also struggle with → validated weak area
-        for subj, count in sorted(peer_weak.items(), key=lambda x: x[1], reverse=True)[:3]:
-            peer_suggestions.append({
-                'subject'       : subj,
-                'peers_count'   : count,
-                'message'       : f"{count} other students also struggled with {subj}. You are not alone — focus here!"
-            })
-
-    # ── Step 4: Overall recommendation summary ──────────────────────────
-    total_subjects = len(marks)
-    weak_count     = len([s for s in subject_scores if s['needs_help']])
-    avg_marks      = round(sum(m['marks'] for m in subject_scores) / len(subject_scores), 1)
-
-    # Which type of resources to prioritize
-    if avg_marks < 55:
-        strategy = "Start with beginner YouTube videos. Understand basics before anything else."
-        focus    = "Theory & Fundamentals"
-    elif avg_marks < 70:
-        strategy = "Mix of theory + practice. Do notes first, then solve problems."
-        focus    = "Concept Clarity + Practice"
-    else:
-        strategy = "You are doing well! Focus on advanced topics and interview prep."
-        focus    = "Advanced Topics + Interview Prep"
-
-    return jsonify({
-        'student_id'           : student_id,
-        'total_subjects'       : total_subjects,
-        'weak_subjects_count'  : weak_count,
-        'average_marks'        : avg_marks,
-        'learning_strategy'    : strategy,
-        'focus_area'           : focus,
-        'recommendations'      : recommendations,
-        'peer_insights'        : peer_suggestions,
-        'ml_technique'         : 'Content-Based Filtering (Cosine Similarity) + Collaborative Filtering',
-        'vector_dimensions'    : ['beginner_need','intermediate_need','advanced_ready','practical_need','theory_need']
-    })
+    # Subjects other students also struggle with, from the maintained grade histograms
+    peer_suggestions = peer_stats.peer_insights(conn, student_id, payload['weak_subjects'])
+    conn.close()
 
-if __name__ == '__main__':
-    init_db()
-    print("\n" + "="*50)
-    print("  SmartCampus AI Backend v3")
-    print("  URL: http://localhost:5000")
-    print("  Student: RA2111003010001 / password123")
-    print("  Teacher: T001 / teacher123")
-    print("="*50+"\n")
-    app.run(debug=True, port=5000)
+    result = recommender.expand(RESOURCE_INDEX, student_id, payload)
+    result['peer_insights'] = peer_suggestions
+    return jsonify(result)
+
+# ─── AI — OUTPASS RISK CHECKER ───────────────────────────────────────
+@app.route('/api/ai/outpass-risk', methods=['POST'])
+def outpass_risk_checker():
+    d=request.json or {}
+    student_id=d.get('student_id')
+    low=None
+    if student_id:
+        try:
+            if isinstance(student_id,bool): raise ValueError
+            student_id=int(student_id)
+        except (TypeError,ValueError):
+            return jsonify({'error':'student_id must be a number.'}),400
+        conn=get_db()
+        low=outpass_risk.low_attendance_counts(conn,[student_id])[student_id]
+        conn.close()
+    return jsonify(outpass_risk.score(d.get('reason',''),d.get('destination',''),d.get('out_time','12:00'),low))
 
+# Batch: {"ids": [...]} or {"stage": "hod", "department": "CSE"} → {"results": {outpass_id: report}}
+@app.route('/api/ai/outpass-risk/batch', methods=['POST'])
+def outpass_risk_batch():
+    d=request.json or {}
+    stage=str(d.get('stage','')).strip().lower()
+    conn=get_db()
+    if stage:
+        if stage not in OUTPASS_STAGES:
+            conn.close(); return jsonify({'error':f'Unknown stage: {stage}'}),400
+        ids=outpass_flow.queue_ids(conn,OUTPASS_STAGES[stage],d.get('department'))
+    else:
+        ids=d.get('ids')
+        if not isinstance(ids,list) or not all(isinstance(i,int) for i in ids):
+            conn.close(); return jsonify({'error':'Send ids (list of outpass ids) or a stage.'}),400
+    results=outpass_risk.score_outpasses(conn,ids)
+    conn.close()
+    return jsonify({'count':len(results),'results':{str(i):results[i] for i in ids if i in results}})
 
-# ═══════════════════════════════════════════════════════════════
-# AI FEATURE 1 — ATTENDANCE PREDICTOR
-# ═══════════════════════════════════════════════════════════════
 
-if __name__ == '__main__':
-    init_db()
-    print("\n" + "="*50)
-    print("  SmartCampus AI Backend v3")
-    print("  URL: http://localhost:5000")
-    print("  Student: RA2111003010001 / password123")
-    print("  Teacher: T001 / teacher123")
-    print("="*50+"\n")
-    app.run(debug=True, port=5000)
+# ─── APP FACTORY ──────────────────────────────────────────────────────
+def create_app(bootstrap=None):
+    """Prepare the database and the shared in-memory indexes, then return ``app``.
 
+    Every route is registered when this module is imported, so the factory only
+    does the one-off work: schema/migrations, the CSV bootstrap, and the first
+    load of the timetable, faculty-search and cohort indexes. The recommender
+    matrices, intent tables and SYSTEM_PROMPT are already built at import time.
+    Under gunicorn (wsgi.py, gunicorn.conf.py) this runs once in the master, and
+    the forked workers share all of it copy-on-write. ``bootstrap`` overrides
+    BOOTSTRAP_MODE; a preforking master must not use 'background'.
+    """
+    init_db(bootstrap)
+    conn = get_db()
+    try:
+        TIMETABLE.refresh(conn)
+        FACULTY_INDEX.refresh(conn)
+        COHORT.refresh(conn)
+    finally:
+        conn.close()
+    db_pool.close_all()                # workers open their own connections
+    return app
 
-# ═══════════════════════════════════════════════════════════════
-# AI FEATURE 1 — ATTENDANCE PREDICTOR
-# ═══════════════════════════════════════════════════════════════
 
 if __name__ == '__main__':
-    init_db()
+    create_app()
     print("\n" + "="*50)
     print("  SmartCampus AI Backend v3")
     print("  URL: http://localhost:5000")
     print("  Student: RA2111003010001 / password123")
     print("  Teacher: T001 / teacher123")
+    print("  Production: gunicorn -c gunicorn.conf.py wsgi:app")
     print("="*50+"\n")
     app.run(debug=True, port=5000)
-
-
-# ═══════════════════════════════════════════════════════════════
-# AI FEATURE 1 — ATTENDANCE PREDICTOR
-# ═══════════════════════════════════════════════════════════════
-@app.route('/api/ai/outpass-risk', methods=['POST'])
-def outpass_risk_checker():
-    d=request.json or {}
-    reason=d.get('reason','').lower()
-    destination=d.get('destination','').lower()
-    out_time=d.get('out_time','12:00')
-    student_id=d.get('student_id')
-    risk=0; flags=[]; positives=[]
-    try: hour=int(out_time.split(':')[0])
-    except: hour=12
-    if hour<6: risk+=4; flags.append('Very early hours before 6 AM')
-    elif hour>=21: risk+=3; flags.append('Late night request after 9 PM — warden approval required')
-    else: positives.append('Request during safe hours (6 AM – 9 PM)')
-    medical=['hospital','doctor','clinic','medical','emergency','dentist','health','pharmacy']
-    academic=['library','project','internship','seminar','workshop','conference','lab']
-    family=['family','home','parents','wedding','function','festival']
-    vague=['outing','fun','shopping','movie','mall','party','roam']
-    if any(w in reason+destination for w in medical): positives.append('Medical reason — valid and important'); risk-=1
-    elif any(w in reason for w in academic): positives.append('Academic reason — supports studies')
-    elif any(w in reason for w in family): positives.append('Family reason — personal but valid')
-    elif any(w in reason for w in vague): risk+=2; flags.append('Reason appears non-essential (leisure)')
-    else: risk+=1; flags.append('Reason is vague — more details needed')
-    if student_id:
-        conn=get_db()
-        att=[dict(r) for r in conn.execute('SELECT percentage FROM attendance WHERE student_id=?',(student_id,)).fetchall()]
-        conn.close()
-        low=[a for a in att if a['percentage']<75]
-        if len(low)>=3: risk+=3; flags.append(f'{len(low)} subjects below 75% — leaving will worsen attendance')
-        elif len(low)>=1: risk+=1; flags.append(f'{len(low)} subject(s) below 75%')
-        else: positives.append('Student has good attendance in all subjects')
-    risk=max(0,min(risk,10))
-    if risk<=2: decision='AUTO-APPROVE'; dc='green'; rec='LOW RISK — Recommend approval. Valid reason and safe timing.'
-    elif risk<=5: decision='REVIEW'; dc='orange'; rec='MODERATE RISK — Manual review recommended before approving.'
-    else: decision='FLAG'; dc='red'; rec='HIGH RISK — Flag this request. Multiple concerns detected.'
-    return jsonify({'decision':decision,'decision_color':dc,'risk_score':risk,'risk_level':'Low' if risk<=2 else 'Moderate' if risk<=5 else 'High','recommendation':rec,'positive_factors':positives,'risk_factors':flags})
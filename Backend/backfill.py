@@ -0,0 +1,102 @@
+"""Resumable job that fills generated attendance/marks/fees/timetable rows.
+
+Students missing any of those tables are found with one anti-join query per
+batch, walked in id order. The last processed id is checkpointed in
+``job_checkpoints`` in the same transaction as the inserted rows, so an
+interrupted run resumes exactly where it stopped.
+
+Usage:  python backfill.py [--reset] [--batch 500]
+"""
+import random, threading, time
+import importer
+
+JOB_NAME = 'student_data_fill'
+
+MISSING_SQL = '''
+    SELECT s.id, s.department,
+           NOT EXISTS (SELECT 1 FROM attendance a WHERE a.student_id=s.id) AS attendance,
+           NOT EXISTS (SELECT 1 FROM marks      m WHERE m.student_id=s.id) AS marks,
+           NOT EXISTS (SELECT 1 FROM fees       f WHERE f.student_id=s.id) AS fees,
+           NOT EXISTS (SELECT 1 FROM timetable  t WHERE t.student_id=s.id) AS timetable
+    FROM students s
+    WHERE s.id > ?
+      AND (NOT EXISTS (SELECT 1 FROM attendance a WHERE a.student_id=s.id)
+        OR NOT EXISTS (SELECT 1 FROM marks      m WHERE m.student_id=s.id)
+        OR NOT EXISTS (SELECT 1 FROM fees       f WHERE f.student_id=s.id)
+        OR NOT EXISTS (SELECT 1 FROM timetable  t WHERE t.student_id=s.id))
+    ORDER BY s.id LIMIT ?
+'''
+
+
+def get_checkpoint(conn, job=JOB_NAME):
+    row = conn.execute('SELECT last_id FROM job_checkpoints WHERE job=?', (job,)).fetchone()
+    return row[0] if row else 0
+
+def reset_checkpoint(conn, job=JOB_NAME):
+    conn.execute('DELETE FROM job_checkpoints WHERE job=?', (job,))
+    conn.commit()
+
+
+def run_backfill(conn, batch_size=500, rng=random, stop=None, on_batch=None):
+    """Fill gaps for every student after the checkpoint. Returns {'students','rows','seconds'}."""
+    start   = time.perf_counter()
+    last_id = get_checkpoint(conn)
+    filled  = inserted = 0
+    if conn.in_transaction:
+        conn.commit()
+    while not (stop and stop.is_set()):
+        batch = conn.execute(MISSING_SQL, (last_id, batch_size)).fetchall()
+        if not batch:
+            break
+        by_table = {t: [] for t in importer.GENERATED_TABLES}
+        for row in batch:
+            for t in by_table:
+                if row[t]:
+                    by_table[t].append((row['id'], row['department']))
+        conn.execute('BEGIN')
+        try:
+            for t, students in by_table.items():
+                if students:
+                    rows = importer.generate_rows(students, rng, tables=[t])[t]
+                    conn.executemany(importer.GENERATED_TABLES[t][0], rows)
+                    inserted += len(rows)
+            last_id = batch[-1]['id']
+            conn.execute('''INSERT INTO job_checkpoints (job,last_id,updated_at) VALUES (?,?,CURRENT_TIMESTAMP)
+                ON CONFLICT(job) DO UPDATE SET last_id=excluded.last_id, updated_at=excluded.updated_at''',
+                (JOB_NAME, last_id))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        filled += len(batch)
+        if on_batch:
+            on_batch([row['id'] for row in batch])
+    return {'students': filled, 'rows': inserted, 'seconds': round(time.perf_counter() - start, 3)}
+
+
+def start_background(target, name='bootstrap'):
+    """Run ``target`` on a daemon thread; returns (thread, stop_event)."""
+    stop = threading.Event()
+    t = threading.Thread(target=target, args=(stop,), name=name, daemon=True)
+    t.start()
+    return t, stop
+
+
+if __name__ == '__main__':
+    import argparse, os, sqlite3
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--reset', action='store_true', help='start again from the first student')
+    ap.add_argument('--batch', type=int, default=500)
+    args = ap.parse_args()
+
+    db = os.path.join(os.path.dirname(__file__), 'data', 'campus.db')
+    if not os.path.exists(db):
+        raise SystemExit("ERROR: campus.db not found. Run app.py first!")
+    conn = sqlite3.connect(db)
+    conn.row_factory = sqlite3.Row
+    if args.reset:
+        reset_checkpoint(conn)
+    r = run_backfill(conn, batch_size=args.batch,
+                     on_batch=lambda ids: print(f"  ... filled up to student {ids[-1]}"))
+    conn.close()
+    print(f"Filled data for {r['students']} students ({r['rows']} rows) in {r['seconds']}s")
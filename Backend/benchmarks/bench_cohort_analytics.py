@@ -0,0 +1,94 @@
+"""Department report: per-student attendance/marks calls vs. the columnar cohort analytics.
+
+Usage:  python benchmarks/bench_cohort_analytics.py [--students 10000 100000] [--subjects 6]
+
+"per student" replays what a dashboard had to do before: one attendance and
+one marks query per student of the department, aggregated in Python.
+"columnar" is cohort_analytics.load() once, then report() for the
+department (cold) and again from the report cache.
+"""
+import os, sys, time, random, sqlite3, argparse, statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import cohort_analytics, summary
+
+DEPTS  = ["CSE","ECE","MECH","CIVIL","IT","AIDS"]
+GRADES = list(summary.GRADE_POINTS)
+
+
+def build(n_students, n_subjects, seed=3):
+    r    = random.Random(seed)
+    conn = sqlite3.connect(':memory:')
+    conn.executescript('''
+        CREATE TABLE students (id INTEGER PRIMARY KEY, reg_no TEXT, name TEXT, department TEXT, semester INTEGER);
+        CREATE TABLE attendance (id INTEGER PRIMARY KEY, student_id INTEGER, subject TEXT, percentage REAL);
+        CREATE TABLE marks (id INTEGER PRIMARY KEY, student_id INTEGER, subject TEXT,
+                            total_marks INTEGER, grade TEXT, credits INTEGER);
+        CREATE INDEX idx_attendance_student ON attendance(student_id, subject, percentage);
+        CREATE INDEX idx_marks_student ON marks(student_id, subject);
+        CREATE INDEX idx_students_cohort ON students(department, semester);''')
+    conn.executemany('INSERT INTO students VALUES (?,?,?,?,?)',
+                     ((i, f'RA{i:09d}', f'Student {i}', DEPTS[0] if i % 2 else r.choice(DEPTS), r.randint(1, 8))
+                      for i in range(1, n_students + 1)))
+    conn.executemany('INSERT INTO attendance (student_id, subject, percentage) VALUES (?,?,?)',
+                     ((i, f'Subject {k}', round(r.uniform(50, 100), 1))
+                      for i in range(1, n_students + 1) for k in range(n_subjects)))
+    conn.executemany('INSERT INTO marks (student_id, subject, total_marks, grade, credits) VALUES (?,?,?,?,?)',
+                     ((i, f'Subject {k}', r.randint(40, 125), r.choice(GRADES), r.choice((3, 4)))
+                      for i in range(1, n_students + 1) for k in range(n_subjects)))
+    conn.commit()
+    return conn
+
+
+def per_student(conn, department):
+    """Detentions, median attendance and grade counts per subject the old way."""
+    att, grades, detained = {}, {}, 0
+    for (sid,) in conn.execute('SELECT id FROM students WHERE department=?', (department,)).fetchall():
+        rows = conn.execute('SELECT subject, percentage FROM attendance WHERE student_id=?', (sid,)).fetchall()
+        detained += any(p < summary.MIN_ATTENDANCE for _, p in rows)
+        for subject, p in rows:
+            att.setdefault(subject, []).append(p)
+        for subject, grade in conn.execute('SELECT subject, grade FROM marks WHERE student_id=?', (sid,)):
+            grades.setdefault(subject, {}).setdefault(grade, 0)
+            grades[subject][grade] += 1
+    return detained, {s: statistics.median(v) for s, v in att.items()}, grades
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--students', type=int, nargs='+', default=[10000, 100000])
+    ap.add_argument('--subjects', type=int, default=6)
+    args = ap.parse_args()
+
+    print(f"  {'students':>9}{'dept size':>11}{'per student ms':>16}{'load ms':>9}{'report ms':>11}{'cached ms':>11}")
+    for n in args.students:
+        conn = build(n, args.subjects)
+        size = conn.execute('SELECT COUNT(*) FROM students WHERE department=?', (DEPTS[0],)).fetchone()[0]
+
+        start = time.perf_counter()
+        detained, medians, grades = per_student(conn, DEPTS[0])
+        old_ms = (time.perf_counter() - start) * 1000
+
+        start = time.perf_counter()
+        snap  = cohort_analytics.load(conn)
+        load_ms = (time.perf_counter() - start) * 1000
+        analytics = cohort_analytics.CohortAnalytics()
+        analytics._snap, analytics.version = snap, 0
+
+        start  = time.perf_counter()
+        report = analytics.report(DEPTS[0])
+        new_ms = (time.perf_counter() - start) * 1000
+        start  = time.perf_counter()
+        analytics.report(DEPTS[0])
+        hit_ms = (time.perf_counter() - start) * 1000
+
+        assert report['detained_students'] == detained
+        for subject, stats in report['subjects'].items():
+            assert abs(stats['attendance']['percentiles']['50'] - medians[subject]) < 0.051
+            assert {g: c for g, c in stats['marks']['grades'].items() if c} == grades[subject]
+        print(f"  {n:>9}{size:>11}{old_ms:>16.0f}{load_ms:>9.0f}{new_ms:>11.1f}{hit_ms:>11.3f}")
+        conn.close()
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,73 @@
+"""Faculty name lookup: LIKE '%x%' scan vs. the in-memory FacultyIndex.
+
+Usage:  python benchmarks/bench_faculty_index.py [--sizes 1000 5000 20000] [--queries 500]
+
+Queries mix full names, prefixes, honorific-prefixed and misspelt names.
+"""
+import os, sys, time, random, sqlite3, argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import faculty_index
+
+FIRST = ['Arun','Priya','Rajesh','Meena','Suresh','Anita','Vikram','Lakshmi','Karthik','Sunita','Deepa','Ravi',
+         'Kavya','Manoj','Nisha','Harish','Divya','Ganesh','Pooja','Sanjay']
+LAST  = ['Kumar','Sharma','Reddy','Desai','Singh','Iyer','Nair','Pillai','Menon','Rao','Gupta','Joshi','Patel',
+         'Verma','Bhat','Chopra','Das','Ghosh','Kapoor','Mishra']
+
+
+def names(n, rng):
+    syl = ['ka','ra','vi','an','ee','sh','ma','ni','tha','ru','de','lo']
+    return [f"{rng.choice(['Dr.','Prof.'])} {rng.choice(FIRST)}{''.join(rng.choices(syl, k=rng.randint(0,2)))} "
+            f"{rng.choice(LAST)}{''.join(rng.choices(syl, k=rng.randint(0,2)))}" for _ in range(n)]
+
+
+def queries(all_names, n, rng):
+    out = []
+    for _ in range(n):
+        first, last = all_names[rng.randrange(len(all_names))].split()[1:]
+        kind = rng.randrange(4)
+        if kind == 0:
+            out.append(f"{first} {last}")
+        elif kind == 1:
+            out.append(first[:4])
+        elif kind == 2:
+            out.append(f"Dr. {last}")
+        else:
+            i = rng.randrange(1, len(first) - 1)
+            out.append(first[:i] + first[i+1:])          # one letter dropped
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--sizes', type=int, nargs='+', default=[1000, 5000, 20000])
+    ap.add_argument('--queries', type=int, default=500)
+    args = ap.parse_args()
+
+    print(f"  {'faculty':>8}{'LIKE ms/query':>16}{'index ms/query':>16}{'index build ms':>16}")
+    for n in args.sizes:
+        rng  = random.Random(n)
+        rows = list(enumerate(names(n, rng), 1))
+        conn = sqlite3.connect(':memory:')
+        conn.execute('CREATE TABLE teachers (id INTEGER PRIMARY KEY, name TEXT)')
+        conn.executemany('INSERT INTO teachers VALUES (?,?)', rows)
+        qs = queries([r[1] for r in rows], args.queries, rng)
+
+        start = time.perf_counter()
+        for q in qs:
+            conn.execute('SELECT id FROM teachers WHERE LOWER(name) LIKE ?', (f'%{q.lower()}%',)).fetchall()
+        like_ms = (time.perf_counter() - start) / len(qs) * 1000
+
+        index = faculty_index.FacultyIndex()
+        start = time.perf_counter()
+        index.build(rows)
+        build_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        for q in qs:
+            index.search(q)
+        index_ms = (time.perf_counter() - start) / len(qs) * 1000
+        print(f"  {n:>8}{like_ms:>16.3f}{index_ms:>16.3f}{build_ms:>16.1f}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,104 @@
+"""Query latency before/after the index migration on a synthetic campus.
+
+Usage:  python benchmarks/bench_indexes.py [--students 50000] [--lookups 200]
+
+Builds a throwaway database with the app schema, times the hot student-keyed
+queries, applies migrations.migrate(), and times them again.
+"""
+import os, sys, time, random, sqlite3, tempfile, argparse, statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from app import SCHEMA_SQL
+import migrations
+
+DEPTS    = ["CSE","ECE","MECH","CIVIL","EEE","IT","AIDS","CSBS"]
+SUBJECTS = ["Subject A","Subject B","Subject C","Subject D","Subject E"]
+DAYS     = ["MON","TUE","WED","THU","FRI"]
+SLOTS    = ["8.00-8.50","8.50-9.40","9.50-10.40","10.40-11.30"]
+
+QUERIES = {
+    'attendance by student': ('SELECT * FROM attendance WHERE student_id=?', 'sid'),
+    'marks by student'     : ('SELECT * FROM marks WHERE student_id=?', 'sid'),
+    'timetable by student' : ('SELECT * FROM timetable WHERE student_id=? ORDER BY day,time_slot', 'sid'),
+    'fees by student'      : ('SELECT * FROM fees WHERE student_id=?', 'sid'),
+    'outpass by student'   : ('SELECT * FROM outpass_requests WHERE student_id=? ORDER BY submitted_at DESC', 'sid'),
+    'helpdesk by student'  : ('SELECT * FROM helpdesk_tickets WHERE student_id=? ORDER BY submitted_at DESC', 'sid'),
+    'exams by semester'    : ('SELECT * FROM exam_schedule WHERE semester=? ORDER BY exam_date', 'sem'),
+    'pending outpass queue': ('''SELECT o.*, s.name, s.reg_no FROM outpass_requests o
+                                 JOIN students s ON o.student_id=s.id
+                                 WHERE o.overall_status="Pending" ORDER BY o.submitted_at DESC LIMIT 50''', None),
+}
+
+
+def build(path, n_students, seed=7):
+    r = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA_SQL)
+    conn.executemany('INSERT INTO students (reg_no,name,department,year,semester,section,password) VALUES (?,?,?,?,?,?,?)',
+                     ((f"RA{i:09d}", f"Student {i}", r.choice(DEPTS), 1 + i % 4, 1 + i % 8, "A", "x")
+                      for i in range(1, n_students + 1)))
+    conn.executemany('INSERT INTO attendance (student_id,subject,total_classes,attended_classes,percentage) VALUES (?,?,?,?,?)',
+                     ((sid, subj, 40, a, a * 2.5) for sid in range(1, n_students + 1)
+                      for subj in SUBJECTS for a in (r.randint(24, 40),)))
+    conn.executemany('INSERT INTO marks (student_id,subject,internal_marks,external_marks,total_marks,grade,credits) VALUES (?,?,?,?,?,?,?)',
+                     ((sid, subj, 18, 60, 78, r.choice("ABC"), 3) for sid in range(1, n_students + 1) for subj in SUBJECTS))
+    conn.executemany('INSERT INTO timetable (student_id,day,time_slot,subject,teacher_name,room) VALUES (?,?,?,?,?,?)',
+                     ((sid, d, t, r.choice(SUBJECTS), "T", "R1") for sid in range(1, n_students + 1)
+                      for d in DAYS for t in SLOTS))
+    conn.executemany('INSERT INTO fees (student_id,total_fee,paid_amount,pending_amount,status,due_date) VALUES (?,?,?,?,?,?)',
+                     ((sid, 95000, 95000, 0, "Paid", "2024-11-30") for sid in range(1, n_students + 1)))
+    conn.executemany('INSERT INTO exam_schedule (subject,exam_date,time,hall,semester,department) VALUES (?,?,?,?,?,?)',
+                     ((subj, f"2024-11-{10+i}", "09:00 AM", "Hall A", sem, d) for sem in range(1, 9)
+                      for d in DEPTS for i, subj in enumerate(SUBJECTS)))
+    n_req = n_students // 2
+    conn.executemany('INSERT INTO outpass_requests (student_id,reason,destination,overall_status,submitted_at) VALUES (?,?,?,?,?)',
+                     ((r.randint(1, n_students), "home", "city", r.choice(["Pending","Approved","Rejected"]),
+                       f"2024-{r.randint(1,12):02d}-{r.randint(1,28):02d} 10:00:00") for _ in range(n_req)))
+    conn.executemany('INSERT INTO helpdesk_tickets (student_id,category,subject,description,submitted_at) VALUES (?,?,?,?,?)',
+                     ((r.randint(1, n_students), "Hostel", "s", "d",
+                       f"2024-{r.randint(1,12):02d}-{r.randint(1,28):02d} 10:00:00") for _ in range(n_req)))
+    conn.commit()
+    return conn
+
+
+def time_queries(conn, n_students, lookups, seed=11):
+    r = random.Random(seed)
+    out = {}
+    for label, (sql, arg) in QUERIES.items():
+        samples = []
+        for _ in range(lookups):
+            params = (r.randint(1, n_students),) if arg == 'sid' else (r.randint(1, 8),) if arg == 'sem' else ()
+            t0 = time.perf_counter()
+            conn.execute(sql, params).fetchall()
+            samples.append((time.perf_counter() - t0) * 1000)
+        out[label] = statistics.median(samples)
+    return out
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--students', type=int, default=50000)
+    ap.add_argument('--lookups',  type=int, default=200)
+    args = ap.parse_args()
+
+    with tempfile.TemporaryDirectory() as tmp:
+        path = os.path.join(tmp, 'bench.db')
+        t0 = time.perf_counter()
+        conn = build(path, args.students)
+        print(f"Built {args.students} students in {time.perf_counter()-t0:.1f}s")
+
+        before = time_queries(conn, args.students, args.lookups)
+        t0 = time.perf_counter()
+        migrations.migrate(conn, verbose=False)
+        print(f"Migrated to v{migrations.current_version(conn)} in {time.perf_counter()-t0:.1f}s\n")
+        after = time_queries(conn, args.students, args.lookups)
+        conn.close()
+
+    print(f"  {'query':<24}{'before ms':>12}{'after ms':>12}{'speedup':>10}")
+    for label in QUERIES:
+        b, a = before[label], after[label]
+        print(f"  {label:<24}{b:>12.3f}{a:>12.3f}{b/a if a else 0:>9.0f}x")
+
+
+if __name__ == '__main__':
+    main()
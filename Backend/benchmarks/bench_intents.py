@@ -0,0 +1,100 @@
+"""Chatbot intent classification: legacy keyword cascade vs. compiled engine.
+
+Usage:  python benchmarks/bench_intents.py [--rounds 2000] [--extra 200]
+
+Accuracy is measured on the labelled phrases below; throughput on the same
+phrases repeated. ``--extra`` registers that many synthetic intents (5
+keywords each) in both classifiers to show how matching cost grows with the
+number of intents.
+"""
+import os, sys, time, random, string, argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from intents import IntentEngine, CAMPUS_INTENTS
+
+CORPUS = [
+    ("am i safe from detention?", 'attendance'), ("how many classes can i bunk", 'attendance'),
+    ("what is my attendance", 'attendance'), ("will i pass if i skip tomorrow", 'attendance'),
+    ("i was absent last week, is that a problem", 'attendance'), ("classes needed to reach 75", 'attendance'),
+    ("what is my cgpa", 'marks'), ("show my marks", 'marks'), ("how am i doing this semester", 'marks'),
+    ("what grade did i get in dbms", 'marks'), ("my internal marks please", 'marks'),
+    ("how is my performance", 'marks'), ("which subject is my weakest", 'marks'),
+    ("how do i apply for outpass", 'outpass'), ("can i go out this weekend", 'outpass'),
+    ("i need permission to go home", 'outpass'), ("outing rules", 'outpass'),
+    ("how much fee is pending", 'fees'), ("when should i pay my fees", 'fees'), ("any arrears?", 'fees'),
+    ("when is my exam", 'exam'), ("exam schedule", 'exam'), ("where do i get my hall ticket", 'exam'),
+    ("is there a test on monday", 'exam'),
+    ("where is dr rajesh", 'find_teacher'), ("find prof priya", 'find_teacher'),
+    ("locate suresh sir", 'find_teacher'), ("office of anita mam", 'find_teacher'),
+    ("who is the hod", 'hod'), ("head of department contact", 'hod'),
+    ("hostel mess timings", 'hostel'), ("problem in my hostel room", 'hostel'), ("who is the warden", 'hostel'),
+    ("show my timetable", 'timetable'), ("what classes do i have today", 'timetable'),
+    ("time table for tomorrow", 'timetable'),
+    ("hi", 'greeting'), ("hello there", 'greeting'), ("good morning", 'greeting'), ("what can you do", 'greeting'),
+    ("this is weird", None), ("tell me a joke", None), ("thanks a lot", None), ("ok bye", None),
+]
+
+# The original fallback: substring checks, first matching list wins
+LEGACY_LISTS = [
+    ('attendance', ['attendance','bunked','bunk','absent','75','detention','detained','how many class','safe',
+                    'present','miss','missing','classes needed','will i pass','can i bunk','skip']),
+    ('marks', ['marks','grade','cgpa','gpa','score','result','perform','rank','how am i doing','doing well',
+               'subject','internal','external']),
+    ('outpass', ['outpass','outing','go out','leave','permission','exit']),
+    ('fees', ['fee','money','pay','payment','due','pending','arrear']),
+    ('exam', ['exam','test','hall ticket','schedule','when is']),
+    ('find_teacher', ['where is','find','locate','room of','office of','sir','mam','professor','doctor','dr.','prof.']),
+    ('hod', ['hod','head of department','department head']),
+    ('hostel', ['hostel','warden','mess','room','accommodation','block']),
+    ('timetable', ['timetable','time table','class','today','tomorrow','schedule']),
+    ('greeting', ['hello','hi','hey','good morning','good evening','what can','help me']),
+]
+
+def legacy_classify(message, lists=LEGACY_LISTS):
+    msg = message.lower()
+    for name, words in lists:
+        if any(w in msg for w in words):
+            return name
+    return None
+
+
+def synthetic(n, rng):
+    word = lambda: ''.join(rng.choices(string.ascii_lowercase, k=rng.randint(5, 9)))
+    return {f'extra_{i}': [word() for _ in range(5)] for i in range(n)}
+
+
+def measure(fn, rounds):
+    phrases = [p for p, _ in CORPUS]
+    start = time.perf_counter()
+    for _ in range(rounds):
+        for p in phrases:
+            fn(p)
+    return rounds * len(phrases) / (time.perf_counter() - start)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--rounds', type=int, default=2000)
+    ap.add_argument('--extra', type=int, default=200)
+    args = ap.parse_args()
+
+    engine = IntentEngine(CAMPUS_INTENTS)
+    compiled = lambda p: (engine.best(p) or (None,))[0]
+    acc = lambda fn: sum(fn(p) == label for p, label in CORPUS) / len(CORPUS)
+    misses = [(p, label, legacy_classify(p)) for p, label in CORPUS if legacy_classify(p) != label]
+
+    print(f"  {'classifier':<22}{'accuracy':>10}{'msgs/s':>12}{f'msgs/s +{args.extra} intents':>26}")
+    extra = synthetic(args.extra, random.Random(7))
+    big_lists  = LEGACY_LISTS + list(extra.items())
+    big_engine = IntentEngine({**CAMPUS_INTENTS, **extra})
+    print(f"  {'legacy cascade':<22}{acc(legacy_classify):>10.1%}{measure(legacy_classify, args.rounds):>12.0f}"
+          f"{measure(lambda p: legacy_classify(p, big_lists), args.rounds):>26.0f}")
+    print(f"  {'compiled engine':<22}{acc(compiled):>10.1%}{measure(compiled, args.rounds):>12.0f}"
+          f"{measure(lambda p: (big_engine.best(p) or (None,))[0], args.rounds):>26.0f}")
+    print("\n  legacy misclassifications:")
+    for p, label, got in misses:
+        print(f"    {p!r}: expected {label}, got {got}")
+
+
+if __name__ == '__main__':
+    main()
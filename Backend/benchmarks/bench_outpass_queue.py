@@ -0,0 +1,119 @@
+"""Concurrent approvers on the outpass work queues.
+
+Usage:  python benchmarks/bench_outpass_queue.py [--requests 5000] [--approvers 16] [--batch 100]
+
+Seeds a throwaway database with pending outpasses, then runs ``--approvers``
+threads per stage. Each one repeatedly takes the head of its stage queue
+(deliberately overlapping with the others) and approves it: first one id at
+a time, then ``--batch`` ids per bulk transition. Afterwards every request
+must be Completed with each stage approved exactly once; conflicts are the
+compare-and-set transitions that lost a race and moved nothing.
+"""
+import os, sys, time, random, sqlite3, tempfile, threading, argparse, statistics
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from app import SCHEMA_SQL
+from db import PRAGMAS
+import migrations, outpass_flow
+
+DEPTS = ["CSE","ECE","MECH","CIVIL","IT","AIDS"]
+
+
+def build(path, n_requests, seed=11):
+    r = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA_SQL)
+    migrations.migrate(conn, verbose=False)
+    n_students = max(1, n_requests // 5)
+    conn.executemany('INSERT INTO students (reg_no,name,department,is_hosteler,password) VALUES (?,?,?,1,?)',
+                     ((f"RA{i:09d}", f"Student {i}", r.choice(DEPTS), "x") for i in range(1, n_students + 1)))
+    conn.executemany('''INSERT INTO outpass_requests (student_id,reason,destination,submitted_at) VALUES (?,?,?,?)''',
+                     ((r.randint(1, n_students), "home", "city",
+                       f"2024-{r.randint(1,12):02d}-{r.randint(1,28):02d} {r.randint(0,23):02d}:00:00")
+                      for _ in range(n_requests)))
+    conn.commit()
+    conn.close()
+
+
+def connect(path):
+    conn = sqlite3.connect(path, check_same_thread=False)
+    for p in PRAGMAS:
+        conn.execute(p)
+    return conn
+
+
+def run(path, approvers, batch):
+    """All stages drained concurrently; returns (seconds, moved, conflicts, per-transition latencies)."""
+    totals  = {'moved': 0, 'conflicts': 0}
+    latency = []
+    lock    = threading.Lock()
+
+    labels = [s.label for s in outpass_flow.STAGES.values()]
+
+    def approver(stage, n):
+        conn, rng = connect(path), random.Random(n)
+        moved = conflicts = 0
+        lat   = []
+        # this stage and every stage before it (they keep feeding this one)
+        feeding = labels[:labels.index(outpass_flow.STAGES[stage].label) + 1]
+        marks   = ','.join('?' * len(feeding))
+        while True:
+            head = outpass_flow.queue_ids(conn, stage, limit=batch * 4)
+            if not head:
+                if not conn.execute(f'SELECT 1 FROM outpass_queue WHERE stage IN ({marks}) LIMIT 1',
+                                    feeding).fetchone():
+                    break
+                time.sleep(0.002)
+                continue
+            ids = rng.sample(head, min(batch, len(head)))
+            start = time.perf_counter()
+            done  = outpass_flow.transition(conn, stage, 'approve', ids, f'{stage}-{n}')
+            conn.commit()
+            lat.append(time.perf_counter() - start)
+            moved     += len(done)
+            conflicts += len(ids) - len(done)
+        conn.close()
+        with lock:
+            totals['moved'] += moved; totals['conflicts'] += conflicts
+            latency.extend(lat)
+
+    threads = [threading.Thread(target=approver, args=(stage, n))
+               for stage in outpass_flow.STAGES for n in range(approvers)]
+    start = time.perf_counter()
+    for t in threads: t.start()
+    for t in threads: t.join()
+    return time.perf_counter() - start, totals['moved'], totals['conflicts'], latency
+
+
+def check(path, n_requests):
+    conn = sqlite3.connect(path)
+    done = conn.execute("SELECT COUNT(*) FROM outpass_requests WHERE overall_status='Approved' AND stage='Completed'"
+                        " AND faculty_status='Approved' AND hostel_coord_status='Approved'"
+                        " AND hod_status='Approved' AND warden_status='Approved'").fetchone()[0]
+    left = conn.execute('SELECT COUNT(*) FROM outpass_queue').fetchone()[0]
+    conn.close()
+    return done == n_requests and left == 0
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--requests', type=int, default=5000)
+    ap.add_argument('--approvers', type=int, default=16, help='threads per stage')
+    ap.add_argument('--batch', type=int, default=100)
+    args = ap.parse_args()
+
+    print(f"  {args.requests} requests, {args.approvers} approvers per stage ({4 * args.approvers} threads)\n")
+    print(f"  {'mode':<14}{'transitions/s':>15}{'conflicts':>11}{'p50 ms':>9}{'p95 ms':>9}{'consistent':>12}")
+    with tempfile.TemporaryDirectory() as tmp:
+        for mode, batch in (('single id', 1), (f'bulk x{args.batch}', args.batch)):
+            path = os.path.join(tmp, f'{batch}.db')
+            build(path, args.requests)
+            seconds, moved, conflicts, lat = run(path, args.approvers, batch)
+            lat.sort()
+            p95 = lat[int(len(lat) * 0.95)] if lat else 0
+            print(f"  {mode:<14}{moved / seconds:>15.0f}{conflicts:>11}{statistics.median(lat) * 1000:>9.2f}"
+                  f"{p95 * 1000:>9.2f}{str(check(path, args.requests)):>12}")
+
+
+if __name__ == '__main__':
+    main()
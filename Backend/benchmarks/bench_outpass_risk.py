@@ -0,0 +1,62 @@
+"""Outpass risk scoring: one call per request vs. the batch scorer.
+
+Usage:  python benchmarks/bench_outpass_risk.py [--requests 500 5000] [--students 5000]
+
+"per request" replays the old endpoint body for every pending row: keyword
+lists scanned with any(), one attendance query per student. "batch" is
+outpass_risk.score_rows over the same rows.
+"""
+import os, sys, time, random, sqlite3, argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import outpass_risk
+
+REASONS = ['hospital visit','library project','going home','movie with friends','just going out','cousin wedding',
+           'doctor appointment','lab work','shopping at mall','internship interview']
+
+
+def old_score(conn, d):
+    reason, destination = d['reason'].lower(), d['destination'].lower()
+    risk = 0
+    hour = int(d['out_time'].split(':')[0])
+    risk += 4 if hour < 6 else 3 if hour >= 21 else 0
+    if any(w in reason + destination for w in outpass_risk.MEDICAL): risk -= 1
+    elif any(w in reason for w in outpass_risk.ACADEMIC): pass
+    elif any(w in reason for w in outpass_risk.FAMILY): pass
+    elif any(w in reason for w in outpass_risk.VAGUE): risk += 2
+    else: risk += 1
+    att = conn.execute('SELECT percentage FROM attendance WHERE student_id=?', (d['student_id'],)).fetchall()
+    low = sum(1 for a in att if a[0] < 75)
+    risk += 3 if low >= 3 else 1 if low else 0
+    return max(0, min(risk, 10))
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--requests', type=int, nargs='+', default=[500, 5000])
+    ap.add_argument('--students', type=int, default=5000)
+    args = ap.parse_args()
+
+    rng  = random.Random(5)
+    conn = sqlite3.connect(':memory:')
+    conn.execute('CREATE TABLE attendance (student_id INTEGER, subject TEXT, percentage REAL)')
+    conn.execute('CREATE INDEX idx_attendance_student ON attendance(student_id, subject, percentage)')
+    conn.executemany('INSERT INTO attendance VALUES (?,?,?)',
+                     ((sid, f'S{k}', rng.uniform(55, 100)) for sid in range(1, args.students + 1) for k in range(6)))
+
+    print(f"  {'requests':>9}{'per request ms':>17}{'batch ms':>11}{'speed-up':>10}")
+    for n in args.requests:
+        rows = [{'student_id': rng.randint(1, args.students), 'reason': rng.choice(REASONS), 'destination': 'city',
+                 'out_time': f'{rng.randint(0, 23):02d}:00'} for _ in range(n)]
+        start = time.perf_counter()
+        old = [old_score(conn, r) for r in rows]
+        old_ms = (time.perf_counter() - start) * 1000
+        start = time.perf_counter()
+        new = [r['risk_score'] for r in outpass_risk.score_rows(conn, rows)]
+        new_ms = (time.perf_counter() - start) * 1000
+        assert old == new
+        print(f"  {n:>9}{old_ms:>17.1f}{new_ms:>11.1f}{old_ms / new_ms:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,67 @@
+"""Per-request vs. batch recommendation throughput.
+
+Usage:  python benchmarks/bench_recommender.py [--sizes 10000 100000] [--sample 2000]
+
+per-request : the original path — two queries per student, then pure-Python
+              student_to_vector + cosine_similarity for every resource.
+batch       : recommender.refresh_cohort() — one cohort query, one matrix
+              multiply per subject, results written to recommendation_cache.
+"""
+import os, sys, time, random, sqlite3, tempfile, argparse
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from app import SCHEMA_SQL, RESOURCE_DB, DEFAULT_RESOURCES, student_to_vector, cosine_similarity
+import importer, migrations, recommender
+
+
+def build(path, n_students, seed=3):
+    rng  = random.Random(seed)
+    conn = sqlite3.connect(path)
+    conn.executescript(SCHEMA_SQL)
+    migrations.migrate(conn, verbose=False)
+    depts = list(importer.SUBJECTS_BY_DEPT)
+    conn.executemany('INSERT INTO students (reg_no,name,department,year,semester,section,password) VALUES (?,?,?,?,?,?,?)',
+                     ((f"RA{i:09d}", f"Student {i}", depts[i % len(depts)], 2, 4, "A", "x") for i in range(1, n_students + 1)))
+    rows = importer.generate_rows(((i, depts[i % len(depts)]) for i in range(1, n_students + 1)), rng,
+                                  tables=['attendance', 'marks'])
+    for t in ('attendance', 'marks'):
+        conn.executemany(importer.GENERATED_TABLES[t][0], rows[t])
+    conn.commit()
+    return conn
+
+
+def legacy_one(conn, sid):
+    marks = conn.execute('SELECT subject,total_marks,grade FROM marks WHERE student_id=?', (sid,)).fetchall()
+    att   = dict(conn.execute('SELECT subject,percentage FROM attendance WHERE student_id=?', (sid,)).fetchall())
+    gp    = {'A+': 10, 'A': 9, 'B+': 8, 'B': 7, 'C': 6}
+    scored = sorted(((round((100 - t) * 0.6 + (10 - gp.get(g, 7)) * 4, 1), s, t) for s, t, g in marks), reverse=True)
+    for _, subject, total in scored[:5]:
+        vec = student_to_vector(total, att.get(subject, 80))
+        sorted((cosine_similarity(vec, r['vector']) for r in RESOURCE_DB.get(subject, DEFAULT_RESOURCES)), reverse=True)
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--sizes', type=int, nargs='+', default=[10000, 100000])
+    ap.add_argument('--sample', type=int, default=2000)
+    args = ap.parse_args()
+    index = recommender.ResourceIndex(RESOURCE_DB, DEFAULT_RESOURCES, student_to_vector)
+
+    print(f"  {'students':>9}{'per-request/s':>16}{'batch/s':>12}{'batch total s':>15}{'speedup':>10}")
+    for n in args.sizes:
+        with tempfile.TemporaryDirectory() as tmp:
+            conn = build(os.path.join(tmp, 'bench.db'), n)
+            sample = random.Random(5).sample(range(1, n + 1), min(args.sample, n))
+            t0 = time.perf_counter()
+            for sid in sample:
+                legacy_one(conn, sid)
+            per_req = len(sample) / (time.perf_counter() - t0)
+
+            r = recommender.refresh_cohort(conn, index)
+            batch = r['students'] / r['seconds']
+            conn.close()
+        print(f"  {n:>9}{per_req:>16.0f}{batch:>12.0f}{r['seconds']:>15.2f}{batch/per_req:>9.1f}x")
+
+
+if __name__ == '__main__':
+    main()
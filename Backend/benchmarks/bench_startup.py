@@ -0,0 +1,154 @@
+"""Startup benchmark: time-to-ready and per-worker memory under gunicorn, preloaded vs. not.
+
+Usage:  python benchmarks/bench_startup.py [--students 10000] [--db campus.db] [--workers 4] [--requests 400]
+
+Starts ``gunicorn -c gunicorn.conf.py wsgi:app`` against a seeded campus
+(campus_gen, or --db) twice:
+
+  preload     create_app() runs once in the master and the workers fork from it
+              (the default in gunicorn.conf.py)
+  per-worker  PRELOAD=0, so every worker imports the app and builds its own
+              indexes after the fork
+
+For each mode it reports:
+- seconds until every worker logged "Worker ready", and until the first HTTP 200
+- per-process memory from /proc/<pid>/smaps_rollup after --requests calls,
+  spread over the dashboard, cohort, timetable and faculty-search routes:
+  RSS, USS (pages only this process holds) and PSS (shared pages split
+  between the processes that map them)
+
+Summed PSS is the real footprint of the whole server. Linux only.
+"""
+import os, re, sys, time, json, shutil, signal, socket, argparse, tempfile, threading, subprocess, urllib.request
+from concurrent.futures import ThreadPoolExecutor
+
+HERE    = os.path.dirname(os.path.abspath(__file__))
+BACKEND = os.path.dirname(HERE)
+sys.path.insert(0, HERE)
+sys.path.insert(0, BACKEND)
+
+READY = re.compile(r'Worker ready \(pid: (\d+)\)')
+
+
+def memory(pid):
+    """{'rss', 'uss', 'pss'} in MB for one process."""
+    fields = {}
+    with open(f'/proc/{pid}/smaps_rollup') as f:
+        for line in f:
+            parts = line.split()
+            if len(parts) >= 2 and parts[1].isdigit():
+                fields[parts[0].rstrip(':')] = int(parts[1])
+    mb = lambda kb: round(kb / 1024, 1)
+    return {'rss': mb(fields['Rss']), 'pss': mb(fields['Pss']),
+            'uss': mb(fields.get('Private_Clean', 0) + fields.get('Private_Dirty', 0))}
+
+
+def free_port():
+    with socket.socket() as s:
+        s.bind(('127.0.0.1', 0))
+        return s.getsockname()[1]
+
+
+def get(port, path):
+    try:
+        with urllib.request.urlopen(f'http://127.0.0.1:{port}{path}', timeout=30) as r:
+            r.read()
+            return r.status
+    except OSError:
+        return None
+
+
+def paths(db, n):
+    import random, sqlite3
+    conn  = sqlite3.connect(db)
+    top   = conn.execute('SELECT MAX(id) FROM students').fetchone()[0]
+    depts = [r[0] for r in conn.execute('SELECT DISTINCT department FROM students')]
+    names = [r[0].split()[-1] for r in conn.execute('SELECT name FROM teachers LIMIT 50')]
+    conn.close()
+    rng = random.Random(7)
+    make = [lambda: f'/api/student/{rng.randint(1, top)}/bundle',
+            lambda: f'/api/teacher/analytics/cohort?department={rng.choice(depts)}',
+            lambda: f'/api/timetable/{rng.randint(1, top)}/grid',
+            lambda: f'/api/teacher/find/{rng.choice(names)}']
+    return [make[i % len(make)]() for i in range(n)]
+
+
+def run(mode, db, workers, requests):
+    port = free_port()
+    env  = {**os.environ, 'CAMPUS_DB': db, 'BOOTSTRAP_MODE': 'skip', 'OPENAI_API_KEY': '', 'PORT': str(port),
+            'BIND': f'127.0.0.1:{port}', 'WEB_CONCURRENCY': str(workers), 'PRELOAD': '1' if mode == 'preload' else '0'}
+    start = time.perf_counter()
+    proc  = subprocess.Popen([sys.executable, '-m', 'gunicorn', '-c', 'gunicorn.conf.py', 'wsgi:app'],
+                             cwd=BACKEND, env=env, stdout=subprocess.DEVNULL, stderr=subprocess.PIPE, text=True)
+    pids, all_ready = [], threading.Event()
+
+    def watch():
+        for line in proc.stderr:
+            m = READY.search(line)
+            if m:
+                pids.append(int(m.group(1)))
+                if len(pids) == workers:
+                    all_ready.set()
+    threading.Thread(target=watch, daemon=True).start()
+
+    try:
+        first = None
+        while first is None and proc.poll() is None:
+            if get(port, '/api/system/db-pool') == 200:
+                first = time.perf_counter() - start
+            else:
+                time.sleep(0.02)
+        if not all_ready.wait(300):
+            raise SystemExit(f'{mode}: workers did not come up')
+        ready = time.perf_counter() - start
+
+        urls = paths(db, requests)
+        with ThreadPoolExecutor(workers * 2) as pool:
+            statuses = list(pool.map(lambda p: get(port, p), urls))
+        time.sleep(0.5)
+        procs = {'master': memory(proc.pid), **{f'worker {pid}': memory(pid) for pid in pids}}
+    finally:
+        proc.send_signal(signal.SIGTERM)
+        proc.wait(30)
+    return {'mode': mode, 'ready_s': round(ready, 2), 'first_response_s': round(first or 0, 2),
+            'ok': sum(s == 200 for s in statuses), 'requests': len(statuses), 'processes': procs,
+            'total_pss_mb': round(sum(p['pss'] for p in procs.values()), 1)}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--students', type=int, default=10000)
+    ap.add_argument('--seed', type=int, default=1)
+    ap.add_argument('--db', help='existing campus.db to serve (copied first); default: generate one')
+    ap.add_argument('--workers', type=int, default=4)
+    ap.add_argument('--requests', type=int, default=400)
+    ap.add_argument('--json', help='also write the results here')
+    args = ap.parse_args()
+    if not os.path.exists('/proc/self/smaps_rollup'):
+        raise SystemExit('ERROR: needs Linux /proc/<pid>/smaps_rollup')
+
+    with tempfile.TemporaryDirectory() as tmp:
+        db = os.path.join(tmp, 'campus.db')
+        if args.db:
+            shutil.copy(args.db, db)
+        else:
+            import campus_gen
+            print(f"  generating {args.students} students ...", flush=True)
+            campus_gen.generate(db, args.students, args.seed)
+        results = [run(mode, db, args.workers, args.requests) for mode in ('preload', 'per-worker')]
+
+    print(f"\n  {'mode':<12}{'ready s':>9}{'first 200 s':>13}{'ok':>7}{'master RSS':>12}{'worker RSS':>12}"
+          f"{'worker USS':>12}{'worker PSS':>12}{'total PSS':>11}   (MB; worker columns are means)")
+    for r in results:
+        w    = [p for name, p in r['processes'].items() if name != 'master']
+        mean = lambda k: sum(p[k] for p in w) / len(w)
+        print(f"  {r['mode']:<12}{r['ready_s']:>9.2f}{r['first_response_s']:>13.2f}{r['ok']:>4}/{r['requests']:<3}"
+              f"{r['processes']['master']['rss']:>11.1f}{mean('rss'):>12.1f}{mean('uss'):>12.1f}{mean('pss'):>12.1f}"
+              f"{r['total_pss_mb']:>11.1f}")
+    if args.json:
+        with open(args.json, 'w') as f:
+            json.dump({'students': args.students, 'workers': args.workers, 'results': results}, f, indent=2)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,264 @@
+"""Seeded synthetic campus for benchmarks: a full campus.db at any size.
+
+Usage:  python benchmarks/campus_gen.py --students 10000 [--seed 1] [--out bench-10k.db]
+
+Students are spread over all eight departments in importer.SUBJECTS_BY_DEPT.
+Every student gets attendance, marks and fees, with the same distributions as
+importer.generate_rows. Timetables are built once per (department, semester,
+section) class and shared by its students, so room and teacher grids look
+like a real campus. The generator also creates:
+- teachers (about one per 40 students), faculty roles and status rows
+- exam schedules
+- outpass requests at every stage, on-duty requests and helpdesk tickets
+
+All randomness comes from one NumPy generator, so a (students, seed) pair
+always gives the same rows. Data is bulk-inserted before migrations.migrate()
+runs; the migrations back-fill their derived tables in one pass, so the
+per-row triggers never fire during the load.
+"""
+import os, sys, time, sqlite3, argparse
+import numpy as np
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from app import SCHEMA_SQL
+import importer, migrations, outpass_flow
+
+DEPTS    = list(importer.SUBJECTS_BY_DEPT)
+SECTIONS = ['A', 'B', 'C', 'D']
+HOSTELS  = ['Block A', 'Block B', 'Block C', 'Block D']
+FIRST    = ['Aarav','Aditi','Arjun','Bhavana','Deepak','Divya','Gautam','Harini','Ishaan','Kavya','Karthik','Lakshmi',
+            'Manoj','Meera','Nikhil','Nandini','Pranav','Priya','Rahul','Revathi','Sanjay','Sneha','Suresh','Tanvi',
+            'Varun','Vidya','Vikram','Yamini','Rohan','Anjali']
+LAST     = ['Kumar','Sharma','Singh','Reddy','Iyer','Nair','Patel','Gupta','Menon','Rao','Das','Joshi','Pillai',
+            'Verma','Bose','Chopra','Desai','Mehta','Shetty','Krishnan']
+TITLES   = ['Dr.', 'Prof.']
+DESIGNATIONS = ['Professor', 'Associate Professor', 'Assistant Professor']
+STATUSES = ['In Office', 'In Class', 'Available', 'In Meeting', 'On Leave']
+REASONS  = [('Hospital visit', 'City Hospital'), ('Going home for festival', 'Home'), ('Library project work', 'Central Library'),
+            ('Shopping at mall', 'Phoenix Mall'), ('Cousin wedding', 'Home'), ('Internship interview', 'Tech Park'),
+            ('Movie with friends', 'PVR Cinemas'), ('Doctor appointment', 'Apollo Clinic')]
+CATEGORIES = ['Academic', 'Hostel', 'Transport', 'IT Support', 'Fee', 'Other']
+EVENTS   = ['Hackathon', 'Symposium', 'Sports Meet', 'Workshop', 'Paper Presentation', 'Cultural Fest']
+ROLES    = ['HOD', 'FACULTY_ADVISOR', 'HOSTEL_COORD', 'WARDEN', 'PLACEMENT']
+EPOCH    = np.datetime64('2024-06-01T00:00:00')
+PERIOD_S = 180 * 86400                                       # timestamps fall in Jun–Nov 2024
+
+GRADE_WEIGHTS = [20, 30, 25, 15, 10]
+GRADE_RANGES  = np.array([importer.GRADE_MARKS[g] for g in importer.GRADES])
+
+
+def _timestamps(rng, n):
+    return np.datetime_as_string(EPOCH + rng.integers(0, PERIOD_S, n).astype('timedelta64[s]'), unit='s')
+
+
+def _people(rng, n, titles=None):
+    """``n`` distinct names: first × last, with one or two middle initials once the pairs run out."""
+    pairs  = len(FIRST) * len(LAST)
+    level  = 0 if n <= pairs else 1 if n <= pairs * 26 else 2
+    picks  = rng.permutation(pairs * 26 ** level)[:n]
+    names  = []
+    for p in picks.tolist():
+        initials, pair = divmod(p, pairs)
+        middle = ''.join(f' {chr(65 + (initials // 26 ** k) % 26)}.' for k in range(level))
+        names.append(f'{FIRST[pair // len(LAST)]}{middle} {LAST[pair % len(LAST)]}')
+    if titles:
+        names = [f'{titles[i % len(titles)]} {name}' for i, name in enumerate(names)]
+    return names
+
+
+def students(rng, n):
+    dept  = rng.integers(0, len(DEPTS), n)
+    year  = rng.integers(1, 5, n)
+    sem   = year * 2 - rng.integers(0, 2, n)
+    sect  = rng.integers(0, len(SECTIONS), n)
+    host  = rng.random(n) < 0.6
+    block = rng.integers(0, len(HOSTELS), n)
+    names = _people(rng, n)
+    phone = rng.integers(7000000000, 9999999999, n)
+    rows  = [(f'RA{2111003010000 + i + 1}', names[i], f'student{i + 1}@srmist.edu.in', str(phone[i]),
+              DEPTS[dept[i]], int(year[i]), int(sem[i]), SECTIONS[sect[i]],
+              HOSTELS[block[i]] if host[i] else 'Day Scholar', int(host[i]), 'password123')
+             for i in range(n)]
+    return rows, dept, sem, sect, host
+
+
+def teachers(rng, n_students):
+    per_dept = max(3, n_students // 40 // len(DEPTS))
+    n        = per_dept * len(DEPTS)
+    names    = _people(rng, n, TITLES)
+    rows, by_dept, roles, status = [], {d: [] for d in DEPTS}, [], []
+    for i in range(n):
+        dept = DEPTS[i // per_dept]
+        tid  = i + 1
+        rows.append((f'T{tid:05d}', names[i], f'faculty{tid}@srmist.edu.in', dept,
+                     'Head of Department' if i % per_dept == 0 else DESIGNATIONS[rng.integers(0, 3)],
+                     f'{dept}-{rng.integers(1, 5)}0{rng.integers(1, 10)}', 'teacher123'))
+        by_dept[dept].append((tid, names[i]))
+        st = STATUSES[rng.integers(0, len(STATUSES))]
+        status.append((tid, st, rows[-1][5], '09:00', '17:00'))
+    for dept, staff in by_dept.items():
+        for k, role in enumerate(ROLES):
+            tid, _ = staff[k % len(staff)]
+            label  = 'Head of Department' if role == 'HOD' else role.replace('_', ' ').title()
+            roles.append((tid, role, f'{label} - {dept}', dept))
+    return rows, by_dept, roles, status
+
+
+def academics(rng, sids, dept):
+    """Attendance, marks and fees columns for every student (five subjects each)."""
+    k        = 5
+    n        = len(sids) * k
+    sid      = np.repeat(sids, k)
+    subj_idx = np.tile(np.arange(k), len(sids))
+    subjects = [importer.SUBJECTS_BY_DEPT[DEPTS[d]] for d in range(len(DEPTS))]
+    subj     = [subjects[d][j] for d, j in zip(np.repeat(dept, k).tolist(), subj_idx.tolist())]
+
+    total    = rng.choice([38, 40, 42, 44], n)
+    pct      = np.where(rng.random(n) < 0.25, rng.uniform(60, 74, n), rng.uniform(75, 95, n))
+    attended = np.clip((pct / 100 * total).astype(int), 0, total)
+    percent  = np.round(attended / total * 100, 1)
+    attendance = list(zip(sid.tolist(), subj, total.tolist(), attended.tolist(), percent.tolist()))
+
+    g        = rng.choice(len(importer.GRADES), n, p=np.array(GRADE_WEIGHTS) / sum(GRADE_WEIGHTS))
+    lo_i, lo_e, hi_i, hi_e = GRADE_RANGES[g].T
+    internal = rng.integers(lo_i, hi_i + 1)
+    external = rng.integers(lo_e, hi_e + 1)
+    credits  = rng.choice([3, 4], n)
+    marks    = list(zip(sid.tolist(), subj, internal.tolist(), external.tolist(), (internal + external).tolist(),
+                        [importer.GRADES[x] for x in g.tolist()], credits.tolist()))
+
+    fee      = rng.choice([85000, 90000, 95000, 100000], len(sids))
+    paid     = (rng.random(len(sids)) * (fee + 1)).astype(int)
+    pending  = fee - paid
+    fees     = [(s, f, p, d, 'Paid' if d == 0 else 'Partial' if p > 0 else 'Pending', '2024-11-30')
+                for s, f, p, d in zip(sids.tolist(), fee.tolist(), paid.tolist(), pending.tolist())]
+    return attendance, marks, fees
+
+
+def timetables(rng, sids, dept, sem, sect, staff):
+    """One weekly timetable per (department, semester, section), copied to each of its students."""
+    classes = {}
+    for key in sorted(set(zip(dept.tolist(), sem.tolist(), sect.tolist()))):
+        d = DEPTS[key[0]]
+        subjects = importer.SUBJECTS_BY_DEPT[d]
+        teacher  = {s: staff[d][rng.integers(0, len(staff[d]))][1] for s in subjects}
+        room     = f'{d}-{rng.integers(1, 5)}0{rng.integers(1, 10)}'
+        classes[key] = [(day, slot, s, teacher[s], room)
+                        for day in importer.DAYS
+                        for slot in sorted(rng.choice(importer.SLOTS, rng.integers(3, 6), replace=False).tolist(),
+                                           key=importer.SLOTS.index)
+                        for s in (subjects[rng.integers(0, len(subjects))],)]
+    return [(s, *entry) for s, key in zip(sids.tolist(), zip(dept.tolist(), sem.tolist(), sect.tolist()))
+            for entry in classes[key]]
+
+
+def exams(rng):
+    return [(subj, f'2024-11-{10 + 2 * i:02d}', '09:00 AM' if i % 2 == 0 else '02:00 PM',
+             f'Hall {"ABCD"[rng.integers(0, 4)]}', sem, dept)
+            for dept, subjects in importer.SUBJECTS_BY_DEPT.items()
+            for sem in range(1, 9) for i, subj in enumerate(subjects)]
+
+
+def outpasses(rng, sids, host):
+    """Requests from hostelers: pending at every stage, approved, or rejected at some stage."""
+    hostelers = sids[host]
+    n = len(hostelers) // 2
+    if not n:
+        return []
+    who    = rng.choice(hostelers, n)
+    reason = rng.integers(0, len(REASONS), n)
+    fate   = rng.choice(['pending', 'approved', 'rejected'], n, p=[0.5, 0.35, 0.15])
+    at     = rng.integers(0, len(outpass_flow.STAGES), n)
+    when   = _timestamps(rng, n)
+    hour   = rng.integers(5, 23, n)
+    stages = list(outpass_flow.STAGES.values())
+    rows   = []
+    for i in range(n):
+        statuses = ['Waiting'] * len(stages)
+        if fate[i] == 'approved':
+            statuses, stage, overall = ['Approved'] * len(stages), 'Completed', 'Approved'
+        else:
+            statuses[:at[i]] = ['Approved'] * at[i]
+            statuses[at[i]]  = 'Pending' if fate[i] == 'pending' else 'Rejected'
+            stage, overall   = stages[at[i]].label, 'Pending' if fate[i] == 'pending' else 'Rejected'
+        day = when[i][:10]
+        rows.append((int(who[i]), *REASONS[reason[i]], day, f'{hour[i]:02d}:00', day, '20:00',
+                     stage, overall, *statuses, when[i].replace('T', ' ')))
+    return rows
+
+
+def requests(rng, sids):
+    n = max(1, len(sids) // 10)
+    who, event, status, when = rng.choice(sids, n), rng.integers(0, len(EVENTS), n), rng.random(n), _timestamps(rng, n)
+    onduty = [(int(who[i]), EVENTS[event[i]], when[i][:10], f'{EVENTS[event[i]]} participation',
+               'Pending' if status[i] < 0.5 else 'Approved', when[i].replace('T', ' ')) for i in range(n)]
+    n = max(1, len(sids) // 5)
+    who, cat, status, when = rng.choice(sids, n), rng.integers(0, len(CATEGORIES), n), rng.random(n), _timestamps(rng, n)
+    tickets = [(int(who[i]), CATEGORIES[cat[i]], f'{CATEGORIES[cat[i]]} issue #{i + 1}', 'Generated ticket',
+                'Open' if status[i] < 0.6 else 'Resolved', when[i].replace('T', ' ')) for i in range(n)]
+    return onduty, tickets
+
+
+INSERTS = {
+    'students'        : f"INSERT INTO students ({','.join(importer.STUDENT_FIELDS)}) VALUES ({','.join('?' * 11)})",
+    'teachers'        : f"INSERT INTO teachers ({','.join(importer.TEACHER_FIELDS)}) VALUES ({','.join('?' * 7)})",
+    'faculty_roles'   : 'INSERT INTO faculty_roles (teacher_id,role_type,role_name,department) VALUES (?,?,?,?)',
+    'teacher_status'  : 'INSERT INTO teacher_status (teacher_id,current_status,location,available_from,available_to) VALUES (?,?,?,?,?)',
+    'attendance'      : importer.GENERATED_TABLES['attendance'][0],
+    'marks'           : importer.GENERATED_TABLES['marks'][0],
+    'fees'            : importer.GENERATED_TABLES['fees'][0],
+    'timetable'       : importer.GENERATED_TABLES['timetable'][0],
+    'exam_schedule'   : 'INSERT INTO exam_schedule (subject,exam_date,time,hall,semester,department) VALUES (?,?,?,?,?,?)',
+    'outpass_requests': '''INSERT INTO outpass_requests (student_id,reason,destination,out_date,out_time,return_date,return_time,
+                           stage,overall_status,faculty_status,hostel_coord_status,hod_status,warden_status,submitted_at)
+                           VALUES (?,?,?,?,?,?,?,?,?,?,?,?,?,?)''',
+    'onduty_requests' : 'INSERT INTO onduty_requests (student_id,event_name,date,description,status,submitted_at) VALUES (?,?,?,?,?,?)',
+    'helpdesk_tickets': 'INSERT INTO helpdesk_tickets (student_id,category,subject,description,status,submitted_at) VALUES (?,?,?,?,?,?)',
+}
+
+
+def generate(path, n_students, seed=1):
+    """Write a fresh campus.db at ``path``; returns {'students', 'seed', 'rows': {table: n}, 'seconds'}."""
+    start = time.perf_counter()
+    for suffix in ('', '-wal', '-shm'):
+        if os.path.exists(path + suffix):
+            os.remove(path + suffix)
+    rng = np.random.default_rng(seed)
+    sids = np.arange(1, n_students + 1)
+    tables = {}
+    tables['students'], dept, sem, sect, host = students(rng, n_students)
+    tables['teachers'], staff, tables['faculty_roles'], tables['teacher_status'] = teachers(rng, n_students)
+    tables['attendance'], tables['marks'], tables['fees'] = academics(rng, sids, dept)
+    tables['timetable']        = timetables(rng, sids, dept, sem, sect, staff)
+    tables['exam_schedule']    = exams(rng)
+    tables['outpass_requests'] = outpasses(rng, sids, host)
+    tables['onduty_requests'], tables['helpdesk_tickets'] = requests(rng, sids)
+
+    conn = sqlite3.connect(path)
+    conn.execute('PRAGMA journal_mode=WAL')
+    conn.executescript(SCHEMA_SQL)
+    with conn:
+        for table, rows in tables.items():
+            conn.executemany(INSERTS[table], rows)
+    migrations.migrate(conn, verbose=False)
+    conn.execute('ANALYZE')
+    conn.close()
+    return {'students': n_students, 'seed': seed, 'rows': {t: len(r) for t, r in tables.items()},
+            'seconds': round(time.perf_counter() - start, 2)}
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--students', type=int, default=10000)
+    ap.add_argument('--seed', type=int, default=1)
+    ap.add_argument('--out', help='database path (default: campus-<students>.db here)')
+    args = ap.parse_args()
+    out = args.out or os.path.join(os.path.dirname(__file__), f'campus-{args.students}.db')
+    r   = generate(out, args.students, args.seed)
+    print(f"  {out}: {r['students']} students, seed {r['seed']}, built in {r['seconds']}s")
+    for table, n in r['rows'].items():
+        print(f"    {table:<18}{n:>10}")
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,297 @@
+"""Benchmark suite: synthetic campuses at several sizes → one JSON report.
+
+Usage:  python benchmarks/suite.py [--sizes 1000 10000 100000] [--seed 1] [--iterations 200]
+                                   [--out report.json] [--data-dir DIR] [--compare old.json]
+                                   [--query-audit]
+
+For each size, campus_gen builds (or, with --data-dir, reuses) a seeded
+campus.db. A worker process then imports app against it, with CAMPUS_DB set,
+BOOTSTRAP_MODE=skip and no OpenAI key, and times:
+
+  micro      student_to_vector, cosine_similarity, build_full_student_context
+             (cold and cached), the CGPA summary lookup, CGPA from marks rows
+             and a full student_summary rebuild
+  endpoints  the main student / teacher / AI routes through the Flask test
+             client, with seeded random students, departments and rooms
+
+Every timing is summarised as n / mean / p50 / p95 / min in milliseconds.
+The report also records the environment, the git commit and the dataset row
+counts, with keys sorted so two reports diff cleanly. ``--compare`` prints p50
+ratios against an older report and exits 1 when any timing regressed by more
+than ``--tolerance``.
+
+``--query-audit`` runs the workers with QUERY_AUDIT=warn (see query_audit.py)
+and adds each size's audit to the report: statements per route against
+app.QUERY_BUDGETS, statements repeated within one request (N+1) and
+full-table scans. It exits 1 when a route went over its budget. Timings
+taken in this mode include the audit's own overhead.
+"""
+import os, sys, json, time, random, argparse, platform, subprocess, statistics, tempfile, sqlite3, datetime
+
+HERE = os.path.dirname(os.path.abspath(__file__))
+sys.path.insert(0, os.path.join(HERE, '..'))
+
+SUITE_VERSION = 1
+
+
+def summarise(samples):
+    """Seconds → {'n', 'mean_ms', 'p50_ms', 'p95_ms', 'min_ms'}."""
+    ms = sorted(s * 1000 for s in samples)
+    return {'n': len(ms), 'mean_ms': round(statistics.fmean(ms), 4), 'p50_ms': round(statistics.median(ms), 4),
+            'p95_ms': round(ms[min(len(ms) - 1, int(len(ms) * 0.95))], 4), 'min_ms': round(ms[0], 4)}
+
+
+def measure(fn, args, warmup=5):
+    """Call ``fn(*a)`` for each ``a`` in ``args`` (after a few warm-up calls) and summarise."""
+    for a in args[:warmup]:
+        fn(*a)
+    samples = []
+    for a in args:
+        start = time.perf_counter()
+        fn(*a)
+        samples.append(time.perf_counter() - start)
+    return summarise(samples)
+
+
+# ─── WORKER (runs inside a process bound to one database) ────────────
+def micro(app, conn, rng, iterations):
+    import summary
+    sids  = [rng.randint(1, conn.execute('SELECT MAX(id) FROM students').fetchone()[0]) for _ in range(iterations)]
+    pairs = [(rng.uniform(35, 125), rng.uniform(50, 100)) for _ in range(iterations)]
+    vecs  = [(app.student_to_vector(m, a), r['vector'])
+             for (m, a), r in zip(pairs, rng.choices(app.DEFAULT_RESOURCES, k=iterations))]
+
+    def context_cold(sid):
+        app.CONTEXT_CACHE = type(app.CONTEXT_CACHE)(app._student_context_sections, app._faculty_context)
+        app.build_full_student_context(sid, 'what is my attendance')
+
+    def cgpa_from_marks(sid):
+        rows = conn.execute('SELECT grade, credits FROM marks WHERE student_id=?', (sid,)).fetchall()
+        credits = sum(r[1] for r in rows)
+        return round(sum(summary.GRADE_POINTS.get(r[0], 7) * r[1] for r in rows) / credits, 2) if credits else 0
+
+    def rebuild():
+        summary.rebuild(conn)
+
+    out = {
+        'student_to_vector'         : measure(app.student_to_vector, pairs),
+        'cosine_similarity'         : measure(app.cosine_similarity, vecs),
+        'context_cold'              : measure(context_cold, [(s,) for s in sids[:max(10, iterations // 4)]]),
+        'context_cached'            : measure(app.build_full_student_context, [(s, 'what is my attendance') for s in sids]),
+        'cgpa_summary_lookup'       : measure(lambda s: summary.get_summary(conn, s), [(s,) for s in sids]),
+        'cgpa_from_marks'           : measure(cgpa_from_marks, [(s,) for s in sids]),
+        'cgpa_rebuild_all'          : measure(rebuild, [()] * 3, warmup=0),
+    }
+    app.CONTEXT_CACHE = type(app.CONTEXT_CACHE)(app._student_context_sections, app._faculty_context)
+    return out
+
+
+def endpoints(app, conn, rng, iterations):
+    """{route name: timing summary + status counts} via the Flask test client."""
+    client   = app.app.test_client()
+    max_id   = conn.execute('SELECT MAX(id) FROM students').fetchone()[0]
+    depts    = [r[0] for r in conn.execute('SELECT DISTINCT department FROM students ORDER BY 1')]
+    rooms    = [r[0] for r in conn.execute('SELECT DISTINCT room FROM timetable ORDER BY 1 LIMIT 200')]
+    teachers = [r[0] for r in conn.execute('SELECT name FROM teachers ORDER BY id LIMIT 200')]
+    regs     = lambda sid: f'RA{2111003010000 + sid}'
+    sid      = lambda: rng.randint(1, max_id)
+
+    routes = {
+        'student_login'        : lambda: ('POST', '/api/student/login', {'reg_no': regs(sid()), 'password': 'password123'}),
+        'dashboard_summary'    : lambda: ('GET', f'/api/dashboard/summary/{sid()}', None),
+        'attendance'           : lambda: ('GET', f'/api/attendance/{sid()}', None),
+        'marks'                : lambda: ('GET', f'/api/marks/{sid()}', None),
+        'timetable'            : lambda: ('GET', f'/api/timetable/{sid()}', None),
+        'timetable_grid'       : lambda: ('GET', f'/api/timetable/{sid()}/grid?at=2024-11-04T09:15', None),
+        'timetable_room_now'   : lambda: ('GET', f'/api/timetable/now?room={rng.choice(rooms)}&at=2024-11-04T09:15', None),
+        'exam_schedule'        : lambda: ('GET', f'/api/exam-schedule/{rng.randint(1, 8)}', None),
+        'fees'                 : lambda: ('GET', f'/api/fees/{sid()}', None),
+        'outpass_student'      : lambda: ('GET', f'/api/outpass/student/{sid()}', None),
+        'helpdesk_student'     : lambda: ('GET', f'/api/helpdesk/student/{sid()}', None),
+        'outpass_queue'        : lambda: ('GET', f'/api/teacher/outpass/pending?stage=faculty&department={rng.choice(depts)}', None),
+        'outpass_queue_risk'   : lambda: ('GET', f'/api/teacher/outpass/pending?stage=hod&department={rng.choice(depts)}&risk=1', None),
+        'outpass_queue_counts' : lambda: ('GET', '/api/teacher/outpass/queues', None),
+        'helpdesk_all'         : lambda: ('GET', '/api/teacher/helpdesk/all?status=Open', None),
+        'helpdesk_counts'      : lambda: ('GET', '/api/teacher/helpdesk/counts', None),
+        'teacher_find'         : lambda: ('GET', f'/api/teacher/find/{rng.choice(teachers).split()[1]}', None),
+        'faculty_roles'        : lambda: ('GET', '/api/faculty/roles', None),
+        'recommendations'      : lambda: ('GET', f'/api/ai/recommendations/{sid()}', None),
+        'outpass_risk_batch'   : lambda: ('POST', '/api/ai/outpass-risk/batch', {'stage': 'faculty', 'department': rng.choice(depts)}),
+        'cohort_report'        : lambda: ('GET', f'/api/teacher/analytics/cohort?department={rng.choice(depts)}', None),
+        'chatbot_rules'        : lambda: ('POST', '/api/chatbot', {'student_id': sid(), 'message': rng.choice(
+                                     ['what is my attendance', 'show my cgpa', 'timetable today', 'where is my hod'])}),
+    }
+
+    out = {}
+    for name, make in routes.items():
+        calls    = [make() for _ in range(iterations)]
+        statuses = {}
+
+        def call(method, path, body):
+            resp = client.open(path, method=method, json=body)
+            statuses[resp.status_code] = statuses.get(resp.status_code, 0) + 1
+
+        for c in calls[:5]:
+            call(*c)
+        statuses.clear()
+        out[name] = {**measure(call, calls, warmup=0), 'status': {str(k): v for k, v in sorted(statuses.items())}}
+    out['_response_cache'] = app.response_cache.stats()
+    return out
+
+
+def worker(db, result, seed, iterations, audit=False):
+    os.environ.update({'CAMPUS_DB': db, 'BOOTSTRAP_MODE': 'skip', 'OPENAI_API_KEY': ''})
+    if audit:
+        os.environ['QUERY_AUDIT'] = 'warn'
+    import app
+    app.init_db()
+    conn = app.get_db()
+    try:
+        data = {'micro': micro(app, conn, random.Random(seed), iterations),
+                'endpoints': endpoints(app, conn, random.Random(seed + 1), iterations)}
+        if app.QUERY_AUDIT:
+            data['query_audit'] = app.QUERY_AUDIT.report()
+    finally:
+        conn.close()
+    with open(result, 'w') as f:
+        json.dump(data, f)
+
+
+# ─── DRIVER ──────────────────────────────────────────────────────────
+def environment():
+    import numpy
+    from importlib.metadata import version
+    try:
+        commit = subprocess.run(['git', 'rev-parse', 'HEAD'], cwd=HERE, capture_output=True, text=True).stdout.strip()
+        dirty  = bool(subprocess.run(['git', 'status', '--porcelain', '--untracked-files=no'], cwd=HERE,
+                                     capture_output=True, text=True).stdout.strip())
+    except OSError:
+        commit, dirty = None, None
+    return {'python': platform.python_version(), 'sqlite': sqlite3.sqlite_version, 'numpy': numpy.__version__,
+            'flask': version('flask'), 'platform': platform.platform(), 'cpus': os.cpu_count(),
+            'git_commit': commit or None, 'git_dirty': dirty}
+
+
+def dataset(data_dir, n, seed):
+    """Path of the seeded campus for ``n`` students, generated unless a matching one is kept in ``data_dir``."""
+    import campus_gen
+    path = os.path.join(data_dir, f'campus-{n}-s{seed}.db')
+    meta = path + '.json'
+    if os.path.exists(path) and os.path.exists(meta):
+        with open(meta) as f:
+            info = json.load(f)
+        return path, {**info, 'reused': True}
+    info = campus_gen.generate(path, n, seed)
+    with open(meta, 'w') as f:
+        json.dump(info, f)
+    return path, {**info, 'reused': False}
+
+
+def compare(old, new, tolerance):
+    """Print p50 old → new per timing; returns the names that got slower than ``tolerance``×."""
+    worse = []
+    print(f"\n  {'size':>7}  {'benchmark':<34}{'old p50 ms':>12}{'new p50 ms':>12}{'ratio':>8}")
+    for size, res in new['results'].items():
+        before = old.get('results', {}).get(size)
+        if not before:
+            continue
+        for group in ('micro', 'endpoints'):
+            for name, stats in res[group].items():
+                prev = before.get(group, {}).get(name)
+                if name.startswith('_') or not prev:
+                    continue
+                ratio = stats['p50_ms'] / prev['p50_ms'] if prev['p50_ms'] else 1.0
+                mark  = '  <-- slower' if ratio > tolerance else ''
+                if mark:
+                    worse.append(f'{size}/{group}/{name}')
+                print(f"  {size:>7}  {group[0] + ':' + name:<34}{prev['p50_ms']:>12.3f}{stats['p50_ms']:>12.3f}"
+                      f"{ratio:>7.2f}x{mark}")
+    return worse
+
+
+def audit_summary(n, audit):
+    """Print one size's query audit; returns the routes that went over budget."""
+    print(f"    query audit: {len(audit['routes'])} routes, {audit['statements_explained']} distinct statements")
+    over = []
+    for route, r in audit['routes'].items():
+        mark = ''
+        if r['over_budget']:
+            mark = '  <-- over budget'
+            over.append(f'{n}:{route}')
+        print(f"      {route:<46}max {r['max_statements']:>3} / budget {r['budget']:>3}{mark}")
+    for rep in audit['repeated_statements']:
+        print(f"      N+1? {rep['route']}: {rep['max_runs']}x {rep['sql']}")
+    for scan in audit['full_scans']:
+        print(f"      full scan of {', '.join(scan['full_scans'])}: {scan['sql']}")
+    return over
+
+
+def main():
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--sizes', type=int, nargs='+', default=[1000, 10000, 100000])
+    ap.add_argument('--seed', type=int, default=1)
+    ap.add_argument('--iterations', type=int, default=200, help='calls per benchmark')
+    ap.add_argument('--out', default='benchmark-report.json')
+    ap.add_argument('--data-dir', help='keep generated databases here and reuse them on later runs')
+    ap.add_argument('--compare', help='older report to compare p50 timings against')
+    ap.add_argument('--tolerance', type=float, default=1.25, help='ratio above which --compare fails')
+    ap.add_argument('--query-audit', action='store_true', help='audit SQL per route; exit 1 on a blown query budget')
+    ap.add_argument('--worker', nargs=2, metavar=('DB', 'RESULT'), help=argparse.SUPPRESS)
+    args = ap.parse_args()
+
+    if args.worker:
+        return worker(*args.worker, args.seed, args.iterations, args.query_audit)
+
+    report = {'suite_version': SUITE_VERSION, 'created_at': datetime.datetime.now().isoformat(timespec='seconds'),
+              'config': {'sizes': args.sizes, 'seed': args.seed, 'iterations': args.iterations,
+                         'query_audit': args.query_audit},
+              'environment': environment(), 'results': {}}
+    over_budget = []
+    tmp = None if args.data_dir else tempfile.TemporaryDirectory()
+    data_dir = args.data_dir or tmp.name
+    os.makedirs(data_dir, exist_ok=True)
+    try:
+        for n in args.sizes:
+            path, info = dataset(data_dir, n, args.seed)
+            print(f"  {n} students: dataset {'reused' if info['reused'] else 'built in ' + str(info['seconds']) + 's'}",
+                  flush=True)
+            result = os.path.join(data_dir, f'result-{n}.json')
+            start  = time.perf_counter()
+            subprocess.run([sys.executable, os.path.abspath(__file__), '--worker', path, result,
+                            '--seed', str(args.seed), '--iterations', str(args.iterations)]
+                           + (['--query-audit'] if args.query_audit else []),
+                           check=True, stdout=subprocess.DEVNULL)
+            with open(result) as f:
+                res = json.load(f)
+            os.remove(result)
+            report['results'][str(n)] = {'dataset': {k: v for k, v in info.items() if k != 'reused'}, **res}
+            print(f"    measured in {time.perf_counter() - start:.1f}s")
+            for group in ('micro', 'endpoints'):
+                for name, stats in res[group].items():
+                    if not name.startswith('_'):
+                        print(f"    {group[0] + ':' + name:<34}p50 {stats['p50_ms']:>9.3f} ms   p95 {stats['p95_ms']:>9.3f} ms")
+            if 'query_audit' in res:
+                over_budget += audit_summary(n, res['query_audit'])
+    finally:
+        if tmp:
+            tmp.cleanup()
+
+    with open(args.out, 'w') as f:
+        json.dump(report, f, indent=2, sort_keys=True)
+        f.write('\n')
+    print(f"\n  report written to {args.out}")
+
+    if over_budget:
+        print(f"\n  {len(over_budget)} route(s) over their query budget: {', '.join(over_budget)}")
+    if args.compare:
+        with open(args.compare) as f:
+            worse = compare(json.load(f), report, args.tolerance)
+        if worse:
+            print(f"\n  {len(worse)} benchmark(s) slower than {args.tolerance}x: {', '.join(worse)}")
+            sys.exit(1)
+    if over_budget:
+        sys.exit(1)
+
+
+if __name__ == '__main__':
+    main()
@@ -0,0 +1,141 @@
+"""Cached chatbot context for build_full_student_context().
+
+``data_versions`` holds a counter per scope — ``student:<id>``, ``faculty``
+and ``exams`` — that triggers bump whenever a row feeding the context
+changes. A student's formatted sections are cached together with the
+versions they were built from, so a follow-up message costs one indexed
+version lookup instead of eight queries. The faculty section is the same
+for every student and is built once per faculty version.
+
+The assembled prompt keeps the profile and then fills a token budget with
+the sections most relevant to the question.
+"""
+import threading
+from collections import OrderedDict
+
+# scope expression per source table (NEW/OLD filled in per trigger)
+VERSIONED_TABLES = {
+    'students'        : "'student:'||{ref}.id",
+    'attendance'      : "'student:'||{ref}.student_id",
+    'marks'           : "'student:'||{ref}.student_id",
+    'fees'            : "'student:'||{ref}.student_id",
+    'timetable'       : "'student:'||{ref}.student_id",
+    'outpass_requests': "'student:'||{ref}.student_id",
+    'exam_schedule'   : "'exams'",
+    'teachers'        : "'faculty'",
+    'teacher_status'  : "'faculty'",
+    'faculty_roles'   : "'faculty'",
+}
+
+_BUMP = '''INSERT INTO data_versions (scope, version) VALUES ({scope}, 1)
+           ON CONFLICT(scope) DO UPDATE SET version=version+1'''
+
+
+def install(conn):
+    """Migration step: version table + bump triggers on every context source table."""
+    conn.execute('CREATE TABLE IF NOT EXISTS data_versions (scope TEXT PRIMARY KEY, version INTEGER DEFAULT 0) WITHOUT ROWID')
+    for table, scope in VERSIONED_TABLES.items():
+        for op, ref in (('insert', 'NEW'), ('update', 'NEW'), ('delete', 'OLD')):
+            conn.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_version_{table}_{op} AFTER {op.upper()} ON {table}
+                BEGIN {_BUMP.format(scope=scope.format(ref=ref))}; END''')
+
+
+# ─── SECTION RELEVANCE ───────────────────────────────────────────────
+# Keywords that make a section relevant to the question; the profile is always kept.
+SECTION_KEYWORDS = {
+    'attendance': ['attendance','bunk','absent','75','detention','detained','class','safe','present','miss','skip','pass'],
+    'marks'     : ['marks','grade','cgpa','gpa','score','result','perform','rank','doing','subject','internal','external','study'],
+    'fees'      : ['fee','money','pay','payment','due','pending','arrear','scholarship'],
+    'timetable' : ['timetable','today','tomorrow','period','slot','room','lecture','class','free','next'],
+    'exams'     : ['exam','test','hall ticket','schedule','when is','prepare','revision'],
+    'outpass'   : ['outpass','outing','go out','leave','permission','exit','home'],
+    'faculty'   : ['where is','find','locate','sir','mam','madam','professor','doctor','dr.','prof.','teacher',
+                   'faculty','staff','hod','advisor','warden','coordinator','available','office'],
+}
+SECTION_ORDER = ['profile', 'attendance', 'marks', 'fees', 'timetable', 'exams', 'outpass', 'faculty']
+CHARS_PER_TOKEN = 4
+
+
+def estimate_tokens(text):
+    return (len(text) + CHARS_PER_TOKEN - 1) // CHARS_PER_TOKEN
+
+
+def select_sections(sections, question, budget):
+    """Keep the profile, then the most relevant sections that fit ``budget`` tokens.
+
+    Sections are picked by keyword hits in ``question`` (ties keep the usual
+    order) and emitted in the usual order. A relevant section that does not fit
+    whole is cut at a line boundary; irrelevant ones are dropped.
+    """
+    q      = (question or '').lower()
+    score  = {name: sum(w in q for w in SECTION_KEYWORDS.get(name, ())) for name, _ in sections}
+    ranked = sorted((s for s in sections if s[0] != 'profile'),
+                    key=lambda s: (-score[s[0]], SECTION_ORDER.index(s[0])))
+    texts  = dict(sections)
+    left   = budget - estimate_tokens(texts.get('profile', ''))
+    chosen = {'profile': texts.get('profile', '')}
+    for name, text in ranked:
+        cost = estimate_tokens(text)
+        if cost <= left:
+            chosen[name] = text
+            left -= cost
+        elif score[name] and left > 0:
+            cut = text[:left * CHARS_PER_TOKEN]
+            chosen[name] = cut[:cut.rfind('\n') + 1]
+            left = 0
+    return ''.join(chosen[n] for n in SECTION_ORDER if chosen.get(n))
+
+
+class ContextCache:
+    """Per-student section cache stamped with data_versions (LRU-bounded)."""
+
+    def __init__(self, build_student, build_faculty, max_students=2048):
+        self.build_student = build_student    # (conn, student_id) -> [(name, text)] or None
+        self.build_faculty = build_faculty    # (conn) -> text
+        self.max_students  = max_students
+        self._students = OrderedDict()
+        self._faculty  = (None, '')
+        self._lock     = threading.Lock()
+        self.stats     = {'hits': 0, 'misses': 0, 'faculty_builds': 0}
+
+    def versions(self, conn, student_id):
+        """(student, exams, faculty) version stamp the cached context is valid for."""
+        scopes = {f'student:{student_id}': 0, 'exams': 0, 'faculty': 0}
+        for scope, version in conn.execute('SELECT scope, version FROM data_versions WHERE scope IN (?,?,?)',
+                                           tuple(scopes)):
+            scopes[scope] = version
+        return scopes[f'student:{student_id}'], scopes['exams'], scopes['faculty']
+
+    def faculty(self, conn, version):
+        """Shared faculty section for faculty ``version``."""
+        with self._lock:
+            if self._faculty[0] == version:
+                return self._faculty[1]
+        text = self.build_faculty(conn)
+        with self._lock:
+            self._faculty = (version, text)
+            self.stats['faculty_builds'] += 1
+        return text
+
+    def sections(self, conn, student_id, versions=None):
+        """[(name, text)] for the student, including the shared faculty section; None if unknown."""
+        s_ver, e_ver, f_ver = versions or self.versions(conn, student_id)
+        with self._lock:
+            hit = self._students.get(student_id)
+            if hit and hit[0] == (s_ver, e_ver):
+                self._students.move_to_end(student_id)
+                self.stats['hits'] += 1
+                own = hit[1]
+            else:
+                own = None
+        if own is None:
+            own = self.build_student(conn, student_id)
+            with self._lock:
+                self.stats['misses'] += 1
+                self._students[student_id] = ((s_ver, e_ver), own)
+                self._students.move_to_end(student_id)
+                while len(self._students) > self.max_students:
+                    self._students.popitem(last=False)
+        if own is None:
+            return None
+        return own + [('faculty', self.faculty(conn, f_ver))]
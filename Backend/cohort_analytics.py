@@ -0,0 +1,312 @@
+"""Department / semester analytics over columnar NumPy copies of attendance and marks.
+
+Students, attendance and marks are loaded once into parallel arrays. Text
+columns (department, subject, grade) are coded as small integers and every
+row points at its student's position. A cohort report is then a boolean mask
+over the students, followed by grouped passes per subject with ``lexsort`` and
+``bincount``:
+- attendance percentiles, histogram and below-75% counts
+- marks percentiles and grade histograms
+- students detained in at least one subject
+- a CGPA distribution and an at-risk list
+Nothing in a report loops over students in Python.
+
+Migration 12 adds triggers that bump the ``cohort`` counter in data_versions
+when attendance, marks or a student's cohort fields change. The arrays and
+every cached report are dropped when that counter moves. Rebuilds happen at
+most once every ``min_interval`` seconds.
+
+Usage:  python cohort_analytics.py [department] [semester]
+"""
+import threading, time
+from collections import OrderedDict, namedtuple
+from operator import itemgetter
+import numpy as np
+import summary
+
+PERCENTILES     = (10, 25, 50, 75, 90)
+ATTENDANCE_BINS = [0, 50, 65, 75, 85]               # left edges; the last bin runs to 100
+GRADES          = list(summary.GRADE_POINTS)        # 'A+', 'A', 'B+', 'B', 'C'; anything else → 'Other'
+AT_RISK_CGPA    = 7.0
+MAX_CACHED      = 256
+
+_BUMP = '''INSERT INTO data_versions (scope, version) VALUES ('cohort', 1)
+           ON CONFLICT(scope) DO UPDATE SET version=version+1'''
+
+VERSION_SQL = [
+    *[f'''CREATE TRIGGER IF NOT EXISTS trg_cohort_{t}_{op} AFTER {op.upper()} ON {t} BEGIN {_BUMP}; END'''
+      for t in ('attendance', 'marks') for op in ('insert', 'update', 'delete')],
+    *[f'''CREATE TRIGGER IF NOT EXISTS trg_cohort_students_{op} AFTER {event} ON students BEGIN {_BUMP}; END'''
+      for op, event in (('insert', 'INSERT'), ('delete', 'DELETE'),
+                        ('update', 'UPDATE OF reg_no, name, department, semester'))],
+]
+
+STUDENTS_SQL   = 'SELECT id, reg_no, name, department, semester FROM students ORDER BY id'
+ATTENDANCE_SQL = 'SELECT student_id, subject, percentage FROM attendance WHERE percentage IS NOT NULL'
+MARKS_SQL      = 'SELECT student_id, subject, total_marks, grade, credits FROM marks'
+
+# One immutable build (same idea as timetable_index.Snapshot).
+#   departments / subjects   code → name
+#   sid, reg_no, name        per student, in id order
+#   dept, sem                per student: department code, semester (0 = unknown)
+#   a_stu, a_subj, a_pct     per attendance row: student position, subject code, percentage
+#   m_stu, m_subj, m_total,  per marks row: student position, subject code, total marks,
+#   m_grade, m_credits       grade code (len(GRADES) = other), credits
+Snapshot = namedtuple('Snapshot', 'departments subjects sid reg_no name dept sem '
+                                  'a_stu a_subj a_pct m_stu m_subj m_total m_grade m_credits')
+
+
+def _column(rows, i, dtype, default=None):
+    """Column ``i`` of fetched rows as an array; None → ``default`` when given."""
+    values = map(itemgetter(i), rows)
+    if default is not None:
+        values = (default if v is None else v for v in values)
+    return np.fromiter(values, dtype, len(rows))
+
+
+def _codes(rows, i, table):
+    """Text column ``i`` → int32 codes, adding unseen values to ``table`` ({value: code})."""
+    for v in dict.fromkeys(map(itemgetter(i), rows)):
+        table.setdefault(v, len(table))
+    return np.fromiter(map(table.__getitem__, map(itemgetter(i), rows)), np.int32, len(rows))
+
+
+def load(conn):
+    """Read the three tables into a Snapshot; rows of unknown students are dropped."""
+    departments, subjects = {}, {}
+    grades = {g: i for i, g in enumerate(GRADES)}
+
+    students = conn.execute(STUDENTS_SQL).fetchall()
+    sid  = _column(students, 0, np.int64)
+    dept = np.fromiter((departments.setdefault(r[3] or '', len(departments)) for r in students),
+                       np.int32, len(students))
+    sem  = _column(students, 4, np.int16, 0)
+
+    def position(rows):
+        ids = _column(rows, 0, np.int64)
+        pos = np.searchsorted(sid, ids)
+        ok  = pos < len(sid)
+        ok[ok] = sid[pos[ok]] == ids[ok]
+        return pos.astype(np.int32), ok
+
+    a = conn.execute(ATTENDANCE_SQL).fetchall()
+    a_stu, a_ok = position(a)
+    a_subj, a_pct = _codes(a, 1, subjects), _column(a, 2, np.float64)
+
+    m = conn.execute(MARKS_SQL).fetchall()
+    m_stu, m_ok = position(m)
+    m_subj    = _codes(m, 1, subjects)
+    m_total   = _column(m, 2, np.float64, np.nan)
+    m_grade   = np.fromiter((grades.get(r[3], len(GRADES)) for r in m), np.int8, len(m))
+    m_credits = _column(m, 4, np.float64, 0)
+
+    return Snapshot(list(departments), list(subjects), sid,
+                    [r[1] for r in students], [r[2] for r in students], dept, sem,
+                    a_stu[a_ok], a_subj[a_ok], a_pct[a_ok],
+                    m_stu[m_ok], m_subj[m_ok], m_total[m_ok], m_grade[m_ok], m_credits[m_ok])
+
+
+# ─── GROUPED PRIMITIVES ──────────────────────────────────────────────
+def _groups(keys, values):
+    """Sort ``values`` within each key → (keys present, sorted values, group starts, group sizes)."""
+    order = np.lexsort((values, keys))
+    k, v  = keys[order], values[order]
+    starts = np.flatnonzero(np.r_[True, k[1:] != k[:-1]]) if len(k) else np.array([], dtype=np.int64)
+    sizes  = np.diff(np.r_[starts, len(k)])
+    return k[starts], v, starts, sizes
+
+
+def _percentiles(v, starts, sizes):
+    """{p: array per group} with linear interpolation (same as np.percentile per group)."""
+    out = {}
+    for p in PERCENTILES:
+        pos  = starts + (sizes - 1) * (p / 100)
+        lo   = np.floor(pos).astype(np.int64)
+        hi   = np.ceil(pos).astype(np.int64)
+        out[p] = v[lo] + (v[hi] - v[lo]) * (pos - lo)
+    return out
+
+
+def _round(a, nd=1):
+    return [round(float(x), nd) for x in a]
+
+
+# ─── REPORT ──────────────────────────────────────────────────────────
+def report(snap, department=None, semester=None, at_risk_limit=50):
+    """Cohort report for one department (all when None) and optionally one semester; None if empty."""
+    mask = np.ones(len(snap.sid), dtype=bool)
+    if department is not None:
+        if department not in snap.departments:
+            return None
+        mask &= snap.dept == snap.departments.index(department)
+    if semester is not None:
+        mask &= snap.sem == semester
+    n_students = int(mask.sum())
+    if not n_students:
+        return None
+
+    subjects = {}
+
+    # attendance per subject
+    sel = mask[snap.a_stu]
+    stu, subj, pct = snap.a_stu[sel], snap.a_subj[sel], snap.a_pct[sel]
+    low = pct < summary.MIN_ATTENDANCE
+    if len(pct):
+        keys, v, starts, sizes = _groups(subj, pct)
+        means = np.add.reduceat(v, starts) / sizes
+        q     = _percentiles(v, starts, sizes)
+        bins  = np.clip(np.searchsorted(ATTENDANCE_BINS, v, side='right') - 1, 0, len(ATTENDANCE_BINS) - 1)
+        grp   = np.repeat(np.arange(len(keys)), sizes)
+        hist  = np.bincount(grp * len(ATTENDANCE_BINS) + bins,
+                            minlength=len(keys) * len(ATTENDANCE_BINS)).reshape(len(keys), -1)
+        below = np.add.reduceat((v < summary.MIN_ATTENDANCE).astype(np.int64), starts)
+        for i, k in enumerate(keys):
+            subjects.setdefault(snap.subjects[k], {})['attendance'] = {
+                'students': int(sizes[i]), 'mean': round(float(means[i]), 1),
+                'percentiles': {str(p): round(float(q[p][i]), 1) for p in PERCENTILES},
+                'histogram': dict(zip(_bin_labels(), hist[i].tolist())),
+                'detained': int(below[i])}
+
+    # marks per subject
+    msel = mask[snap.m_stu]
+    m_stu, m_subj, total = snap.m_stu[msel], snap.m_subj[msel], snap.m_total[msel]
+    grade, credits = snap.m_grade[msel], snap.m_credits[msel]
+    n_grades = len(GRADES) + 1
+    if len(total):
+        has = ~np.isnan(total)
+        keys, v, starts, sizes = _groups(m_subj[has], total[has])
+        if len(keys):
+            means = np.add.reduceat(v, starts) / sizes
+            q     = _percentiles(v, starts, sizes)
+        codes, inverse = np.unique(m_subj, return_inverse=True)
+        ghist = np.bincount(inverse * n_grades + grade, minlength=len(codes) * n_grades).reshape(len(codes), -1)
+        stats = {k: i for i, k in enumerate(keys)}
+        for j, k in enumerate(codes):
+            entry = {'grades': dict(zip(GRADES + ['Other'], ghist[j].tolist()))}
+            if k in stats:
+                i = stats[k]
+                entry.update({'students': int(sizes[i]), 'mean': round(float(means[i]), 1),
+                              'percentiles': {str(p): round(float(q[p][i]), 1) for p in PERCENTILES}})
+            subjects.setdefault(snap.subjects[k], {})['marks'] = entry
+
+    # per student: low-attendance subject count, lowest attendance, CGPA
+    n = len(snap.sid)
+    low_subjects = np.bincount(stu[low], minlength=n)
+    min_att = np.full(n, np.nan)
+    if len(pct):
+        order = np.lexsort((pct, stu))
+        first = order[np.r_[True, stu[order][1:] != stu[order][:-1]]]
+        min_att[stu[first]] = pct[first]
+    points  = np.array([summary.GRADE_POINTS[g] for g in GRADES] + [7], dtype=np.float64)[grade]
+    weights = np.bincount(m_stu, weights=credits, minlength=n)
+    cgpa    = np.divide(np.bincount(m_stu, weights=points * credits, minlength=n), weights,
+                        out=np.full(n, np.nan), where=weights > 0)
+
+    cohort   = np.flatnonzero(mask)
+    c_cgpa   = cgpa[cohort][~np.isnan(cgpa[cohort])]
+    detained = low_subjects[cohort] > 0
+    risky    = cohort[detained | (cgpa[cohort] < AT_RISK_CGPA)]
+    # most below-75% subjects first, then lowest CGPA, then lowest attendance
+    risky    = risky[np.lexsort((np.nan_to_num(min_att[risky], nan=101), np.nan_to_num(cgpa[risky], nan=11),
+                                 -low_subjects[risky]))]
+
+    return {
+        'department': department, 'semester': semester, 'students': n_students,
+        'detained_students': int(detained.sum()),
+        'cgpa': {'mean': round(float(c_cgpa.mean()), 2) if len(c_cgpa) else None,
+                 'percentiles': dict(zip(map(str, PERCENTILES),
+                                         _round(np.percentile(c_cgpa, PERCENTILES), 2))) if len(c_cgpa) else {}},
+        'grades': dict(zip(GRADES + ['Other'], np.bincount(grade, minlength=n_grades).tolist())),
+        'subjects': dict(sorted(subjects.items())),
+        'at_risk_count': int(len(risky)),
+        'at_risk': [{'student_id': int(snap.sid[i]), 'reg_no': snap.reg_no[i], 'name': snap.name[i],
+                     'semester': int(snap.sem[i]) or None, 'low_attendance_subjects': int(low_subjects[i]),
+                     'min_attendance': None if np.isnan(min_att[i]) else round(float(min_att[i]), 1),
+                     'cgpa': None if np.isnan(cgpa[i]) else round(float(cgpa[i]), 2)}
+                    for i in risky[:at_risk_limit]],
+    }
+
+
+def _bin_labels():
+    edges = ATTENDANCE_BINS + [100]
+    return [f'{lo}-{hi}' for lo, hi in zip(edges, edges[1:])]
+
+
+class CohortAnalytics:
+    """Snapshot + report cache, rebuilt when the ``cohort`` data version moves."""
+
+    def __init__(self, min_interval=5.0, max_cached=MAX_CACHED):
+        self.min_interval = min_interval
+        self.max_cached   = max_cached
+        self.version   = None
+        self._built_at = 0.0
+        self._snap     = None
+        self._reports  = OrderedDict()
+        self._lock     = threading.Lock()
+        self._stats    = {'builds': 0, 'hits': 0, 'misses': 0}
+
+    def refresh(self, conn):
+        row = conn.execute("SELECT version FROM data_versions WHERE scope='cohort'").fetchone()
+        version = row[0] if row else 0
+        if version == self.version:
+            return
+        if self.version is not None and time.monotonic() - self._built_at < self.min_interval:
+            return
+        snap = load(conn)
+        with self._lock:
+            self._snap, self.version, self._built_at = snap, version, time.monotonic()
+            self._reports.clear()
+            self._stats['builds'] += 1
+
+    def report(self, department=None, semester=None, at_risk_limit=50):
+        key = (department, semester, at_risk_limit)
+        with self._lock:
+            snap, version = self._snap, self.version
+            if key in self._reports:
+                self._reports.move_to_end(key)
+                self._stats['hits'] += 1
+                return self._reports[key]
+            self._stats['misses'] += 1
+        result = report(snap, department, semester, at_risk_limit) if snap else None
+        if result is not None:
+            result['version'] = version
+        with self._lock:
+            if self.version == version:
+                self._reports[key] = result
+                while len(self._reports) > self.max_cached:
+                    self._reports.popitem(last=False)
+        return result
+
+    def departments(self):
+        snap = self._snap
+        if snap is None:
+            return {}
+        counts = np.bincount(snap.dept, minlength=len(snap.departments))
+        return {d: int(c) for d, c in zip(snap.departments, counts) if d and c}
+
+    def stats(self):
+        snap = self._snap
+        with self._lock:
+            return {'version': self.version, 'cached_reports': len(self._reports), **self._stats,
+                    'students': len(snap.sid) if snap else 0,
+                    'attendance_rows': len(snap.a_pct) if snap else 0,
+                    'marks_rows': len(snap.m_total) if snap else 0}
+
+
+if __name__ == '__main__':
+    import sqlite3, os, sys, json
+    db = os.path.join(os.path.dirname(__file__), 'data', 'campus.db')
+    if not os.path.exists(db):
+        raise SystemExit("ERROR: campus.db not found. Run app.py first!")
+    conn      = sqlite3.connect(db)
+    analytics = CohortAnalytics()
+    start     = time.perf_counter()
+    analytics.refresh(conn)
+    print(f"Loaded in {(time.perf_counter() - start) * 1000:.0f} ms: {analytics.stats()}")
+    dept = sys.argv[1] if len(sys.argv) > 1 else None
+    sem  = int(sys.argv[2]) if len(sys.argv) > 2 else None
+    start  = time.perf_counter()
+    result = analytics.report(dept, sem, at_risk_limit=5)
+    print(f"Report in {(time.perf_counter() - start) * 1000:.1f} ms")
+    print(json.dumps(result, indent=2))
+    conn.close()
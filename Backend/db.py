@@ -0,0 +1,280 @@
+"""Pooled SQLite connections for the SmartCampus backend.
+
+Each worker thread checks out one long-lived connection and keeps it until
+its outermost ``close()``; the connection then goes back to an idle list so
+the next request thread can reuse it instead of reconnecting. Pragmas are
+applied once when a connection is opened and sqlite3's statement cache keeps
+prepared statements alive between requests.
+
+A request that dies before its ``close()`` would otherwise keep its
+connection forever; the app calls ``release_all()`` from teardown_request.
+Waiting for a free connection gives up after ``timeout`` seconds with
+PoolTimeout instead of blocking the worker for good.
+
+``track()`` starts counting the statements executed and rows fetched through
+pooled connections on the calling thread, until ``untrack()``. The request
+metrics use it; untracked threads pay one thread-local lookup per statement.
+``track(detail=True)`` also keeps each distinct SQL text with its run count
+and first parameters, for the development-mode query audit (query_audit.py).
+"""
+import sqlite3, threading, time
+
+PRAGMAS = (
+    'PRAGMA journal_mode=WAL',
+    'PRAGMA synchronous=NORMAL',
+    'PRAGMA cache_size=-16000',        # ~16 MB page cache per connection
+    'PRAGMA mmap_size=268435456',      # 256 MB memory-mapped I/O
+    'PRAGMA temp_store=MEMORY',
+    'PRAGMA busy_timeout=5000',
+)
+
+_tracking = threading.local()
+
+
+class PoolTimeout(RuntimeError):
+    """No pooled connection came free within the pool's timeout."""
+
+
+class QueryStats:
+    __slots__ = ('statements', 'rows', 'queries')
+
+    def __init__(self):
+        self.statements = 0
+        self.rows       = 0
+        self.queries    = None         # {sql: [count, first params]} with track(detail=True)
+
+    def record(self, sql, params):
+        seen = self.queries.get(sql)
+        if seen is None:
+            self.queries[sql] = [1, params]
+        else:
+            seen[0] += 1
+
+
+def connect(path, statement_cache=256):
+    """A new connection with the pool's pragmas (for long-lived helpers that shouldn't hold a pool slot)."""
+    raw = sqlite3.connect(path, check_same_thread=False, cached_statements=statement_cache)
+    raw.row_factory = sqlite3.Row
+    for p in PRAGMAS:
+        raw.execute(p)
+    return raw
+
+
+def track(detail=False):
+    """Count statements/rows on this thread from now on; returns the (live) QueryStats.
+
+    A second call while already tracking joins the running count (and turns on
+    ``detail`` if asked), so the metrics and the query audit can share one request.
+    """
+    stats = getattr(_tracking, 'stats', None)
+    if stats is None:
+        stats = _tracking.stats = QueryStats()
+    if detail and stats.queries is None:
+        stats.queries = {}
+    return stats
+
+def untrack():
+    """Stop counting on this thread; returns the QueryStats, or None if it was not tracking."""
+    stats = getattr(_tracking, 'stats', None)
+    _tracking.stats = None
+    return stats
+
+def current():
+    """This thread's running QueryStats, or None."""
+    return getattr(_tracking, 'stats', None)
+
+def explain(conn, sql, params=()):
+    """EXPLAIN QUERY PLAN rows as (id, parent, detail) tuples; never counted by tracking."""
+    raw = conn._raw if isinstance(conn, PooledConnection) else conn
+    return [(r[0], r[1], r[3]) for r in raw.execute('EXPLAIN QUERY PLAN ' + sql, params)]
+
+def table_names(conn):
+    """Names of the ordinary tables in the database; never counted by tracking."""
+    raw = conn._raw if isinstance(conn, PooledConnection) else conn
+    return {r[0] for r in raw.execute("SELECT name FROM sqlite_master WHERE type='table'")}
+
+
+class _CountingCursor:
+    """Cursor proxy that adds fetched rows to a QueryStats."""
+    __slots__ = ('_cur', '_stats')
+
+    def __init__(self, cur, stats):
+        self._cur   = cur
+        self._stats = stats
+
+    def fetchone(self):
+        row = self._cur.fetchone()
+        if row is not None:
+            self._stats.rows += 1
+        return row
+
+    def fetchmany(self, *size):
+        rows = self._cur.fetchmany(*size)
+        self._stats.rows += len(rows)
+        return rows
+
+    def fetchall(self):
+        rows = self._cur.fetchall()
+        self._stats.rows += len(rows)
+        return rows
+
+    def __iter__(self):
+        return self
+
+    def __next__(self):
+        row = next(self._cur)
+        self._stats.rows += 1
+        return row
+
+    def __getattr__(self, name):
+        return getattr(self._cur, name)
+
+
+class PooledConnection:
+    """Thin proxy around sqlite3.Connection — close() hands it back to the pool."""
+
+    def __init__(self, pool, raw):
+        self._pool = pool
+        self._raw  = raw
+
+    def execute(self, sql, params=()):
+        stats = getattr(_tracking, 'stats', None)
+        if stats is None:
+            return self._raw.execute(sql, params)
+        stats.statements += 1
+        if stats.queries is not None:
+            stats.record(sql, params)
+        return _CountingCursor(self._raw.execute(sql, params), stats)
+
+    def executemany(self, sql, seq):
+        stats = getattr(_tracking, 'stats', None)
+        if stats is not None:
+            stats.statements += 1
+            if stats.queries is not None:
+                stats.record(sql, None)
+        return self._raw.executemany(sql, seq)
+
+    def executescript(self, script):
+        stats = getattr(_tracking, 'stats', None)
+        if stats is not None:
+            stats.statements += 1
+        return self._raw.executescript(script)
+
+    def cursor(self):
+        return self._raw.cursor()
+
+    def commit(self):
+        self._raw.commit()
+
+    def rollback(self):
+        self._raw.rollback()
+
+    def close(self):
+        self._pool.release()
+
+    def __getattr__(self, name):
+        return getattr(self._raw, name)
+
+    def __enter__(self):
+        self._raw.__enter__()
+        return self
+
+    def __exit__(self, *exc):
+        return self._raw.__exit__(*exc)
+
+
+class ConnectionPool:
+    """Thread-affine pool: nested get_db() calls on one thread share a connection."""
+
+    def __init__(self, path, max_size=8, statement_cache=256, timeout=30.0):
+        self.path            = path
+        self.max_size        = max_size
+        self.statement_cache = statement_cache
+        self.timeout         = timeout
+        self._idle   = []
+        self._open   = 0
+        self._local  = threading.local()
+        self._cond   = threading.Condition()
+        self._stats  = {'checkouts': 0, 'waits': 0, 'wait_time_ms': 0.0, 'opened': 0, 'timeouts': 0}
+
+    def _connect(self):
+        return connect(self.path, self.statement_cache)
+
+    def connection(self):
+        held = getattr(self._local, 'held', None)
+        if held:
+            held[1] += 1
+            return held[0]
+
+        start = time.perf_counter()
+        waited = False
+        with self._cond:
+            while not self._idle and self._open >= self.max_size:
+                waited = True
+                remaining = start + self.timeout - time.perf_counter()
+                if remaining <= 0:
+                    self._stats['timeouts'] += 1
+                    raise PoolTimeout(f'No database connection free after {self.timeout}s '
+                                      f'({self.max_size} in use)')
+                self._cond.wait(remaining)
+            raw = self._idle.pop() if self._idle else None
+            if raw is None:
+                self._open += 1
+                self._stats['opened'] += 1
+            self._stats['checkouts'] += 1
+            if waited:
+                self._stats['waits'] += 1
+                self._stats['wait_time_ms'] += (time.perf_counter() - start) * 1000
+        if raw is None:
+            try:
+                raw = self._connect()
+            except Exception:
+                with self._cond:
+                    self._open -= 1
+                    self._cond.notify()
+                raise
+
+        conn = PooledConnection(self, raw)
+        self._local.held = [conn, 1]
+        return conn
+
+    def release(self):
+        held = getattr(self._local, 'held', None)
+        if not held:
+            return
+        held[1] -= 1
+        if held[1] > 0:
+            return
+        self._local.held = None
+        raw = held[0]._raw
+        if raw.in_transaction:
+            raw.rollback()             # never leak a half-finished write to the next borrower
+        with self._cond:
+            self._idle.append(raw)
+            self._cond.notify()
+
+    def release_all(self):
+        """Return this thread's connection (rolled back) whatever its nesting depth — request teardown."""
+        held = getattr(self._local, 'held', None)
+        if held:
+            held[1] = 1
+            self.release()
+
+    def close_all(self):
+        """Close idle connections (used before forking and at shutdown)."""
+        with self._cond:
+            for raw in self._idle:
+                raw.close()
+            self._open -= len(self._idle)
+            self._idle = []
+
+    def stats(self):
+        with self._cond:
+            s = dict(self._stats)
+            s['open_connections'] = self._open
+            s['idle_connections'] = len(self._idle)
+            s['in_use']           = self._open - len(self._idle)
+            s['max_size']         = self.max_size
+        s['avg_wait_ms'] = round(s['wait_time_ms'] / s['waits'], 3) if s['waits'] else 0.0
+        s['wait_time_ms'] = round(s['wait_time_ms'], 3)
+        return s
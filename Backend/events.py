@@ -0,0 +1,214 @@
+"""Publish/subscribe bus behind the /api/events server-sent-event stream.
+
+Write endpoints publish small deltas after they commit. Each delta has a topic
+(``outpass``, ``onduty``, ``helpdesk``, ``teacher_status``), a type
+(``created`` / ``updated``) and the changed row. The dashboards apply these
+deltas instead of re-downloading whole lists.
+
+Events go through the ``event_log`` table, so every worker process sees every
+write: publish() appends a row, and in each process that has subscribers one
+poller thread reads the new rows (every ``poll_interval`` seconds, or at once
+after a local publish) and queues them for its subscribers. SQLite's single
+writer makes the log ids increase in commit order, and AUTOINCREMENT never
+reuses an id, so they stay valid across restarts and deploys. The last
+``history`` rows are kept so that a reconnecting EventSource (which sends
+``Last-Event-ID``) misses nothing.
+
+A subscriber that falls further behind than its queue allows, that
+reconnects after its events have left the log, or that sends an id the log
+never issued (the database was replaced), gets one ``resync`` event telling
+it to re-fetch.
+
+Each open stream holds a server thread until the client goes away, so one
+process serves at most ``max_subscribers`` streams; stream() raises BusFull
+beyond that and the other request threads stay free.
+"""
+import json, logging, os, queue, sqlite3, threading
+
+TOPICS = ('outpass', 'onduty', 'helpdesk', 'teacher_status')
+
+SCHEMA_SQL = [
+    '''CREATE TABLE IF NOT EXISTS event_log (
+        id INTEGER PRIMARY KEY AUTOINCREMENT, topic TEXT NOT NULL, payload TEXT NOT NULL,
+        created_at DATETIME DEFAULT CURRENT_TIMESTAMP)''',
+]
+
+PRUNE_EVERY = 100                 # publishes between trims of the log down to ``history`` rows
+
+log = logging.getLogger('smartcampus.events')
+
+
+class BusFull(RuntimeError):
+    """This process already streams to ``max_subscribers`` clients."""
+
+
+def format_sse(payload, event=None, event_id=None):
+    data = payload if isinstance(payload, str) else json.dumps(payload, default=str)
+    return ((f"id: {event_id}\n" if event_id is not None else '') +
+            (f"event: {event}\n" if event else '') + f"data: {data}\n\n")
+
+
+class Subscription:
+    __slots__ = ('topics', 'queue', 'lagged')
+
+    def __init__(self, topics, size):
+        self.topics = frozenset(topics)
+        self.queue  = queue.Queue(size)
+        self.lagged = False
+
+
+class EventBus:
+
+    def __init__(self, connect, history=1000, queue_size=256, poll_interval=0.25, max_subscribers=None):
+        self.connect         = connect            # () -> new sqlite3 connection to the campus database
+        self.history         = history
+        self.queue_size      = queue_size
+        self.poll_interval   = poll_interval
+        self.max_subscribers = max_subscribers
+        self._subscribers = set()
+        self._last_id     = 0                     # newest log id handed to this process's subscribers
+        self._reader      = None                  # poller + replay connection, used under _lock only
+        self._writer      = None
+        self._pid         = None                  # connections and the poller belong to one process
+        self._poller      = None
+        self._wake        = threading.Event()
+        self._lock        = threading.Lock()
+        self._write_lock  = threading.Lock()
+        self._stats       = {'published': 0, 'delivered': 0, 'replayed': 0, 'resyncs': 0, 'rejected': 0}
+
+    def _fork_check(self):
+        # after a fork (gunicorn preload) the parent's connections and thread are not ours
+        if self._pid != os.getpid():
+            self._pid, self._reader, self._writer, self._poller = os.getpid(), None, None, None
+
+    def publish(self, topic, type, data):
+        """Append ``data`` to the log for every subscriber of ``topic`` in any process; returns the event id."""
+        return self.publish_many(topic, type, [data])[0]
+
+    def publish_many(self, topic, type, rows):
+        """publish() for several rows in one transaction; returns their event ids."""
+        payloads = [json.dumps({'type': type, 'data': data}, default=str) for data in rows]
+        ids = []
+        with self._write_lock:
+            self._fork_check()
+            if self._writer is None:
+                self._writer = self.connect()
+            with self._writer:
+                for payload in payloads:
+                    ids.append(self._writer.execute('INSERT INTO event_log (topic, payload) VALUES (?, ?)',
+                                                    (topic, payload)).lastrowid)
+                if ids and ids[-1] // PRUNE_EVERY != (ids[0] - 1) // PRUNE_EVERY:
+                    self._writer.execute('DELETE FROM event_log WHERE id <= ?', (ids[-1] - self.history,))
+        with self._lock:
+            self._stats['published'] += len(ids)
+        self._wake.set()
+        return ids
+
+    # ── delivery (one poller thread per process, while anyone listens) ──
+    def _start(self):
+        """Under _lock: open the reader and start the poller if this process has none yet."""
+        self._fork_check()
+        if self._reader is None:
+            self._reader  = self.connect()
+            self._last_id = self._reader.execute('SELECT COALESCE(MAX(id), 0) FROM event_log').fetchone()[0]
+        if self._poller is None:
+            self._poller = threading.Thread(target=self._poll, name='event-poller', daemon=True)
+            self._poller.start()
+
+    def _poll(self):
+        while True:
+            self._wake.wait(self.poll_interval)
+            self._wake.clear()
+            with self._lock:
+                if self._pid != os.getpid() or self._poller is not threading.current_thread():
+                    return
+                if not self._subscribers:
+                    self._poller = None             # subscribe() starts a new one
+                    return
+                try:
+                    rows = self._reader.execute('SELECT id, topic, payload FROM event_log WHERE id > ? ORDER BY id',
+                                                (self._last_id,)).fetchall()
+                except sqlite3.Error as e:
+                    log.warning('event log poll failed: %s', e)
+                    continue
+                for event in rows:
+                    self._fan_out(tuple(event))
+                if rows:
+                    self._last_id = rows[-1][0]
+
+    def _fan_out(self, event):
+        for sub in self._subscribers:
+            if event[1] not in sub.topics or sub.lagged:
+                continue
+            try:
+                sub.queue.put_nowait(event)
+                self._stats['delivered'] += 1
+            except queue.Full:
+                sub.lagged = True                   # the stream sends 'resync' and the client reloads
+
+    def subscribe(self, topics, last_id=None):
+        """Register a subscriber; logged events after ``last_id`` are queued first."""
+        sub = Subscription(topics, self.queue_size)
+        with self._lock:
+            self._start()
+            if last_id is not None and last_id > self._last_id:
+                sub.lagged = True                   # an id this log never issued: we can't tell what it missed
+            elif last_id is not None and last_id < self._last_id:
+                oldest = self._reader.execute('SELECT MIN(id) FROM event_log').fetchone()[0]
+                missed = self._reader.execute(
+                    '''SELECT id, topic, payload FROM event_log WHERE id > ? AND id <= ?
+                       AND topic IN (SELECT value FROM json_each(?)) ORDER BY id LIMIT ?''',
+                    (last_id, self._last_id, json.dumps(sorted(sub.topics)), self.queue_size + 1)).fetchall()
+                if oldest is None or last_id < oldest - 1 or len(missed) > self.queue_size:
+                    sub.lagged = True
+                else:
+                    for e in missed:
+                        sub.queue.put_nowait(tuple(e))
+                    self._stats['replayed'] += len(missed)
+            self._subscribers.add(sub)
+        return sub
+
+    def unsubscribe(self, sub):
+        with self._lock:
+            self._subscribers.discard(sub)
+
+    def stream(self, topics, last_id=None, heartbeat=15):
+        """SSE text chunks for ``topics``; a comment line every ``heartbeat`` seconds keeps proxies from closing it.
+
+        Raises BusFull straight away when this process is at ``max_subscribers``.
+        The subscription itself starts with the generator, so a response closed
+        before its first chunk never registers one (and can't leak it).
+        """
+        with self._lock:
+            if self.max_subscribers is not None and len(self._subscribers) >= self.max_subscribers:
+                self._stats['rejected'] += 1
+                raise BusFull(f'{self.max_subscribers} live-update streams already open')
+
+        def events():
+            sub = self.subscribe(topics, last_id)
+            try:
+                yield "retry: 3000\n\n"
+                while True:
+                    if sub.lagged:
+                        with self._lock:
+                            while not sub.queue.empty():
+                                sub.queue.get_nowait()
+                            sub.lagged = False
+                            self._stats['resyncs'] += 1
+                            last = self._last_id
+                        yield format_sse({'type': 'resync'}, 'resync', last)
+                        continue
+                    try:
+                        event_id, topic, payload = sub.queue.get(timeout=heartbeat)
+                    except queue.Empty:
+                        yield ": ping\n\n"
+                        continue
+                    yield format_sse(payload, topic, event_id)
+            finally:
+                self.unsubscribe(sub)
+        return events()
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, 'subscribers': len(self._subscribers),
+                    'last_id': self._last_id, 'history': self.history}
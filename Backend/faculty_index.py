@@ -0,0 +1,160 @@
+"""In-memory faculty name index for /api/teacher/find and the chatbot's "where is".
+
+Names are split into tokens after stripping honorifics ("Dr.", "Prof.",
+"sir" …). A query token matches a teacher exactly or as a prefix of one of
+their name tokens; only if neither finds anything is it matched within a
+small edit distance (typo tolerance via a SymSpell-style deletion index, so
+no scan over all names). Every query token
+has to match; teachers are ranked by how well they did.
+
+The index only holds names. It is rebuilt when the ``teacher_names`` counter
+in data_versions moves (triggers on teachers insert/delete/rename), so status
+updates do not trigger a rebuild — status and roles are read fresh for the
+matched ids with one batched query.
+"""
+import bisect, heapq, json, re, threading
+
+HONORIFICS = {'dr','prof','professor','doctor','sir','mam','madam','maam','mr','mrs','ms','miss','shri','smt'}
+STOP_WORDS = {'where','is','find','locate','the','room','office','of','who','whos','teacher','faculty','please'}
+
+_TOKEN = re.compile(r'[a-z0-9]+')
+
+# exact > prefix > fuzzy, per query token
+EXACT, PREFIX, FUZZY = 3, 2, 1
+
+NAME_VERSION_SQL = [
+    f'''CREATE TRIGGER IF NOT EXISTS trg_version_teacher_names_{op} AFTER {op.upper()}{cols} ON teachers
+        BEGIN INSERT INTO data_versions (scope, version) VALUES ('teacher_names', 1)
+              ON CONFLICT(scope) DO UPDATE SET version=version+1; END'''
+    for op, cols in (('insert', ''), ('delete', ''), ('update', ' OF name'))
+]
+
+DETAILS_SQL = '''
+    SELECT t.id, t.teacher_id, t.name, t.email, t.department, t.designation, t.office_room,
+           (SELECT json_object('id', ts.id, 'teacher_id', ts.teacher_id, 'current_status', ts.current_status,
+                               'location', ts.location, 'available_from', ts.available_from,
+                               'available_to', ts.available_to)
+            FROM teacher_status ts WHERE ts.teacher_id=t.id) AS status,
+           (SELECT json_group_array(json_object('id', fr.id, 'teacher_id', fr.teacher_id, 'role_type', fr.role_type,
+                                                'role_name', fr.role_name, 'department', fr.department))
+            FROM faculty_roles fr WHERE fr.teacher_id=t.id) AS roles
+    FROM teachers t WHERE t.id IN (SELECT value FROM json_each(?))
+'''
+
+
+def tokens(text):
+    """Lower-cased name tokens with honorifics and filler words removed."""
+    return [t for t in _TOKEN.findall(text.lower()) if t not in HONORIFICS and t not in STOP_WORDS]
+
+
+def _max_distance(token):
+    return 0 if len(token) < 4 else 1 if len(token) < 7 else 2
+
+
+def _deletes(token, distance):
+    out, frontier = {token}, {token}
+    for _ in range(distance):
+        frontier = {w[:i] + w[i+1:] for w in frontier for i in range(len(w))}
+        out |= frontier
+    return out
+
+
+def _edit_distance(a, b, limit):
+    """Damerau-Levenshtein (optimal string alignment); returns limit+1 once it is exceeded."""
+    if abs(len(a) - len(b)) > limit:
+        return limit + 1
+    prev2, prev = None, list(range(len(b) + 1))
+    for i, ca in enumerate(a, 1):
+        cur = [i] + [0] * len(b)
+        for j, cb in enumerate(b, 1):
+            cur[j] = min(prev[j] + 1, cur[j-1] + 1, prev[j-1] + (ca != cb))
+            if i > 1 and j > 1 and ca == b[j-2] and a[i-2] == cb:
+                cur[j] = min(cur[j], prev2[j-2] + 1)
+        if min(cur) > limit:
+            return limit + 1
+        prev2, prev = prev, cur
+    return prev[-1]
+
+
+class FacultyIndex:
+
+    def __init__(self):
+        self.version = None
+        self.names   = {}       # id -> display name
+        self._postings = {}     # token -> set(ids)
+        self._sorted   = []     # sorted distinct tokens (prefix lookup)
+        self._deletes  = {}     # deletion variant -> set(tokens)
+        self._lock     = threading.Lock()
+
+    def build(self, rows, version=None):
+        """rows: iterable of (id, name)."""
+        names, postings, deletes = {}, {}, {}
+        for tid, name in rows:
+            names[tid] = name
+            for tok in tokens(name):
+                postings.setdefault(tok, set()).add(tid)
+        for tok in postings:
+            for d in _deletes(tok, _max_distance(tok)):
+                deletes.setdefault(d, set()).add(tok)
+        with self._lock:
+            self.names, self._postings, self._deletes = names, postings, deletes
+            self._sorted  = sorted(postings)
+            self.version  = version
+
+    def refresh(self, conn):
+        """Rebuild from the teachers table if their names changed since the last build."""
+        row = conn.execute("SELECT version FROM data_versions WHERE scope='teacher_names'").fetchone()
+        version = row[0] if row else 0
+        if version != self.version:
+            self.build(conn.execute('SELECT id, name FROM teachers').fetchall(), version)
+
+    def _token_matches(self, q):
+        """{teacher id: score} for one query token."""
+        found = {}
+        def add(toks, score):
+            for tok in toks:
+                for tid in self._postings.get(tok, ()):
+                    if found.get(tid, 0) < score:
+                        found[tid] = score
+        add([q] if q in self._postings else [], EXACT)
+        i = bisect.bisect_left(self._sorted, q)
+        prefixed = []
+        while i < len(self._sorted) and self._sorted[i].startswith(q):
+            prefixed.append(self._sorted[i]); i += 1
+        add(prefixed, PREFIX)
+        limit = _max_distance(q)
+        if limit and not found:             # typo tolerance only when nothing matches as typed
+            candidates = set()
+            for d in _deletes(q, limit):
+                candidates |= self._deletes.get(d, set())
+            add([c for c in candidates if _edit_distance(q, c, limit) <= limit], FUZZY)
+        return found
+
+    def search(self, query, limit=10):
+        """Ranked [(teacher id, score)]; every query token must match the teacher's name."""
+        q_tokens = tokens(query)
+        if not q_tokens:
+            return []
+        with self._lock:
+            scores = None
+            for q in q_tokens:
+                found = self._token_matches(q)
+                if scores is None:
+                    scores = found
+                else:
+                    scores = {tid: s + found[tid] for tid, s in scores.items() if tid in found}
+                if not scores:
+                    return []
+            names = self.names
+        return heapq.nsmallest(limit, scores.items(), key=lambda x: (-x[1], names[x[0]]))
+
+
+def details(conn, ids):
+    """Teacher rows (no password) with 'status' and 'roles' for ``ids``, in the given order."""
+    by_id = {}
+    for r in conn.execute(DETAILS_SQL, (json.dumps(list(ids)),)):
+        t = dict(r)
+        t['status'] = json.loads(t['status']) if t['status'] else {}
+        t['roles']  = json.loads(t['roles'])
+        by_id[t['id']] = t
+    return [by_id[i] for i in ids if i in by_id]
@@ -0,0 +1,41 @@
+"""Gunicorn settings: preforked workers sharing the app's read-only data.
+
+Usage:  gunicorn -c gunicorn.conf.py wsgi:app
+
+With preload_app the master imports wsgi.py and create_app() builds everything
+read-only: the migrations, the recommender matrices, the intent tables and
+SYSTEM_PROMPT, and the timetable, faculty and cohort indexes. The workers
+forked afterwards share those pages copy-on-write. gc.freeze() moves the
+objects out of the collector's generations, so a collection in a worker does
+not write to them and force private copies. Each worker then opens its own
+pooled SQLite connections.
+
+Live updates reach every worker through the event_log table (events.py).
+An /api/events stream holds one of its worker's threads for as long as the
+dashboard stays open, so each worker gets EVENT_MAX_STREAMS threads for
+streams on top of DB_POOL_SIZE for ordinary requests. The app answers 503
+beyond EVENT_MAX_STREAMS streams, so open dashboards can't starve the API.
+
+Environment: PORT / BIND, WEB_CONCURRENCY (workers), WORKER_THREADS, PRELOAD=0
+(every worker builds its own copy, for comparison; see benchmarks/bench_startup.py).
+"""
+import gc, os
+
+bind         = os.getenv('BIND', f"0.0.0.0:{os.getenv('PORT', '5000')}")
+workers      = int(os.getenv('WEB_CONCURRENCY', str(min(os.cpu_count() or 1, 4))))
+worker_class = 'gthread'
+threads      = int(os.getenv('WORKER_THREADS', str(int(os.getenv('DB_POOL_SIZE', '8')) +
+                                                   int(os.getenv('EVENT_MAX_STREAMS', '8')))))
+preload_app  = os.getenv('PRELOAD', '1') != '0'
+timeout      = 60
+keepalive    = 5
+
+
+def when_ready(server):
+    # Runs in the master once the app is loaded, before any worker is forked.
+    gc.collect()
+    gc.freeze()
+
+
+def post_worker_init(worker):
+    worker.log.info('Worker ready (pid: %s)', worker.pid)
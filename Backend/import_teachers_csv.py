@@ -1,7 +1,9 @@
-import sqlite3, os, csv
+import sqlite3, os
+import importer
 
 DB_PATH      = os.path.join(os.path.dirname(__file__), 'data', 'campus.db')
 TEACHERS_CSV = os.path.join(os.path.dirname(__file__), 'teachers.csv')
+REJECT_PATH  = os.path.join(os.path.dirname(__file__), 'teachers_rejected.csv')
 
 def main():
     # ── Checks ────────────────────────────────────────────────────
@@ -49,76 +51,16 @@ def main():
     ''')
     conn.commit()
 
-    added   = 0
-    skipped = 0
-
-    with open(TEACHERS_CSV, newline='', encoding='utf-8') as f:
-        reader = csv.DictReader(f)
-
-        for row in reader:
-            tid = row['teacher_id'].strip()
-
-            # Skip if already exists
-            exists = c.execute(
-                'SELECT id FROM teachers WHERE teacher_id=?', (tid,)
-            ).fetchone()
-
-            if exists:
-                print(f"  Skipping {tid} — already exists")
-                skipped += 1
-                continue
-
-            # ── Insert teacher ─────────────────────────────────────
-            c.execute('''
-                INSERT INTO teachers
-                    (teacher_id, name, email, department, designation, office_room, password)
-                VALUES (?,?,?,?,?,?,?)
-            ''', (
-                tid,
-                row['name'].strip(),
-                row['email'].strip(),
-                row['department'].strip(),
-                row['designation'].strip(),
-                row['office_room'].strip(),
-                row['password'].strip()
-            ))
-            teacher_db_id = c.lastrowid
-
-            # ── Insert role ────────────────────────────────────────
-            if row.get('role_type','').strip():
-                c.execute('''
-                    INSERT INTO faculty_roles (teacher_id, role_type, role_name, department)
-                    VALUES (?,?,?,?)
-                ''', (
-                    teacher_db_id,
-                    row['role_type'].strip(),
-                    row['role_name'].strip(),
-                    row['department'].strip()
-                ))
-
-            # ── Insert default status ──────────────────────────────
-            c.execute('''
-                INSERT OR IGNORE INTO teacher_status
-                    (teacher_id, current_status, location, available_from, available_to)
-                VALUES (?,?,?,?,?)
-            ''', (
-                teacher_db_id,
-                'Available',
-                row['office_room'].strip(),
-                '9:00 AM',
-                '5:00 PM'
-            ))
-
-            added += 1
-            print(f"  ✅ Added: {tid} — {row['name']} ({row['role_name']})")
-
-    conn.commit()
+    report = importer.import_teachers(conn, TEACHERS_CSV, reject_path=REJECT_PATH)
     conn.close()
 
     print(f"\n{'='*50}")
     print(f"  Import Complete!")
-    print(f"  Added   : {added} teachers")
-    print(f"  Skipped : {skipped} (already existed)")
+    print(f"  Added    : {report['added']} teachers")
+    print(f"  Skipped  : {report['skipped']} (already existed)")
+    print(f"  Rejected : {report['rejected']}" +
+          (f" (see {os.path.basename(report['reject_file'])})" if report['reject_file'] else ""))
+    print(f"  Speed    : {report['rows_per_sec']} rows/s ({report['seconds']}s)")
     print(f"\n  All teacher passwords: teacher123")
     print(f"\n  Teacher IDs:")
     print(f"  T001 — Dr. Rajesh Kumar     (HOD)")
@@ -0,0 +1,240 @@
+"""Streaming CSV import engine shared by app.py, import_csv.py and import_teachers_csv.py.
+
+Rows are read in chunks, validated, deduplicated against the keys already in
+the database (loaded once) and written with executemany — one transaction per
+chunk. Invalid rows go to an optional reject CSV with the reason attached.
+"""
+import csv, json, os, random, time
+from itertools import islice
+
+SUBJECTS_BY_DEPT = {
+    "CSE":  ["Data Structures","Database Systems","Computer Networks","Operating Systems","Software Engineering"],
+    "ECE":  ["Circuit Theory","Digital Electronics","Signals & Systems","Microprocessors","Communication Systems"],
+    "MECH": ["Engineering Mechanics","Thermodynamics","Fluid Mechanics","Manufacturing Processes","Machine Design"],
+    "CIVIL":["Surveying","Structural Analysis","Concrete Technology","Geotechnical Engineering","Fluid Mechanics"],
+    "EEE":  ["Circuit Analysis","Electrical Machines","Power Systems","Control Systems","Power Electronics"],
+    "IT":   ["Web Technologies","Database Management","Computer Networks","Software Testing","Cloud Computing"],
+    "AIDS": ["Machine Learning","Data Analytics","Deep Learning","Natural Language Processing","Computer Vision"],
+    "CSBS": ["Business Analytics","Data Science","Blockchain","IoT","Cyber Security"],
+}
+GRADES      = ["A+","A","B+","B","C"]
+GRADE_MARKS = {
+    "A+": (22, 80, 25, 100),   # (internal_min, external_min, internal_max, external_max)
+    "A":  (18, 68, 24,  85),
+    "B+": (16, 56, 22,  75),
+    "B":  (14, 45, 20,  65),
+    "C":  (12, 35, 18,  55),
+}
+DAYS     = ["MON","TUE","WED","THU","FRI"]
+SLOTS    = ["8.00-8.50","8.50-9.40","9.50-10.40","10.40-11.30","12.20-1.10","1.10-2.00"]
+TEACHERS = ["Dr. Rajesh Kumar","Prof. Priya Sharma","Dr. Suresh Reddy","Prof. Anita Desai","Dr. Vikram Singh"]
+
+STUDENT_FIELDS = ['reg_no','name','email','phone','department','year','semester','section','hostel','is_hosteler','password']
+TEACHER_FIELDS = ['teacher_id','name','email','department','designation','office_room','password']
+
+
+# ─── GENERATED ACADEMIC DATA ─────────────────────────────────────────
+# Each generator returns the rows to insert for one student.
+
+def gen_attendance(sid, subjects, dept, rng):
+    rows = []
+    for subj in subjects:
+        total    = rng.choice([38,40,42,44])
+        pct_val  = rng.choices([rng.uniform(60,74), rng.uniform(75,95)], weights=[25,75])[0]
+        attended = max(0, min(int(pct_val/100*total), total))
+        rows.append((sid, subj, total, attended, round(attended/total*100, 1)))
+    return rows
+
+def gen_marks(sid, subjects, dept, rng):
+    rows = []
+    for subj in subjects:
+        grade = rng.choices(GRADES, weights=[20,30,25,15,10])[0]
+        i_min, e_min, i_max, e_max = GRADE_MARKS[grade]
+        internal = rng.randint(i_min, i_max)
+        external = rng.randint(e_min, e_max)
+        rows.append((sid, subj, internal, external, internal+external, grade, rng.choice([3,4])))
+    return rows
+
+def gen_fees(sid, subjects, dept, rng):
+    total_fee = rng.choice([85000,90000,95000,100000])
+    paid      = rng.randint(0, total_fee)
+    pending   = total_fee - paid
+    status    = "Paid" if pending == 0 else ("Partial" if paid > 0 else "Pending")
+    return [(sid, total_fee, paid, pending, status, "2024-11-30")]
+
+def gen_timetable(sid, subjects, dept, rng):
+    return [(sid, day, slot, rng.choice(subjects), rng.choice(TEACHERS),
+             f"{dept}-{rng.randint(1,5)}0{rng.randint(1,9)}")
+            for day in DAYS for slot in rng.sample(SLOTS, k=rng.randint(3,5))]
+
+# table → (insert statement, generator)
+GENERATED_TABLES = {
+    'attendance': ('INSERT INTO attendance (student_id,subject,total_classes,attended_classes,percentage) VALUES (?,?,?,?,?)',
+                   gen_attendance),
+    'marks':      ('INSERT INTO marks (student_id,subject,internal_marks,external_marks,total_marks,grade,credits) VALUES (?,?,?,?,?,?,?)',
+                   gen_marks),
+    'fees':       ('INSERT INTO fees (student_id,total_fee,paid_amount,pending_amount,status,due_date) VALUES (?,?,?,?,?,?)',
+                   gen_fees),
+    'timetable':  ('INSERT INTO timetable (student_id,day,time_slot,subject,teacher_name,room) VALUES (?,?,?,?,?,?)',
+                   gen_timetable),
+}
+
+def generate_rows(students, rng, tables=GENERATED_TABLES):
+    """students: iterable of (id, department) → {table: [rows]} ready for executemany."""
+    out = {t: [] for t in tables}
+    for sid, dept in students:
+        dept     = dept or 'CSE'
+        subjects = SUBJECTS_BY_DEPT.get(dept, SUBJECTS_BY_DEPT['CSE'])
+        for t in tables:
+            out[t].extend(GENERATED_TABLES[t][1](sid, subjects, dept, rng))
+    return out
+
+
+# ─── ROW VALIDATION ──────────────────────────────────────────────────
+
+def _clean_student(row):
+    missing = [f for f in ('reg_no','name','department','password') if not (row.get(f) or '').strip()]
+    if missing:
+        raise ValueError(f"missing {', '.join(missing)}")
+    try:
+        year, sem, hosteler = int(row['year']), int(row['semester']), int(row.get('is_hosteler') or 0)
+    except (TypeError, ValueError):
+        raise ValueError('year/semester/is_hosteler must be integers')
+    if hosteler not in (0, 1):
+        raise ValueError('is_hosteler must be 0 or 1')
+    s = lambda f: (row.get(f) or '').strip()
+    return (s('reg_no'), s('name'), s('email'), s('phone'), s('department'),
+            year, sem, s('section'), s('hostel'), hosteler, s('password'))
+
+def _clean_teacher(row):
+    missing = [f for f in ('teacher_id','name','password') if not (row.get(f) or '').strip()]
+    if missing:
+        raise ValueError(f"missing {', '.join(missing)}")
+    return tuple((row.get(f) or '').strip() for f in TEACHER_FIELDS)
+
+
+# ─── ENGINE ──────────────────────────────────────────────────────────
+
+class _Rejects:
+    """Lazily-opened reject CSV: original columns + an `error` column."""
+
+    def __init__(self, path):
+        self.path, self.count, self._f, self._w = path, 0, None, None
+
+    def add(self, row, error):
+        self.count += 1
+        if not self.path:
+            return
+        if self._w is None:
+            self._f = open(self.path, 'w', newline='', encoding='utf-8')
+            self._w = csv.DictWriter(self._f, fieldnames=[k for k in row if k is not None] + ['error'],
+                                     extrasaction='ignore')
+            self._w.writeheader()
+        self._w.writerow({**row, 'error': error})
+
+    def close(self):
+        if self._f:
+            self._f.close()
+
+
+def _chunks(reader, size):
+    while True:
+        chunk = list(islice(reader, size))
+        if not chunk:
+            return
+        yield chunk
+
+def _ids_for(conn, table, key, values):
+    return {r[0]: r[1] for r in conn.execute(
+        f'SELECT {key}, id FROM {table} WHERE {key} IN (SELECT value FROM json_each(?))', (json.dumps(values),))}
+
+def _run(conn, csv_path, table, key, clean, write_chunk, chunk_size, reject_path, progress):
+    start   = time.perf_counter()
+    report  = {'read': 0, 'added': 0, 'skipped': 0, 'rejected': 0}
+    rejects = _Rejects(reject_path)
+    seen    = {r[0] for r in conn.execute(f'SELECT {key} FROM {table}')}
+    if conn.in_transaction:
+        conn.commit()
+    try:
+        with open(csv_path, newline='', encoding='utf-8') as f:
+            for chunk in _chunks(csv.DictReader(f), chunk_size):
+                batch = []
+                for row in chunk:
+                    report['read'] += 1
+                    try:
+                        values = clean(row)
+                    except (ValueError, KeyError) as e:
+                        rejects.add(row, str(e))
+                        continue
+                    if values[0] in seen:
+                        report['skipped'] += 1
+                        continue
+                    seen.add(values[0])
+                    batch.append(values)
+                if not batch:
+                    continue
+                conn.execute('BEGIN')
+                try:
+                    write_chunk(conn, batch)
+                    conn.commit()
+                except Exception:
+                    conn.rollback()
+                    raise
+                report['added'] += len(batch)
+                if progress:
+                    progress(report)
+    finally:
+        rejects.close()
+    report['rejected']    = rejects.count
+    report['reject_file'] = reject_path if rejects.count and reject_path else None
+    elapsed = time.perf_counter() - start
+    report['seconds']      = round(elapsed, 3)
+    report['rows_per_sec'] = round(report['read'] / elapsed) if elapsed else report['read']
+    return report
+
+
+def import_students(conn, csv_path, chunk_size=1000, reject_path=None, generate=True, seed=None, progress=None):
+    """Import students.csv; with ``generate`` also creates attendance/marks/fees/timetable for new students."""
+    rng = random.Random(seed)
+
+    def write(conn, batch):
+        conn.executemany(f"INSERT INTO students ({','.join(STUDENT_FIELDS)}) VALUES ({','.join('?'*len(STUDENT_FIELDS))})",
+                         batch)
+        if generate:
+            ids = _ids_for(conn, 'students', 'reg_no', [b[0] for b in batch])
+            rows = generate_rows(((ids[b[0]], b[4]) for b in batch), rng)
+            for table, (sql, _) in GENERATED_TABLES.items():
+                conn.executemany(sql, rows[table])
+
+    return _run(conn, csv_path, 'students', 'reg_no', _clean_student, write, chunk_size, reject_path, progress)
+
+
+def import_teachers(conn, csv_path, chunk_size=1000, reject_path=None, progress=None):
+    """Import teachers.csv with their faculty role (if any) and a default status row."""
+    roles = {}
+
+    def clean(row):
+        values = _clean_teacher(row)
+        if (row.get('role_type') or '').strip():
+            roles[values[0]] = (row['role_type'].strip(), (row.get('role_name') or '').strip(), values[3])
+        return values
+
+    def write(conn, batch):
+        conn.executemany(f"INSERT INTO teachers ({','.join(TEACHER_FIELDS)}) VALUES ({','.join('?'*len(TEACHER_FIELDS))})",
+                         batch)
+        ids = _ids_for(conn, 'teachers', 'teacher_id', [b[0] for b in batch])
+        conn.executemany('INSERT INTO faculty_roles (teacher_id,role_type,role_name,department) VALUES (?,?,?,?)',
+                         [(ids[b[0]], *roles[b[0]]) for b in batch if b[0] in roles])
+        conn.executemany('INSERT OR IGNORE INTO teacher_status (teacher_id,current_status,location,available_from,available_to) VALUES (?,?,?,?,?)',
+                         [(ids[b[0]], "Available", b[5], "9:00 AM", "5:00 PM") for b in batch])
+
+    return _run(conn, csv_path, 'teachers', 'teacher_id', clean, write, chunk_size, reject_path, progress)
+
+
+def format_report(label, report):
+    line = (f"  {label}: {report['added']} added, {report['skipped']} skipped, "
+            f"{report['rejected']} rejected — {report['read']} rows in {report['seconds']}s "
+            f"({report['rows_per_sec']} rows/s)")
+    if report['reject_file']:
+        line += f"\n  Rejected rows written to {os.path.basename(report['reject_file'])}"
+    return line
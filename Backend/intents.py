@@ -0,0 +1,125 @@
+"""Compiled keyword intent classifier for the rule-based chatbot.
+
+Every registered keyword from every intent is folded into ONE regular
+expression, built from a character trie so that shared prefixes are matched
+once. Classifying a message is a single ``finditer`` pass however many intents
+are registered. Matches are whole words or phrases: a keyword may take a plural
+``s``/``es``, and a trailing ``*`` makes it a prefix (``perform*`` matches
+"performance"). 'hi' therefore no longer fires inside "this".
+
+Each hit adds weight to its intents; multi-word phrases weigh more than
+single words. ``classify`` returns every matched intent ranked by score, with
+a confidence equal to its share of the total score.
+
+Usage:  python intents.py "am I safe from detention?"
+"""
+import re
+from collections import namedtuple
+
+Match = namedtuple('Match', 'intent score confidence keywords')
+
+# name → keywords, in priority order (earlier intents win ties)
+CAMPUS_INTENTS = {
+    'attendance': ['attendance','bunk*','absent','75','detention','detained','how many class','safe','present',
+                   'miss','missing','classes needed','will i pass','can i bunk','skip'],
+    'marks'     : ['mark','grade','cgpa','gpa','score','result','perform*','rank','how am i doing','doing well',
+                   'subject','internal','external'],
+    'outpass'   : ['outpass','outing','go out','leave','permission','exit'],
+    'fees'      : ['fee','money','pay','payment','due','pending','arrear'],
+    'exam'      : ['exam','test','hall ticket','schedule','when is'],
+    'find_teacher': ['where is','find','locate','room of','office of','sir','mam','professor','doctor','dr','prof'],
+    'hod'       : ['hod','head of department','department head'],
+    'hostel'    : ['hostel','warden','mess','room','accommodation','block'],
+    'timetable' : ['timetable','time table','class','today','tomorrow','schedule'],
+    'greeting'  : ['hello','hi','hey','good morning','good evening','what can','help me'],
+}
+
+
+def _trie_pattern(words):
+    """Regex alternation for ``words`` factored through a prefix trie."""
+    trie = {}
+    for w in words:
+        node = trie
+        for ch in w:
+            node = node.setdefault(ch, {})
+        node[''] = True
+
+    def emit(node):
+        end  = '' in node
+        alts = [re.escape(ch) + emit(child) for ch, child in sorted(node.items()) if ch]
+        if not alts:
+            return ''
+        body = alts[0] if len(alts) == 1 else '(?:' + '|'.join(alts) + ')'
+        if end:
+            return '(?:' + body + ')?'
+        return body
+
+    return emit(trie)
+
+
+class IntentEngine:
+
+    def __init__(self, intents=None):
+        self._intents  = {}        # name -> (priority, [keywords])
+        self._regex    = None
+        self._phrases  = {}        # normalised keyword -> [(intent, weight)]
+        self._prefixes = {}
+        for name, keywords in (intents or {}).items():
+            self.register(name, keywords)
+
+    def register(self, name, keywords):
+        """Add (or extend) an intent. The combined pattern is rebuilt on the next classify()."""
+        priority, existing = self._intents.get(name, (len(self._intents), []))
+        self._intents[name] = (priority, existing + [k.lower().strip() for k in keywords])
+        self._regex = None
+
+    @property
+    def names(self):
+        return sorted(self._intents, key=lambda n: self._intents[n][0])
+
+    def _compile(self):
+        phrases, prefixes = {}, {}
+        for name, (_, keywords) in self._intents.items():
+            for kw in keywords:
+                table = prefixes if kw.endswith('*') else phrases
+                kw    = kw.rstrip('*')
+                table.setdefault(kw, []).append((name, len(kw.split())))
+        exact  = _trie_pattern(phrases)
+        prefix = _trie_pattern(prefixes)
+        parts  = []
+        if exact:
+            parts.append(f'(?P<w>{exact})(?:e?s)?(?![a-z0-9])')
+        if prefix:
+            parts.append(f'(?P<p>{prefix})[a-z0-9]*')
+        self._phrases, self._prefixes = phrases, prefixes
+        self._regex = re.compile(r'(?<![a-z0-9])(?:' + '|'.join(parts) + ')') if parts else re.compile(r'(?!)')
+
+    def classify(self, message):
+        """Ranked [Match(intent, score, confidence, keywords)] for ``message``; [] when nothing matches."""
+        if self._regex is None:
+            self._compile()
+        scores, hits = {}, {}
+        for m in self._regex.finditer(message.lower()):
+            kw      = m.group('w') if m.lastgroup == 'w' else m.group('p')
+            targets = (self._phrases if m.lastgroup == 'w' else self._prefixes)[kw]
+            for name, weight in targets:
+                scores[name] = scores.get(name, 0) + weight
+                hits.setdefault(name, []).append(kw)
+        if not scores:
+            return []
+        total = sum(scores.values())
+        order = sorted(scores, key=lambda n: (-scores[n], self._intents[n][0]))
+        return [Match(n, scores[n], round(scores[n] / total, 3), hits[n]) for n in order]
+
+    def best(self, message):
+        ranked = self.classify(message)
+        return ranked[0] if ranked else None
+
+
+CAMPUS = IntentEngine(CAMPUS_INTENTS)
+
+
+if __name__ == '__main__':
+    import sys
+    for m in CAMPUS.classify(' '.join(sys.argv[1:]) or 'hi, am I safe from detention?'):
+        print(f"  {m.intent:<13} score={m.score:<3} confidence={m.confidence:<6} {m.keywords}")
@@ -0,0 +1,277 @@
+"""Pooled client for the OpenAI chat completions API.
+
+Keeps a small pool of keep-alive HTTP(S) connections to the upstream, caps
+the number of in-flight completions with a semaphore, retries transient
+failures (connection errors, 429, 5xx) with jittered exponential backoff and
+trips a circuit breaker after repeated failures so callers can fall back to
+the rule-based chatbot straight away.
+
+The base URL is configurable (OPENAI_BASE_URL), which also lets the client be
+pointed at a local stub server.
+
+``observer``, when set, is called as ``observer(kind, outcome, seconds)`` after
+every completion (kind: complete / stream; outcome: ok, error, busy,
+short_circuited or cancelled). The request metrics hook in here.
+"""
+import http.client, json, os, random, threading, time
+from contextlib import contextmanager
+from urllib.parse import urlsplit
+
+RETRY_STATUS = {429, 500, 502, 503, 504}
+
+
+class UpstreamError(Exception):
+    """The completion could not be obtained; callers fall back to rule-based replies."""
+
+class CircuitOpen(UpstreamError):
+    pass
+
+class UpstreamBusy(UpstreamError):
+    pass
+
+
+class CircuitBreaker:
+    """closed → open after ``threshold`` consecutive failures → half-open after ``cooldown`` s."""
+
+    def __init__(self, threshold=5, cooldown=30.0):
+        self.threshold = threshold
+        self.cooldown  = cooldown
+        self.failures  = 0
+        self.state     = 'closed'
+        self._opened   = 0.0
+        self._lock     = threading.Lock()
+
+    def allow(self):
+        with self._lock:
+            if self.state == 'closed':
+                return True
+            if self.state == 'open' and time.monotonic() - self._opened >= self.cooldown:
+                self.state = 'half-open'    # let exactly one trial call through
+                return True
+            return False
+
+    def success(self):
+        with self._lock:
+            self.failures, self.state = 0, 'closed'
+
+    def failure(self):
+        with self._lock:
+            self.failures += 1
+            if self.state == 'half-open' or self.failures >= self.threshold:
+                self.state, self._opened = 'open', time.monotonic()
+
+    def abandon(self):
+        """The call was cancelled before it proved anything: a half-open trial goes back to open."""
+        with self._lock:
+            if self.state == 'half-open':
+                self.state, self._opened = 'open', time.monotonic()
+
+
+class _HTTPPool:
+    """Idle keep-alive connections to one host."""
+
+    def __init__(self, base_url, size, timeout):
+        u = urlsplit(base_url)
+        self.cls     = http.client.HTTPSConnection if u.scheme == 'https' else http.client.HTTPConnection
+        self.host    = u.hostname
+        self.port    = u.port
+        self.path    = u.path.rstrip('/')
+        self.size    = size
+        self.timeout = timeout
+        self._idle   = []
+        self._lock   = threading.Lock()
+        self.opened  = 0
+
+    def acquire(self):
+        with self._lock:
+            if self._idle:
+                return self._idle.pop()
+            self.opened += 1
+        return self.cls(self.host, self.port, timeout=self.timeout)
+
+    def release(self, conn, reuse=True):
+        with self._lock:
+            if reuse and len(self._idle) < self.size:
+                self._idle.append(conn)
+                return
+        conn.close()
+
+    def close_all(self):
+        with self._lock:
+            idle, self._idle = self._idle, []
+        for conn in idle:
+            conn.close()
+
+
+class LLMClient:
+
+    def __init__(self, api_key, base_url='https://api.openai.com/v1', model='gpt-3.5-turbo',
+                 max_concurrency=8, timeout=20.0, retries=2, backoff=0.5, queue_timeout=2.0, breaker=None):
+        self.api_key       = api_key
+        self.model         = model
+        self.retries       = retries
+        self.backoff       = backoff
+        self.queue_timeout = queue_timeout
+        self.breaker       = breaker or CircuitBreaker()
+        self.pool          = _HTTPPool(base_url, max_concurrency, timeout)
+        self._slots        = threading.BoundedSemaphore(max_concurrency)
+        self._lock         = threading.Lock()
+        self._stats        = {'calls': 0, 'ok': 0, 'failed': 0, 'retries': 0, 'busy': 0, 'short_circuited': 0}
+        self.observer      = None
+
+    @classmethod
+    def from_env(cls):
+        return cls(api_key         = os.getenv('OPENAI_API_KEY', '').strip(),
+                   base_url        = os.getenv('OPENAI_BASE_URL', 'https://api.openai.com/v1'),
+                   model           = os.getenv('OPENAI_MODEL', 'gpt-3.5-turbo'),
+                   max_concurrency = int(os.getenv('OPENAI_MAX_CONCURRENCY', '8')),
+                   timeout         = float(os.getenv('OPENAI_TIMEOUT', '20')))
+
+    @property
+    def enabled(self):
+        return bool(self.api_key) and self.api_key != 'your-key-here'
+
+    def _count(self, key):
+        with self._lock:
+            self._stats[key] += 1
+
+    def stats(self):
+        with self._lock:
+            return {**self._stats, 'breaker': self.breaker.state, 'connections_opened': self.pool.opened}
+
+    # ── request plumbing ────────────────────────────────────────────────
+    @contextmanager
+    def _observed(self, kind):
+        start, outcome = time.perf_counter(), 'error'
+        try:
+            yield
+            outcome = 'ok'
+        except CircuitOpen:
+            outcome = 'short_circuited'; raise
+        except UpstreamBusy:
+            outcome = 'busy'; raise
+        except GeneratorExit:
+            outcome = 'cancelled'; raise
+        finally:
+            if self.observer:
+                self.observer(kind, outcome, time.perf_counter() - start)
+
+    def _enter(self):
+        self._count('calls')
+        if not self.breaker.allow():
+            self._count('short_circuited')
+            raise CircuitOpen('circuit open — upstream failing')
+        if not self._slots.acquire(timeout=self.queue_timeout):
+            self.breaker.abandon()      # a half-open trial that never ran must not hold the breaker
+            self._count('busy')
+            raise UpstreamBusy('too many concurrent completions')
+
+    def _open(self, body):
+        """POST /chat/completions with retries; returns (conn, response) with a 200 status."""
+        payload = json.dumps(body).encode('utf-8')
+        headers = {'Content-Type': 'application/json', 'Authorization': f'Bearer {self.api_key}'}
+        for attempt in range(self.retries + 1):
+            conn = self.pool.acquire()
+            try:
+                conn.request('POST', f'{self.pool.path}/chat/completions', payload, headers)
+                resp = conn.getresponse()
+            except (OSError, http.client.HTTPException) as e:
+                conn.close()
+                error = UpstreamError(f'{type(e).__name__}: {e}')
+            else:
+                if resp.status == 200:
+                    return conn, resp
+                detail = resp.read().decode(errors='replace')[:200]
+                self.pool.release(conn, reuse=not resp.will_close)
+                error = UpstreamError(f'OpenAI HTTP {resp.status}: {detail}')
+                if resp.status not in RETRY_STATUS:
+                    raise error
+            if attempt < self.retries:
+                self._count('retries')
+                time.sleep(random.uniform(0, self.backoff * 2 ** attempt))
+        raise error
+
+    def _body(self, messages, stream, **params):
+        return {'model': self.model, 'messages': messages, 'max_tokens': 500, 'temperature': 0.7,
+                **params, **({'stream': True} if stream else {})}
+
+    # ── public API ──────────────────────────────────────────────────────
+    def complete(self, messages, **params):
+        """Blocking completion → reply text. Raises UpstreamError on failure."""
+        with self._observed('complete'):
+            return self._complete(messages, **params)
+
+    def _complete(self, messages, **params):
+        self._enter()
+        try:
+            conn, resp = self._open(self._body(messages, False, **params))
+            try:
+                data = json.loads(resp.read())
+            finally:
+                self.pool.release(conn, reuse=not resp.will_close)
+            reply = data['choices'][0]['message']['content']
+        except UpstreamError:
+            self.breaker.failure(); self._count('failed')
+            raise
+        except (OSError, http.client.HTTPException, ValueError, KeyError, IndexError) as e:
+            self.breaker.failure(); self._count('failed')
+            raise UpstreamError(f'{type(e).__name__}: {e}')
+        finally:
+            self._slots.release()
+        self.breaker.success(); self._count('ok')
+        return reply
+
+    def stream(self, messages, **params):
+        """Streaming completion → generator of content deltas.
+
+        The slot is taken before the first yield, so CircuitOpen/UpstreamBusy and
+        connection errors surface on the first ``next()``.
+        """
+        with self._observed('stream'):
+            yield from self._stream(messages, **params)
+
+    def _stream(self, messages, **params):
+        self._enter()
+        conn = resp = None
+        received = False
+        try:
+            conn, resp = self._open(self._body(messages, True, **params))
+            while True:
+                line = resp.readline()
+                if not line:
+                    break
+                line = line.strip()
+                if not line.startswith(b'data:'):
+                    continue
+                data = line[5:].strip()
+                if data == b'[DONE]':
+                    break
+                delta = json.loads(data)['choices'][0].get('delta', {}).get('content')
+                if delta:
+                    received = True
+                    yield delta
+            resp.read()
+        except UpstreamError:
+            self.breaker.failure(); self._count('failed')
+            raise
+        except (OSError, http.client.HTTPException, ValueError, KeyError, IndexError) as e:
+            self.breaker.failure(); self._count('failed')
+            if conn:
+                conn.close(); conn = None
+            raise UpstreamError(f'{type(e).__name__}: {e}')
+        except GeneratorExit:
+            # client went away mid-stream; the connection still has unread data. Settle the
+            # breaker either way, or a cancelled half-open trial would leave it half-open for good.
+            if received:
+                self.breaker.success(); self._count('ok')
+            else:
+                self.breaker.abandon()
+            if conn:
+                conn.close(); conn = None
+            raise
+        else:
+            self.breaker.success(); self._count('ok')
+        finally:
+            if conn:
+                self.pool.release(conn, reuse=not resp.will_close)
+            self._slots.release()
@@ -0,0 +1,213 @@
+"""Request metrics in Prometheus text format, plus a slow-request log.
+
+``RequestMetrics.install(app)`` hooks Flask's before/after-request. For every
+request it records, keyed by route template (``/api/marks/<int:student_id>``,
+not the raw path, so label counts stay bounded):
+- latency
+- SQL statements executed and rows fetched, counted by db.py's tracking
+  (see ``db.track``)
+- time spent waiting on the OpenAI API
+
+Upstream GPT calls are timed through LLMClient's ``observer`` hook. Chatbot
+replies are counted by source, so the fallback rate is
+``fallback / (gpt + gpt_cached + fallback)``. Requests slower than
+``slow_ms`` are written as one JSON line each to the slow-request log.
+
+Recording is a few dict lookups and a bisect under a lock. Nothing is
+formatted until /metrics is scraped.
+"""
+import bisect, json, logging, threading, time
+from flask import g, request, has_request_context
+import db
+
+LATENCY_BUCKETS    = (0.001, 0.0025, 0.005, 0.01, 0.025, 0.05, 0.1, 0.25, 0.5, 1, 2.5, 5, 10)
+STATEMENT_BUCKETS  = (0, 1, 2, 5, 10, 20, 50, 100, 250, 1000)
+ROW_BUCKETS        = (0, 1, 10, 100, 1000, 10000, 100000)
+LLM_BUCKETS        = (0.1, 0.25, 0.5, 1, 2, 5, 10, 20, 40)
+PREFIX             = 'smartcampus_'
+
+
+def _labels(names, values):
+    if not names:
+        return ''
+    return '{' + ','.join(f'{n}="{_escape(v)}"' for n, v in zip(names, values)) + '}'
+
+def _escape(value):
+    return str(value).replace('\\', '\\\\').replace('"', '\\"').replace('\n', '\\n')
+
+def _num(x):
+    return repr(float(x)) if isinstance(x, float) else str(x)
+
+
+class Counter:
+
+    def __init__(self, name, help, labels=()):
+        self.name, self.help, self.labels = PREFIX + name, help, tuple(labels)
+        self._values = {}
+        self._lock   = threading.Lock()
+
+    def inc(self, *labels, amount=1):
+        with self._lock:
+            self._values[labels] = self._values.get(labels, 0) + amount
+
+    def value(self, *labels):
+        return self._values.get(labels, 0)
+
+    def render(self):
+        with self._lock:
+            items = sorted(self._values.items())
+        yield f'# HELP {self.name} {self.help}'
+        yield f'# TYPE {self.name} counter'
+        for labels, v in items:
+            yield f'{self.name}{_labels(self.labels, labels)} {_num(v)}'
+
+
+class Histogram:
+    """Fixed-bucket histogram; one [bucket counts..., +Inf] list, sum and count per label set."""
+
+    def __init__(self, name, help, labels=(), buckets=LATENCY_BUCKETS):
+        self.name, self.help, self.labels = PREFIX + name, help, tuple(labels)
+        self.buckets = tuple(buckets)
+        self._series = {}
+        self._lock   = threading.Lock()
+
+    def observe(self, value, *labels):
+        i = bisect.bisect_left(self.buckets, value)
+        with self._lock:
+            s = self._series.get(labels)
+            if s is None:
+                s = self._series[labels] = [[0] * (len(self.buckets) + 1), 0.0, 0]
+            s[0][i] += 1
+            s[1]    += value
+            s[2]    += 1
+
+    def snapshot(self, *labels):
+        """(cumulative bucket counts, sum, count) for one label set."""
+        with self._lock:
+            counts, total, n = self._series.get(labels, [[0] * (len(self.buckets) + 1), 0.0, 0])
+            counts = list(counts)
+        cumulative, run = [], 0
+        for c in counts:
+            run += c
+            cumulative.append(run)
+        return cumulative, total, n
+
+    def render(self):
+        with self._lock:
+            keys = sorted(self._series)
+        yield f'# HELP {self.name} {self.help}'
+        yield f'# TYPE {self.name} histogram'
+        names = self.labels + ('le',)
+        for labels in keys:
+            cumulative, total, n = self.snapshot(*labels)
+            for bound, c in zip(self.buckets + ('+Inf',), cumulative):
+                yield f'{self.name}_bucket{_labels(names, labels + (bound if bound == "+Inf" else _num(bound),))} {c}'
+            yield f'{self.name}_sum{_labels(self.labels, labels)} {_num(round(total, 6))}'
+            yield f'{self.name}_count{_labels(self.labels, labels)} {n}'
+
+
+class Registry:
+
+    def __init__(self):
+        self.metrics = []
+
+    def counter(self, *args, **kw):
+        m = Counter(*args, **kw); self.metrics.append(m); return m
+
+    def histogram(self, *args, **kw):
+        m = Histogram(*args, **kw); self.metrics.append(m); return m
+
+    def render(self, gauges=None):
+        """Exposition text; ``gauges`` is {component: stats dict} (numeric values become gauges)."""
+        lines = [line for m in self.metrics for line in m.render()]
+        for component, stats in sorted((gauges or {}).items()):
+            for key, value in sorted(stats.items()):
+                if isinstance(value, bool) or not isinstance(value, (int, float)):
+                    continue
+                name = f'{PREFIX}{component}_{key}'
+                lines += [f'# TYPE {name} gauge', f'{name} {_num(value)}']
+        return '\n'.join(lines) + '\n'
+
+
+class RequestMetrics:
+    """The metric families the app records, plus the Flask hooks that feed them."""
+
+    def __init__(self, registry, slow_ms=500.0, slow_log=None):
+        r = registry
+        self.registry   = r
+        self.slow_ms    = slow_ms
+        self.slow_log   = slow_log
+        self.requests   = r.counter('http_requests_total', 'HTTP requests by route, method and status.',
+                                    ('route', 'method', 'status'))
+        self.latency    = r.histogram('http_request_duration_seconds', 'Time to build the response.',
+                                      ('route', 'method'), LATENCY_BUCKETS)
+        self.statements = r.histogram('db_statements_per_request', 'SQL statements executed per request.',
+                                      ('route',), STATEMENT_BUCKETS)
+        self.rows       = r.histogram('db_rows_per_request', 'Rows fetched from SQLite per request.',
+                                      ('route',), ROW_BUCKETS)
+        self.llm        = r.histogram('llm_request_duration_seconds', 'OpenAI chat completion calls.',
+                                      ('kind', 'outcome'), LLM_BUCKETS)
+        self.replies    = r.counter('chatbot_replies_total',
+                                    'Chatbot replies by source (gpt, gpt_cached, fallback after a GPT failure, rules).',
+                                    ('source',))
+        self.slow       = r.counter('http_slow_requests_total', 'Requests slower than the slow-request threshold.',
+                                    ('route',))
+
+    # ── Flask hooks ──────────────────────────────────────────────────
+    def install(self, app):
+        app.before_request(self._before)
+        app.after_request(self._after)
+        app.teardown_request(self._teardown)
+
+    def _before(self):
+        g._metrics_start = time.perf_counter()
+        g._metrics_llm   = 0.0
+        g._metrics_sql   = db.track()
+
+    def _after(self, response):
+        start = g.pop('_metrics_start', None)
+        if start is None:
+            return response
+        elapsed = time.perf_counter() - start
+        sql     = db.untrack()
+        route   = request.url_rule.rule if request.url_rule else 'unmatched'
+        method  = request.method
+        self.requests.inc(route, method, str(response.status_code))
+        self.latency.observe(elapsed, route, method)
+        if sql is not None:
+            self.statements.observe(sql.statements, route)
+            self.rows.observe(sql.rows, route)
+        if elapsed * 1000 >= self.slow_ms:
+            self.slow.inc(route)
+            if self.slow_log:
+                self.slow_log.info(json.dumps({
+                    'ts': time.strftime('%Y-%m-%dT%H:%M:%S'), 'method': method, 'route': route,
+                    'path': request.path, 'status': response.status_code, 'ms': round(elapsed * 1000, 1),
+                    'sql_statements': sql.statements if sql else None, 'rows': sql.rows if sql else None,
+                    'llm_ms': round(g.get('_metrics_llm', 0.0) * 1000, 1)}))
+        return response
+
+    def _teardown(self, exc):
+        db.untrack()
+
+    # ── callbacks for the rest of the app ────────────────────────────
+    def observe_llm(self, kind, outcome, seconds):
+        """LLMClient.observer: ``kind`` is complete/stream, ``outcome`` ok/error/busy/short_circuited/cancelled."""
+        self.llm.observe(seconds, kind, outcome)
+        if has_request_context() and '_metrics_llm' in g:
+            g._metrics_llm += seconds
+
+    def reply(self, source):
+        self.replies.inc(source)
+
+
+def slow_request_logger(path=None):
+    """JSON-lines logger for slow requests: to ``path`` when given, else stderr."""
+    log = logging.getLogger('smartcampus.slow')
+    if not log.handlers:
+        handler = logging.FileHandler(path) if path else logging.StreamHandler()
+        handler.setFormatter(logging.Formatter('%(message)s'))
+        log.addHandler(handler)
+        log.setLevel(logging.INFO)
+        log.propagate = False
+    return log
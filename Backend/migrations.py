@@ -0,0 +1,100 @@
+"""Versioned schema migrations.
+
+init_db() creates the base tables; everything added after that (indexes,
+derived tables, triggers) lives here as a numbered migration. Each migration
+runs in its own transaction and is recorded in ``schema_migrations`` so it is
+applied exactly once per database.
+
+A migration step is either an SQL string or a callable taking the connection.
+"""
+import time
+import summary, recommender, peer_stats, chat_context, faculty_index, outpass_flow, timetable_index, cohort_analytics, events
+
+MIGRATIONS = [
+    (1, 'student-keyed and queue indexes', [
+        'CREATE INDEX IF NOT EXISTS idx_attendance_student ON attendance(student_id, subject, percentage)',
+        'CREATE INDEX IF NOT EXISTS idx_marks_student      ON marks(student_id, subject)',
+        'CREATE INDEX IF NOT EXISTS idx_timetable_student  ON timetable(student_id, day, time_slot)',
+        'CREATE INDEX IF NOT EXISTS idx_fees_student       ON fees(student_id)',
+        'CREATE INDEX IF NOT EXISTS idx_exam_semester      ON exam_schedule(semester, exam_date)',
+        'CREATE INDEX IF NOT EXISTS idx_outpass_status     ON outpass_requests(overall_status, submitted_at)',
+        'CREATE INDEX IF NOT EXISTS idx_outpass_student    ON outpass_requests(student_id, submitted_at)',
+        'CREATE INDEX IF NOT EXISTS idx_onduty_status      ON onduty_requests(status, submitted_at)',
+        'CREATE INDEX IF NOT EXISTS idx_onduty_student     ON onduty_requests(student_id, submitted_at)',
+        'CREATE INDEX IF NOT EXISTS idx_helpdesk_student   ON helpdesk_tickets(student_id, submitted_at)',
+        'CREATE INDEX IF NOT EXISTS idx_helpdesk_submitted ON helpdesk_tickets(submitted_at)',
+        'CREATE INDEX IF NOT EXISTS idx_roles_teacher      ON faculty_roles(teacher_id)',
+        'CREATE INDEX IF NOT EXISTS idx_roles_type         ON faculty_roles(role_type)',
+        'CREATE INDEX IF NOT EXISTS idx_students_cohort    ON students(department, semester)',
+    ]),
+    (2, 'outpass stage queue index', [
+        'CREATE INDEX IF NOT EXISTS idx_outpass_stage ON outpass_requests(overall_status, stage, submitted_at, id)',
+    ]),
+    (3, 'job checkpoints', [
+        '''CREATE TABLE IF NOT EXISTS job_checkpoints (
+            job TEXT PRIMARY KEY, last_id INTEGER DEFAULT 0, updated_at DATETIME)''',
+    ]),
+    (4, 'student summary table and triggers', [summary.install]),
+    (5, 'recommendation cache', recommender.CACHE_TABLE_SQL),
+    (6, 'peer grade histograms', [peer_stats.install]),
+    (7, 'context data versions', [chat_context.install]),
+    (8, 'teacher name version', faculty_index.NAME_VERSION_SQL),
+    (9, 'outpass stage work queues', [outpass_flow.install]),
+    (10, 'helpdesk filter indexes', [
+        'CREATE INDEX IF NOT EXISTS idx_helpdesk_status   ON helpdesk_tickets(status, submitted_at)',
+        'CREATE INDEX IF NOT EXISTS idx_helpdesk_category ON helpdesk_tickets(category, submitted_at)',
+    ]),
+    (11, 'timetable day/slot indexes', [timetable_index.install]),
+    (12, 'cohort analytics version', cohort_analytics.VERSION_SQL),
+    (13, 'peer histogram triggers skip NULL subjects', [peer_stats.install_triggers]),
+    (14, 'live update event log', events.SCHEMA_SQL),
+    (15, 'summary refresh on attendance subject rename', [summary.install_triggers, summary.REBUILD_ALL_SQL]),
+]
+
+
+def _ensure_table(conn):
+    conn.execute('''CREATE TABLE IF NOT EXISTS schema_migrations (
+        version INTEGER PRIMARY KEY, name TEXT,
+        applied_at DATETIME DEFAULT CURRENT_TIMESTAMP, duration_ms REAL)''')
+    conn.commit()
+
+
+def current_version(conn):
+    _ensure_table(conn)
+    return conn.execute('SELECT COALESCE(MAX(version),0) FROM schema_migrations').fetchone()[0]
+
+
+def migrate(conn, target=None, verbose=True):
+    """Apply every pending migration up to ``target`` (default: latest). Returns the new version."""
+    version = current_version(conn)
+    for num, name, steps in MIGRATIONS:
+        if num <= version or (target is not None and num > target):
+            continue
+        start = time.perf_counter()
+        conn.execute('BEGIN')
+        try:
+            for step in steps:
+                if callable(step):
+                    step(conn)
+                else:
+                    conn.execute(step)
+            conn.execute('INSERT INTO schema_migrations (version,name,duration_ms) VALUES (?,?,?)',
+                         (num, name, round((time.perf_counter() - start) * 1000, 2)))
+            conn.commit()
+        except Exception:
+            conn.rollback()
+            raise
+        version = num
+        if verbose:
+            print(f"  Applied migration {num}: {name}")
+    return version
+
+
+if __name__ == '__main__':
+    import sqlite3, os
+    db = os.path.join(os.path.dirname(__file__), 'data', 'campus.db')
+    if not os.path.exists(db):
+        raise SystemExit("ERROR: campus.db not found. Run app.py first!")
+    conn = sqlite3.connect(db)
+    print(f"Schema version: {migrate(conn)}")
+    conn.close()
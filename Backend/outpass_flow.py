@@ -0,0 +1,125 @@
+"""Work queues and compare-and-set transitions for the 4-stage outpass flow.
+
+``outpass_queue`` holds one row per *pending* outpass with the stage it waits
+at and the student's department, indexed by (stage, department, submitted_at).
+Triggers on outpass_requests keep it in sync, so an approver's queue is an
+index range read, however many finished requests pile up.
+
+A transition only applies while the request is still Pending at the expected
+stage (``WHERE ... AND stage=?``), so two approvers acting on the same request
+cannot both advance it; the loser's id comes back in ``skipped``. Bulk
+transitions are one UPDATE over a JSON id list, committed by the caller.
+
+Usage:  python outpass_flow.py        # rebuild the queue from outpass_requests
+"""
+import json
+from collections import namedtuple
+
+Stage = namedtuple('Stage', 'key column label next')
+
+# key → (status/approved_by column prefix, stored `stage` value, following stage key)
+STAGES = {
+    'faculty': Stage('faculty', 'faculty',      'Faculty Advisor',    'hostel'),
+    'hostel' : Stage('hostel',  'hostel_coord', 'Hostel Coordinator', 'hod'),
+    'hod'    : Stage('hod',     'hod',          'HOD',                'warden'),
+    'warden' : Stage('warden',  'warden',       'Hostel Warden',      None),
+}
+
+MAX_BULK = 1000
+
+_ENQUEUE = '''INSERT OR REPLACE INTO outpass_queue (outpass_id, stage, department, submitted_at)
+              SELECT NEW.id, NEW.stage, (SELECT department FROM students WHERE id=NEW.student_id), NEW.submitted_at
+              WHERE NEW.overall_status='Pending' '''
+
+REBUILD_SQL = '''INSERT INTO outpass_queue (outpass_id, stage, department, submitted_at)
+                 SELECT o.id, o.stage, s.department, o.submitted_at
+                 FROM outpass_requests o LEFT JOIN students s ON s.id=o.student_id
+                 WHERE o.overall_status='Pending' '''
+
+
+def install(conn):
+    """Migration step: create the queue table, its index and triggers, and fill it."""
+    conn.execute('''CREATE TABLE IF NOT EXISTS outpass_queue (
+        outpass_id INTEGER PRIMARY KEY, stage TEXT NOT NULL, department TEXT, submitted_at DATETIME)''')
+    conn.execute('''CREATE INDEX IF NOT EXISTS idx_outpass_queue
+        ON outpass_queue(stage, department, submitted_at, outpass_id)''')
+    conn.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_outpass_queue_ins AFTER INSERT ON outpass_requests
+        BEGIN {_ENQUEUE}; END''')
+    conn.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_outpass_queue_upd
+        AFTER UPDATE OF stage, overall_status ON outpass_requests
+        BEGIN DELETE FROM outpass_queue WHERE outpass_id=OLD.id; {_ENQUEUE}; END''')
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS trg_outpass_queue_del AFTER DELETE ON outpass_requests
+        BEGIN DELETE FROM outpass_queue WHERE outpass_id=OLD.id; END''')
+    conn.execute('''CREATE TRIGGER IF NOT EXISTS trg_outpass_queue_dept AFTER UPDATE OF department ON students
+        BEGIN UPDATE outpass_queue SET department=NEW.department
+              WHERE outpass_id IN (SELECT id FROM outpass_requests WHERE student_id=NEW.id); END''')
+    conn.execute('DELETE FROM outpass_queue')
+    conn.execute(REBUILD_SQL)
+
+
+def rebuild(conn):
+    conn.execute('DELETE FROM outpass_queue')
+    conn.execute(REBUILD_SQL)
+    conn.commit()
+
+
+def transition(conn, stage_key, action, ids, approver):
+    """Approve or reject ``ids`` at ``stage_key`` where they are still waiting there.
+
+    Returns the ids that moved, in the given order. Ids already acted on
+    (or never at this stage) are left untouched. The caller commits.
+    """
+    stage = STAGES[stage_key]
+    col   = stage.column
+    ids   = list(dict.fromkeys(int(i) for i in ids))
+    if action == 'approve' and stage.next:
+        sets, params = f"{STAGES[stage.next].column}_status='Pending', stage=?", [STAGES[stage.next].label]
+    elif action == 'approve':
+        sets, params = "overall_status='Approved', stage='Completed'", []
+    elif action == 'reject':
+        sets, params = "overall_status='Rejected'", []
+    else:
+        raise ValueError(f'Unknown action: {action}')
+    moved = {r[0] for r in conn.execute(f'''
+        UPDATE outpass_requests SET
+            {col}_status=?, {col}_approved_by=?, {col}_approved_at=CURRENT_TIMESTAMP, {sets}
+        WHERE id IN (SELECT value FROM json_each(?))
+          AND overall_status='Pending' AND stage=? AND {col}_status='Pending'
+        RETURNING id''',
+        ['Approved' if action == 'approve' else 'Rejected', approver] + params +
+        [json.dumps(ids), stage.label]).fetchall()}
+    return [i for i in ids if i in moved]
+
+
+def queue_ids(conn, stage_key, department=None, limit=None, after=None):
+    """Outpass ids waiting at ``stage_key`` (newest first), optionally for one department.
+
+    ``after`` is a (submitted_at, id) cursor from the previous page.
+    """
+    where, params = ['stage=?'], [STAGES[stage_key].label]
+    if department:
+        where.append('department=?'); params.append(department)
+    if after:
+        where.append('(submitted_at, outpass_id) < (?, ?)'); params.extend(after)
+    sql = (f"SELECT outpass_id FROM outpass_queue WHERE {' AND '.join(where)} "
+           f"ORDER BY submitted_at DESC, outpass_id DESC" + (' LIMIT ?' if limit else ''))
+    return [r[0] for r in conn.execute(sql, params + ([limit] if limit else []))]
+
+
+def queue_counts(conn):
+    """{stage label: {department: pending count}} straight from the queue index."""
+    counts = {}
+    for stage, dept, n in conn.execute('SELECT stage, department, COUNT(*) FROM outpass_queue GROUP BY 1, 2'):
+        counts.setdefault(stage, {})[dept or ''] = n
+    return counts
+
+
+if __name__ == '__main__':
+    import sqlite3, os
+    db = os.path.join(os.path.dirname(__file__), 'data', 'campus.db')
+    if not os.path.exists(db):
+        raise SystemExit("ERROR: campus.db not found. Run app.py first!")
+    conn = sqlite3.connect(db)
+    rebuild(conn)
+    print(f"Outpass queue rebuilt: {conn.execute('SELECT COUNT(*) FROM outpass_queue').fetchone()[0]} pending")
+    conn.close()
@@ -0,0 +1,93 @@
+"""Rule-based outpass risk scoring, one request or a whole queue at a time.
+
+The scoring rules are those of /api/ai/outpass-risk: time of day, reason
+category (medical / academic / family / leisure / vague) and the number of
+subjects below 75% attendance. Each keyword list is compiled into one regex
+(same substring semantics as the old ``any(w in text ...)`` scans), and
+attendance for every student in a batch is read with one grouped query.
+
+Usage:  python outpass_risk.py        # score every pending outpass
+"""
+import json, re
+
+MEDICAL  = ['hospital','doctor','clinic','medical','emergency','dentist','health','pharmacy']
+ACADEMIC = ['library','project','internship','seminar','workshop','conference','lab']
+FAMILY   = ['family','home','parents','wedding','function','festival']
+VAGUE    = ['outing','fun','shopping','movie','mall','party','roam']
+
+_compile = lambda words: re.compile('|'.join(map(re.escape, words)))
+_MEDICAL, _ACADEMIC, _FAMILY, _VAGUE = map(_compile, (MEDICAL, ACADEMIC, FAMILY, VAGUE))
+
+LOW_ATTENDANCE_SQL = '''
+    SELECT student_id, SUM(percentage < 75) FROM attendance
+    WHERE student_id IN (SELECT value FROM json_each(?)) GROUP BY student_id
+'''
+
+
+def _hour(out_time):
+    try:
+        hour = int(str(out_time or '12:00').split(':')[0])
+    except ValueError:
+        return 12
+    return hour if 0 <= hour < 24 else 12
+
+
+def score(reason, destination, out_time, low_subjects=None):
+    """Risk report for one request; ``low_subjects`` is None when the student is unknown."""
+    reason, destination = str(reason or '').lower(), str(destination or '').lower()
+    risk, flags, positives = 0, [], []
+    hour = _hour(out_time)
+    if hour < 6: risk += 4; flags.append('Very early hours before 6 AM')
+    elif hour >= 21: risk += 3; flags.append('Late night request after 9 PM — warden approval required')
+    else: positives.append('Request during safe hours (6 AM – 9 PM)')
+    if _MEDICAL.search(reason + destination): positives.append('Medical reason — valid and important'); risk -= 1
+    elif _ACADEMIC.search(reason): positives.append('Academic reason — supports studies')
+    elif _FAMILY.search(reason): positives.append('Family reason — personal but valid')
+    elif _VAGUE.search(reason): risk += 2; flags.append('Reason appears non-essential (leisure)')
+    else: risk += 1; flags.append('Reason is vague — more details needed')
+    if low_subjects is not None:
+        if low_subjects >= 3: risk += 3; flags.append(f'{low_subjects} subjects below 75% — leaving will worsen attendance')
+        elif low_subjects >= 1: risk += 1; flags.append(f'{low_subjects} subject(s) below 75%')
+        else: positives.append('Student has good attendance in all subjects')
+    risk = max(0, min(risk, 10))
+    if risk <= 2: decision, dc, rec = 'AUTO-APPROVE', 'green', 'LOW RISK — Recommend approval. Valid reason and safe timing.'
+    elif risk <= 5: decision, dc, rec = 'REVIEW', 'orange', 'MODERATE RISK — Manual review recommended before approving.'
+    else: decision, dc, rec = 'FLAG', 'red', 'HIGH RISK — Flag this request. Multiple concerns detected.'
+    return {'decision': decision, 'decision_color': dc, 'risk_score': risk,
+            'risk_level': 'Low' if risk <= 2 else 'Moderate' if risk <= 5 else 'High',
+            'recommendation': rec, 'positive_factors': positives, 'risk_factors': flags}
+
+
+def low_attendance_counts(conn, student_ids):
+    """{student_id: subjects below 75%} for many students in one query (0 when they have no rows)."""
+    counts = {sid: 0 for sid in student_ids}
+    for sid, low in conn.execute(LOW_ATTENDANCE_SQL, (json.dumps(list(counts)),)):
+        counts[sid] = low
+    return counts
+
+
+def score_rows(conn, rows):
+    """Score outpass rows (dicts with student_id, reason, destination, out_time) → list of reports."""
+    low = low_attendance_counts(conn, {r['student_id'] for r in rows if r.get('student_id')})
+    return [score(r.get('reason'), r.get('destination'), r.get('out_time'), low.get(r.get('student_id')))
+            for r in rows]
+
+
+def score_outpasses(conn, ids):
+    """{outpass id: report} for stored requests; unknown ids are left out."""
+    rows = [dict(r) for r in conn.execute(
+        'SELECT id, student_id, reason, destination, out_time FROM outpass_requests '
+        'WHERE id IN (SELECT value FROM json_each(?))', (json.dumps(list(ids)),))]
+    return {r['id']: report for r, report in zip(rows, score_rows(conn, rows))}
+
+
+if __name__ == '__main__':
+    import sqlite3, os
+    db = os.path.join(os.path.dirname(__file__), 'data', 'campus.db')
+    if not os.path.exists(db):
+        raise SystemExit("ERROR: campus.db not found. Run app.py first!")
+    conn = sqlite3.connect(db)
+    ids  = [r[0] for r in conn.execute("SELECT id FROM outpass_requests WHERE overall_status='Pending'")]
+    for oid, report in sorted(score_outpasses(conn, ids).items()):
+        print(f"  #{oid:<6} {report['risk_score']:>2}  {report['decision']:<13} {'; '.join(report['risk_factors'])}")
+    conn.close()
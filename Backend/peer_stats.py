@@ -0,0 +1,125 @@
+"""Per-subject grade histograms for collaborative-filtering peer insights.
+
+``subject_grade_stats`` keeps one row per (subject, grade) with the number of
+marks rows holding that grade. Triggers on ``marks`` adjust the counts on
+every insert/update/delete, so a peer lookup reads at most a handful of rows
+instead of scanning every other student's marks.
+
+Usage:  python peer_stats.py        # rebuild the histograms from marks
+"""
+import json
+import summary
+
+STRUGGLING   = ('B', 'C')
+TOP_INSIGHTS = 3
+
+# marks.subject may be NULL; the histogram's may not (REBUILD_SQL skips those rows too)
+_BUMP = '''INSERT INTO subject_grade_stats (subject, grade, count)
+           SELECT {ref}.subject, COALESCE({ref}.grade,''), 1 WHERE {ref}.subject IS NOT NULL
+           ON CONFLICT(subject, grade) DO UPDATE SET count=count+1'''
+_DROP = '''UPDATE subject_grade_stats SET count=count-1
+           WHERE subject={ref}.subject AND grade=COALESCE({ref}.grade,'')'''
+
+REBUILD_SQL = '''INSERT INTO subject_grade_stats (subject, grade, count)
+                 SELECT subject, COALESCE(grade,''), COUNT(*) FROM marks WHERE subject IS NOT NULL GROUP BY 1, 2'''
+
+
+def install(conn):
+    """Migration step: create the table + triggers and populate it."""
+    conn.execute('''CREATE TABLE IF NOT EXISTS subject_grade_stats (
+        subject TEXT NOT NULL, grade TEXT NOT NULL, count INTEGER DEFAULT 0,
+        PRIMARY KEY (subject, grade)) WITHOUT ROWID''')
+    install_triggers(conn)
+    conn.execute('DELETE FROM subject_grade_stats')
+    conn.execute(REBUILD_SQL)
+
+
+def install_triggers(conn):
+    """(Re)create the marks triggers; also the migration step that adds the NULL-subject guards."""
+    for name in ('ins', 'del', 'upd'):
+        conn.execute(f'DROP TRIGGER IF EXISTS trg_peer_marks_{name}')
+    conn.execute(f'''CREATE TRIGGER trg_peer_marks_ins AFTER INSERT ON marks WHEN NEW.subject IS NOT NULL
+        BEGIN {_BUMP.format(ref='NEW')}; END''')
+    conn.execute(f'''CREATE TRIGGER trg_peer_marks_del AFTER DELETE ON marks WHEN OLD.subject IS NOT NULL
+        BEGIN {_DROP.format(ref='OLD')}; END''')
+    conn.execute(f'''CREATE TRIGGER trg_peer_marks_upd AFTER UPDATE OF subject, grade ON marks
+        BEGIN {_DROP.format(ref='OLD')}; {_BUMP.format(ref='NEW')}; END''')
+
+
+def rebuild(conn):
+    conn.execute('DELETE FROM subject_grade_stats')
+    conn.execute(REBUILD_SQL)
+    conn.commit()
+
+
+def histograms(conn, subjects):
+    """{subject: {grade: count}} for the given subjects (cohort-wide, including the caller)."""
+    hist = {s: {} for s in subjects}
+    for r in conn.execute('''SELECT subject, grade, count FROM subject_grade_stats
+                             WHERE subject IN (SELECT value FROM json_each(?)) AND count > 0''',
+                          (json.dumps(list(subjects)),)):
+        hist[r[0]][r[1]] = r[2]
+    return hist
+
+
+def percentile(hist, grade):
+    """Mid-rank percentile of ``grade`` within a grade histogram (0 = bottom, 100 = top)."""
+    total = sum(hist.values())
+    if not total:
+        return None
+    pts   = summary.GRADE_POINTS.get(grade, 7)
+    below = sum(c for g, c in hist.items() if summary.GRADE_POINTS.get(g, 7) < pts)
+    same  = sum(c for g, c in hist.items() if summary.GRADE_POINTS.get(g, 7) == pts)
+    return round((below + same / 2) / total * 100, 1)
+
+
+def peer_insights(conn, student_id, weak_subjects):
+    """Top subjects other students also struggle with (B/C grades), with the student's standing.
+
+    Peer counts are the histogram's B/C rows minus the student's own, so the
+    numbers match a scan of every *other* student's marks.
+    """
+    weak_subjects = list(dict.fromkeys(weak_subjects))
+    if not weak_subjects:
+        return []
+    hist = histograms(conn, weak_subjects)
+    own  = {}
+    for subject, grade in conn.execute('''SELECT subject, grade FROM marks
+                                          WHERE student_id=? AND subject IN (SELECT value FROM json_each(?))''',
+                                       (student_id, json.dumps(weak_subjects))):
+        own.setdefault(subject, []).append(grade)
+
+    counts = []
+    for subj in weak_subjects:
+        peers = sum(hist[subj].get(g, 0) for g in STRUGGLING) - sum(g in STRUGGLING for g in own.get(subj, []))
+        if peers > 0:
+            counts.append((subj, peers))
+
+    insights = []
+    for subj, count in sorted(counts, key=lambda x: x[1], reverse=True)[:TOP_INSIGHTS]:
+        insight = {
+            'subject'       : subj,
+            'peers_count'   : count,
+            'message'       : f"{count} other students also struggled with {subj}. You are not alone — focus here!"
+        }
+        grades = own.get(subj)
+        if grades:
+            pct = percentile(hist[subj], grades[0])
+            insight['percentile'] = pct
+            if pct is not None and pct <= 50:
+                insight['standing'] = f"You are in the bottom {max(1, round(pct))}% for {subj}"
+        insights.append(insight)
+    return insights
+
+
+if __name__ == '__main__':
+    import os, sqlite3, time
+    db = os.path.join(os.path.dirname(__file__), 'data', 'campus.db')
+    if not os.path.exists(db):
+        raise SystemExit("ERROR: campus.db not found. Run app.py first!")
+    conn = sqlite3.connect(db)
+    t0 = time.perf_counter()
+    rebuild(conn)
+    n = conn.execute('SELECT COUNT(DISTINCT subject) FROM subject_grade_stats').fetchone()[0]
+    conn.close()
+    print(f"Rebuilt grade histograms for {n} subjects in {time.perf_counter()-t0:.2f}s")
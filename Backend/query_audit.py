@@ -0,0 +1,160 @@
+"""Development-mode query audit: N+1 detection, query plans and per-route query budgets.
+
+Off in production. With QUERY_AUDIT=warn (or strict) the app installs a
+``QueryAudit`` next to the request metrics. It asks db.track() for statement
+text, and after every request it:
+
+- groups the statements by SQL text and flags any that ran more than
+  ``repeat_limit`` times — the shape of a per-row query inside a loop (N+1);
+- runs EXPLAIN QUERY PLAN once per distinct statement and warns when the plan
+  reads a whole table instead of searching an index (``SCAN students`` rather
+  than ``SEARCH students USING INDEX ...``);
+- compares the request's statement count with the route's budget and sets
+  an ``X-Query-Count`` header.
+
+Findings are logged on 'smartcampus.queries' and collected for ``report()``.
+In strict mode an over-budget request raises QueryBudgetExceeded. The Flask
+test client propagates it, so a test or benchmark run fails on the request.
+
+Usage:  QUERY_AUDIT=warn python app.py      then GET /api/system/query-audit
+"""
+import re, logging, threading
+from flask import g, request
+import db
+
+SCAN_RE    = re.compile(r'^SCAN (?:TABLE )?(\w+)(?: AS \w+)?$')
+ALIAS_RE   = re.compile(r'\b(?:FROM|JOIN)\s+(\w+)(?:\s+(?:AS\s+)?(\w+))?', re.I)
+PLANNED    = ('SELECT', 'WITH', 'UPDATE', 'DELETE', 'INSERT', 'REPLACE')
+KEYWORDS   = {'WHERE', 'JOIN', 'LEFT', 'INNER', 'CROSS', 'ON', 'USING', 'GROUP', 'ORDER', 'LIMIT', 'SET',
+              'UNION', 'EXCEPT', 'INTERSECT', 'WINDOW', 'HAVING', 'NATURAL', 'OUTER', 'VALUES'}
+
+log = logging.getLogger('smartcampus.queries')
+
+
+class QueryBudgetExceeded(AssertionError):
+    pass
+
+
+def squash(sql, width=200):
+    """One-line SQL for logs and reports."""
+    s = ' '.join(sql.split())
+    return s if len(s) <= width else s[:width - 3] + '...'
+
+
+def full_scans(sql, plan, tables):
+    """Real tables that ``plan`` (EXPLAIN QUERY PLAN rows) reads end to end without an index."""
+    aliases = {}
+    for table, alias in ALIAS_RE.findall(sql):
+        aliases[table] = table
+        if alias and alias.upper() not in KEYWORDS:
+            aliases[alias] = table
+    out = []
+    for _, _, detail in plan:
+        m = SCAN_RE.match(detail)
+        if m:
+            table = aliases.get(m.group(1), m.group(1))
+            if table in tables and table not in out:
+                out.append(table)
+    return out
+
+
+class QueryAudit:
+
+    def __init__(self, connect, mode='warn', repeat_limit=5, default_budget=20, budgets=None, allow_scans=()):
+        self.connect        = connect
+        self.strict         = mode == 'strict'
+        self.mode           = mode
+        self.repeat_limit   = repeat_limit
+        self.default_budget = default_budget
+        self.budgets        = dict(budgets or {})
+        self.allow_scans    = set(allow_scans)
+        self._tables  = None
+        self._plans   = {}             # sql -> {'plan': [...], 'full_scans': [...]} (None when it can't be explained)
+        self._routes  = {}             # route -> [requests, max statements, over budget]
+        self._repeats = {}             # (route, sql) -> max runs in one request
+        self._lock    = threading.Lock()
+
+    def budget(self, route):
+        return self.budgets.get(route, self.default_budget)
+
+    # ── Flask hooks (install after the request metrics so both share one db.track) ──
+    def install(self, app):
+        app.before_request(self._before)
+        app.after_request(self._after)
+        app.teardown_request(self._teardown)
+
+    def _before(self):
+        g._audit_sql = db.track(detail=True)
+
+    def _after(self, response):
+        stats = g.pop('_audit_sql', None)
+        if stats is None or stats.queries is None:
+            return response
+        route = request.url_rule.rule if request.url_rule else 'unmatched'
+        queries = dict(stats.queries)
+        response.headers['X-Query-Count'] = str(stats.statements)
+        self.check(route, stats.statements, queries)
+        return response
+
+    def _teardown(self, exc):
+        db.untrack()
+
+    # ── checks ───────────────────────────────────────────────────────
+    def check(self, route, statements, queries):
+        """Record one request's statements ({sql: [count, params]}); raises when strict and over budget."""
+        budget = self.budget(route)
+        with self._lock:
+            r = self._routes.setdefault(route, [0, 0, 0])
+            r[0] += 1
+            r[1]  = max(r[1], statements)
+            r[2] += statements > budget
+            for sql, (count, _) in queries.items():
+                if count > self.repeat_limit:
+                    key = (route, squash(sql))
+                    if count > self._repeats.get(key, 0):
+                        self._repeats[key] = count
+            new = [(sql, params) for sql, (_, params) in queries.items() if sql not in self._plans]
+            for sql, _ in new:
+                self._plans[sql] = None
+
+        for sql, (count, _) in queries.items():
+            if count > self.repeat_limit:
+                log.warning('N+1 suspect on %s: ran %d times in one request: %s', route, count, squash(sql))
+        for sql, params in new:
+            self._plan(sql, params)
+        if statements > budget:
+            msg = f'{route} ran {statements} SQL statements (budget {budget})'
+            log.warning('query budget exceeded: %s', msg)
+            if self.strict:
+                raise QueryBudgetExceeded(msg)
+
+    def _plan(self, sql, params):
+        if not sql.lstrip().upper().startswith(PLANNED) or params is None:
+            return
+        conn = self.connect()
+        try:
+            if self._tables is None:
+                self._tables = db.table_names(conn)
+            plan = db.explain(conn, sql, params)
+        except Exception:
+            return
+        finally:
+            conn.close()
+        scans = [t for t in full_scans(sql, plan, self._tables) if t not in self.allow_scans]
+        with self._lock:
+            self._plans[sql] = {'plan': [d for _, _, d in plan], 'full_scans': scans}
+        if scans:
+            log.warning('full table scan of %s: %s', ', '.join(scans), squash(sql))
+
+    # ── reporting ────────────────────────────────────────────────────
+    def report(self):
+        with self._lock:
+            routes  = {route: {'requests': n, 'max_statements': top, 'budget': self.budget(route), 'over_budget': over}
+                       for route, (n, top, over) in sorted(self._routes.items())}
+            repeats = [{'route': route, 'sql': sql, 'max_runs': n}
+                       for (route, sql), n in sorted(self._repeats.items(), key=lambda kv: -kv[1])]
+            scans   = [{'sql': squash(sql), 'full_scans': p['full_scans'], 'plan': p['plan']}
+                       for sql, p in self._plans.items() if p and p['full_scans']]
+        return {'mode': self.mode, 'repeat_limit': self.repeat_limit, 'default_budget': self.default_budget,
+                'routes': routes, 'repeated_statements': repeats, 'full_scans': scans,
+                'statements_explained': len(self._plans)}
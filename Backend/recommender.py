@@ -0,0 +1,248 @@
+"""Batch study-resource recommender.
+
+RESOURCE_DB is turned into one unit-normalised NumPy matrix per subject when
+the app starts. Scoring a cohort groups every (student, subject) pair by
+subject and ranks all of them with a single matrix multiply per subject.
+Rankings are stored compactly in ``recommendation_cache`` (resource order +
+similarities) and expanded back to full resource dicts when served. Triggers
+drop a student's cached row when their marks or attendance change.
+
+Usage:  python recommender.py [--department CSE] [--semester 4]
+"""
+import hashlib, json, time
+import numpy as np
+import summary
+
+VECTOR_DIMS   = ['beginner_need','intermediate_need','advanced_ready','practical_need','theory_need']
+ML_TECHNIQUE  = 'Content-Based Filtering (Cosine Similarity) + Collaborative Filtering'
+TOP_SUBJECTS  = 5
+TOP_RESOURCES = 3
+
+CACHE_TABLE_SQL = [
+    '''CREATE TABLE IF NOT EXISTS recommendation_cache (
+        student_id INTEGER PRIMARY KEY, index_version TEXT, payload TEXT, computed_at DATETIME)''',
+    *[f'''CREATE TRIGGER IF NOT EXISTS trg_reco_{t}_{op} AFTER {op.upper()} ON {t}
+          BEGIN DELETE FROM recommendation_cache WHERE student_id={ref}.student_id; END'''
+      for t in ('marks', 'attendance') for op, ref in (('insert','NEW'), ('update','NEW'), ('delete','OLD'))],
+]
+
+
+def _unit_rows(m):
+    norms = np.linalg.norm(m, axis=1, keepdims=True)
+    return np.divide(m, norms, out=np.zeros_like(m), where=norms > 0)
+
+
+class ResourceIndex:
+    """Pre-normalised resource matrices per subject (built once at startup).
+
+    ``to_vector`` is the scalar student_to_vector(marks, attendance_pct) from app.py.
+    """
+
+    def __init__(self, resource_db, default_resources, to_vector):
+        self.version   = hashlib.sha1(json.dumps([resource_db, default_resources], sort_keys=True)
+                                      .encode()).hexdigest()[:12]
+        self.to_vector = to_vector
+        self.vector_memo = {}
+        self.subjects = {s: self._build(r) for s, r in resource_db.items()}
+        self.default  = self._build(default_resources)
+
+    @staticmethod
+    def _build(resources):
+        decorated = [{
+            **r,
+            'youtube_url': f"https://www.youtube.com/results?search_query={r['url_query'].replace(' ', '+')}" if r['type'] == 'YouTube' else None,
+            'search_url' : f"https://www.google.com/search?q={r['url_query'].replace(' ', '+')}",
+        } for r in resources]
+        return decorated, _unit_rows(np.array([r['vector'] for r in resources], dtype=float))
+
+    def get(self, subject):
+        return self.subjects.get(subject, self.default)
+
+
+def student_vectors(index, marks, attendance):
+    """(N,) marks and attendance % → (N, 5) feature matrix.
+
+    Marks are integers and attendance has one decimal, so there are only a
+    bounded number of distinct pairs. Each pair goes through the scalar
+    to_vector once (keeping its exact rounding) and is memoised on the index.
+    """
+    marks, attendance = np.asarray(marks, dtype=float), np.asarray(attendance, dtype=float)
+    keys = (np.round(marks * 10000) + np.round(attendance * 10)).astype(np.int64)
+    uniq, first, inverse = np.unique(keys, return_index=True, return_inverse=True)
+    memo = index.vector_memo
+    for k, i in zip(uniq.tolist(), first.tolist()):
+        if k not in memo:
+            memo[k] = index.to_vector(float(marks[i]), float(attendance[i]))
+    table = np.array([memo[k] for k in uniq.tolist()], dtype=float).reshape(-1, 5)
+    return table[inverse.ravel()]
+
+
+def _strategy(avg_marks):
+    if avg_marks < 55:
+        return "Start with beginner YouTube videos. Understand basics before anything else.", "Theory & Fundamentals"
+    if avg_marks < 70:
+        return "Mix of theory + practice. Do notes first, then solve problems.", "Concept Clarity + Practice"
+    return "You are doing well! Focus on advanced topics and interview prep.", "Advanced Topics + Interview Prep"
+
+
+COHORT_SQL = '''
+    SELECT m.student_id, m.subject, m.total_marks, m.grade,
+           (SELECT a.percentage FROM attendance a
+            WHERE a.student_id=m.student_id AND a.subject=m.subject ORDER BY a.id DESC LIMIT 1) AS attendance
+    FROM marks m JOIN students s ON s.id=m.student_id
+    WHERE {where}
+    ORDER BY m.student_id, m.id
+'''
+
+def _load(conn, where, params):
+    """Cohort marks as parallel columns, in (student_id, marks.id) order."""
+    rows = conn.execute(COHORT_SQL.format(where=where), params).fetchall()
+    cols = list(zip(*rows)) if rows else [(), (), (), (), ()]
+    return {'sid': np.array(cols[0], dtype=np.int64), 'subject': list(cols[1]),
+            'marks': np.array(cols[2], dtype=float), 'grade': list(cols[3]),
+            'attendance': np.array([80 if a is None else a for a in cols[4]], dtype=float)}
+
+
+def rank(index, data):
+    """Cohort columns from _load() → {student_id: compact payload}.
+
+    Priorities, per-student ordering and aggregates are vectorised over the
+    whole cohort; similarity is one matrix multiply per subject.
+    """
+    n = len(data['sid'])
+    if not n:
+        return {}
+    sid, marks, att = data['sid'], data['marks'], data['attendance']
+    gp       = np.array([summary.GRADE_POINTS.get(g, 7) for g in data['grade']], dtype=float)
+    priority = np.round((100 - marks) * 0.6 + (10 - gp) * 4, 1)
+    needs    = (marks < 75) | np.isin(np.array(data['grade'], dtype=object), ['B', 'C'])
+
+    # Highest priority first within each student; ties keep marks-row order
+    order  = np.lexsort((np.arange(n), -priority, sid))
+    s_sid  = sid[order]
+    starts = np.flatnonzero(np.r_[True, s_sid[1:] != s_sid[:-1]])
+    counts = np.diff(np.r_[starts, n])
+    pos    = np.arange(n) - np.repeat(starts, counts)
+    top    = order[pos < TOP_SUBJECTS]
+
+    vectors, ranked = np.zeros((n, 5)), {}
+    subjects = np.array(data['subject'], dtype=object)
+    for subject in set(subjects[top]):
+        rows = top[subjects[top] == subject]
+        _, unit_r = index.get(subject)
+        vecs  = student_vectors(index, marks[rows], att[rows])
+        sims  = np.round(_unit_rows(vecs) @ unit_r.T, 4)
+        res_order = np.argsort(-sims, axis=1, kind='stable')
+        vectors[rows] = vecs
+        # similarities (and vectors below) are stored as scaled integers: exact after
+        # round(…, 4) / round(…, 2) and much cheaper to JSON-encode than floats
+        sims_e4 = np.rint(np.take_along_axis(sims, res_order, axis=1) * 10000).astype(np.int64)
+        for r, o, sm in zip(rows.tolist(), res_order.tolist(), sims_e4.tolist()):
+            ranked[r] = [o, sm]
+
+    avg   = np.round(np.add.reduceat(marks[order], starts) / counts, 1).tolist()
+    weak  = np.add.reduceat(needs[order].astype(int), starts).tolist()
+    o_l, needs_l, vec_l = order.tolist(), needs.tolist(), np.rint(vectors * 100).astype(np.int64).tolist()
+    marks_l, att_l, pr_l = marks.tolist(), att.tolist(), priority.tolist()
+    subj_l, grade_l = data['subject'], data['grade']
+    payloads = {}
+    for g, (start, count) in enumerate(zip(starts.tolist(), counts.tolist())):
+        idx = o_l[start:start + count]
+        payloads[int(s_sid[start])] = {
+            'total_subjects'     : count,
+            'weak_subjects_count': weak[g],
+            'weak_subjects'      : [subj_l[i] for i in idx if needs_l[i]],
+            'average_marks'      : avg[g],
+            'subjects'           : [[subj_l[i], int(marks_l[i]), grade_l[i], att_l[i], pr_l[i],
+                                     needs_l[i], vec_l[i], ranked[i]] for i in idx[:TOP_SUBJECTS]],
+        }
+    return payloads
+
+
+def expand(index, student_id, payload):
+    """Compact cached payload → the /api/ai/recommendations response (minus peer_insights)."""
+    recommendations = []
+    for subject, marks, grade, att, priority, needs_help, vec, (order, sims) in payload['subjects']:
+        resources, _ = index.get(subject)
+        scored = [{**resources[i], 'similarity_score': sim,
+                   'match_level': 'Perfect Match' if sim >= 0.8 else 'Good Match' if sim >= 0.5 else 'Suggested'}
+                  for i, sim in zip(order, (e4 / 10000 for e4 in sims))]
+        recommendations.append({
+            'subject'        : subject,
+            'marks'          : marks,
+            'grade'          : grade,
+            'attendance'     : att,
+            'priority_score' : priority,
+            'needs_help'     : needs_help,
+            'student_vector' : [v / 100 for v in vec],
+            'top_resources'  : scored[:TOP_RESOURCES],
+            'all_resources'  : scored,
+        })
+    strategy, focus = _strategy(payload['average_marks'])
+    return {
+        'student_id'          : student_id,
+        'total_subjects'      : payload['total_subjects'],
+        'weak_subjects_count' : payload['weak_subjects_count'],
+        'average_marks'       : payload['average_marks'],
+        'learning_strategy'   : strategy,
+        'focus_area'          : focus,
+        'recommendations'     : recommendations,
+        'ml_technique'        : ML_TECHNIQUE,
+        'vector_dimensions'   : VECTOR_DIMS,
+    }
+
+
+def _store(conn, index, payloads):
+    encode = json.JSONEncoder(separators=(',', ':'), check_circular=False).encode
+    conn.executemany('''INSERT OR REPLACE INTO recommendation_cache (student_id,index_version,payload,computed_at)
+                        VALUES (?,?,?,CURRENT_TIMESTAMP)''',
+                     [(sid, index.version, encode(p)) for sid, p in payloads.items()])
+    conn.commit()
+
+
+def for_student(conn, index, student_id):
+    """Cached payload for one student, computing and caching it on a miss. None if no marks."""
+    row = conn.execute('SELECT index_version,payload FROM recommendation_cache WHERE student_id=?',
+                       (student_id,)).fetchone()
+    if row and row[0] == index.version:
+        return json.loads(row[1])
+    payloads = rank(index, _load(conn, 'm.student_id=?', (student_id,)))
+    if student_id not in payloads:
+        return None
+    _store(conn, index, payloads)
+    return payloads[student_id]
+
+
+def refresh_cohort(conn, index, department=None, semester=None, chunk=20000):
+    """Rank a whole department/semester (or everyone) and rewrite their cache rows."""
+    where, params = ['1=1'], []
+    if department:
+        where.append('s.department=?'); params.append(department)
+    if semester:
+        where.append('s.semester=?'); params.append(semester)
+    start = time.perf_counter()
+    ids = [r[0] for r in conn.execute(f"SELECT s.id FROM students s WHERE {' AND '.join(where)} ORDER BY s.id", params)]
+    total = 0
+    for i in range(0, len(ids), chunk):
+        lo, hi = ids[i], ids[min(i + chunk, len(ids)) - 1]
+        payloads = rank(index, _load(conn, ' AND '.join(where + ['m.student_id BETWEEN ? AND ?']), params + [lo, hi]))
+        _store(conn, index, payloads)
+        total += len(payloads)
+    return {'students': total, 'seconds': round(time.perf_counter() - start, 3)}
+
+
+if __name__ == '__main__':
+    import argparse, os, sqlite3
+    from app import RESOURCE_INDEX
+    ap = argparse.ArgumentParser()
+    ap.add_argument('--department')
+    ap.add_argument('--semester', type=int)
+    args = ap.parse_args()
+
+    db = os.path.join(os.path.dirname(__file__), 'data', 'campus.db')
+    if not os.path.exists(db):
+        raise SystemExit("ERROR: campus.db not found. Run app.py first!")
+    conn = sqlite3.connect(db)
+    r = refresh_cohort(conn, RESOURCE_INDEX, args.department, args.semester)
+    conn.close()
+    print(f"Ranked {r['students']} students in {r['seconds']}s")
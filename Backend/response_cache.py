@@ -0,0 +1,134 @@
+"""In-process LRU/TTL cache for read-heavy JSON endpoints.
+
+Entries are keyed by request path (route + student_id / semester) and store
+the encoded response body with its ETag. Each entry carries a tag such as
+``student:42`` so writes can drop everything cached for one student. Total
+body size is capped; the least recently used entries are evicted first.
+"""
+import hashlib, threading, time
+from collections import OrderedDict
+from functools import wraps
+from flask import request, make_response
+
+
+class Entry:
+    __slots__ = ('body', 'etag', 'mimetype', 'expires', 'tag')
+
+    def __init__(self, body, mimetype, expires, tag):
+        self.body     = body
+        self.etag     = hashlib.sha1(body).hexdigest()[:20]
+        self.mimetype = mimetype
+        self.expires  = expires
+        self.tag      = tag
+
+
+class ResponseCache:
+
+    def __init__(self, max_bytes=32 * 1024 * 1024, ttl=300):
+        self.max_bytes = max_bytes
+        self.ttl       = ttl
+        self._entries  = OrderedDict()
+        self._tags     = {}
+        self._bytes    = 0
+        self._lock     = threading.Lock()
+        self._stats    = {'hits': 0, 'misses': 0, 'not_modified': 0, 'evictions': 0,
+                          'expirations': 0, 'invalidations': 0}
+
+    def _drop(self, key):
+        e = self._entries.pop(key)
+        self._bytes -= len(e.body)
+        keys = self._tags.get(e.tag)
+        if keys is not None:
+            keys.discard(key)
+            if not keys:
+                del self._tags[e.tag]
+
+    def get(self, key):
+        with self._lock:
+            e = self._entries.get(key)
+            if e is None:
+                self._stats['misses'] += 1
+                return None
+            if e.expires <= time.monotonic():
+                self._drop(key)
+                self._stats['expirations'] += 1
+                self._stats['misses'] += 1
+                return None
+            self._entries.move_to_end(key)
+            self._stats['hits'] += 1
+            return e
+
+    def put(self, key, body, mimetype, tag):
+        e = Entry(body, mimetype, time.monotonic() + self.ttl, tag)
+        if len(body) > self.max_bytes:
+            return e
+        with self._lock:
+            if key in self._entries:
+                self._drop(key)
+            self._entries[key] = e
+            self._tags.setdefault(tag, set()).add(key)
+            self._bytes += len(body)
+            while self._bytes > self.max_bytes:
+                self._drop(next(iter(self._entries)))
+                self._stats['evictions'] += 1
+        return e
+
+    def invalidate(self, *tags):
+        """Drop every entry carrying one of ``tags``; returns how many went."""
+        n = 0
+        with self._lock:
+            for tag in tags:
+                for key in list(self._tags.get(tag, ())):
+                    self._drop(key)
+                    n += 1
+            self._stats['invalidations'] += n
+        return n
+
+    def invalidate_students(self, student_ids):
+        return self.invalidate(*(f'student:{sid}' for sid in student_ids))
+
+    def clear(self):
+        with self._lock:
+            self._stats['invalidations'] += len(self._entries)
+            self._entries.clear()
+            self._tags.clear()
+            self._bytes = 0
+
+    def note_not_modified(self):
+        with self._lock:
+            self._stats['not_modified'] += 1
+
+    def stats(self):
+        with self._lock:
+            lookups = self._stats['hits'] + self._stats['misses']
+            return {**self._stats, 'entries': len(self._entries), 'bytes': self._bytes,
+                    'max_bytes': self.max_bytes, 'ttl': self.ttl,
+                    'hit_ratio': round(self._stats['hits'] / lookups, 3) if lookups else 0}
+
+
+def cached(cache, tag):
+    """Route decorator: serve 200 responses from ``cache`` with ETag / If-None-Match.
+
+    ``tag`` is formatted with the view's URL arguments, e.g. 'student:{student_id}'.
+    Non-200 responses pass straight through and are never cached.
+    """
+    def deco(view):
+        @wraps(view)
+        def wrapper(**kwargs):
+            key   = request.path
+            entry = cache.get(key)
+            if entry is None:
+                resp = make_response(view(**kwargs))
+                if resp.status_code != 200:
+                    return resp
+                entry = cache.put(key, resp.get_data(), resp.mimetype, tag.format(**kwargs))
+            resp = make_response(entry.body)
+            resp.mimetype = entry.mimetype
+            resp.set_etag(entry.etag)
+            resp.headers['Cache-Control'] = 'private, no-cache'
+            resp = resp.make_conditional(request)
+            if resp.status_code == 304:
+                cache.note_not_modified()
+            return resp
+        return wrapper
+    return deco
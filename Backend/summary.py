@@ -0,0 +1,107 @@
+"""Materialized per-student academic summary (CGPA + detention risk).
+
+``student_summary`` holds one row per student with credit-weighted grade
+points, credits, subject count and the below-75% subjects (with classes_needed) as JSON. SQLite
+triggers on ``marks`` and ``attendance`` recompute a student's row whenever
+their rows change, so reads are a single primary-key lookup.
+
+Usage:  python summary.py        # bulk rebuild every student's row
+"""
+import json
+
+GRADE_POINTS     = {'A+': 10, 'A': 9, 'B+': 8, 'B': 7, 'C': 6}
+MIN_ATTENDANCE   = 75
+
+_GP_CASE = 'CASE grade ' + ' '.join(f"WHEN '{g}' THEN {p}" for g, p in GRADE_POINTS.items()) + ' ELSE 7 END'
+
+# {sid} is an SQL expression for the student id, {source} an optional FROM clause
+_REFRESH_TEMPLATE = f'''
+    INSERT OR REPLACE INTO student_summary
+        (student_id, grade_points, total_credits, total_subjects, low_attendance_count, low_attendance, updated_at)
+    SELECT {{sid}},
+        COALESCE((SELECT SUM({_GP_CASE} * credits) FROM marks WHERE student_id={{sid}}), 0),
+        COALESCE((SELECT SUM(credits) FROM marks WHERE student_id={{sid}}), 0),
+        (SELECT COUNT(*) FROM attendance WHERE student_id={{sid}}),
+        (SELECT COUNT(*) FROM attendance WHERE student_id={{sid}} AND percentage < {MIN_ATTENDANCE}),
+        (SELECT json_group_array(json_object(
+                    'id', id, 'student_id', student_id, 'subject', subject,
+                    'total_classes', total_classes, 'attended_classes', attended_classes,
+                    'percentage', percentage,
+                    'classes_needed', MAX(0, CAST((0.75*total_classes - attended_classes)/0.25 AS INTEGER) + 1)))
+         FROM (SELECT * FROM attendance WHERE student_id={{sid}} AND percentage < {MIN_ATTENDANCE} ORDER BY id)),
+        CURRENT_TIMESTAMP
+    {{source}}
+'''
+
+def _refresh_sql(sid, source=''):
+    return _REFRESH_TEMPLATE.format(sid=sid, source=source)
+
+REFRESH_ONE_SQL = _refresh_sql('p.sid', 'FROM (SELECT ? AS sid) p')
+REBUILD_ALL_SQL = _refresh_sql('s.id',  'FROM students s')
+
+
+def _triggers():
+    stmts = []
+    # low_attendance stores each subject's name, so renaming one must refresh it too
+    for table, cols in (('marks', 'student_id, grade, credits'),
+                        ('attendance', 'student_id, subject, total_classes, attended_classes, percentage')):
+        stmts.append(f'DROP TRIGGER IF EXISTS trg_summary_{table}_ins')
+        stmts.append(f'DROP TRIGGER IF EXISTS trg_summary_{table}_del')
+        stmts.append(f'DROP TRIGGER IF EXISTS trg_summary_{table}_upd')
+        stmts.append(f'''CREATE TRIGGER trg_summary_{table}_ins AFTER INSERT ON {table}
+            BEGIN {_refresh_sql('NEW.student_id')}; END''')
+        stmts.append(f'''CREATE TRIGGER trg_summary_{table}_del AFTER DELETE ON {table}
+            BEGIN {_refresh_sql('OLD.student_id')}; END''')
+        stmts.append(f'''CREATE TRIGGER trg_summary_{table}_upd AFTER UPDATE OF {cols} ON {table}
+            BEGIN {_refresh_sql('OLD.student_id')}; {_refresh_sql('NEW.student_id')}; END''')
+    return stmts
+
+
+def install(conn):
+    """Migration step: create the table + triggers and populate it."""
+    conn.execute('''CREATE TABLE IF NOT EXISTS student_summary (
+        student_id INTEGER PRIMARY KEY, grade_points INTEGER DEFAULT 0, total_credits INTEGER DEFAULT 0,
+        total_subjects INTEGER DEFAULT 0, low_attendance_count INTEGER DEFAULT 0,
+        low_attendance TEXT DEFAULT '[]', updated_at DATETIME)''')
+    install_triggers(conn)
+    conn.execute(REBUILD_ALL_SQL)
+
+
+def install_triggers(conn):
+    """(Re)create the marks/attendance triggers; also the migration step that adds ``subject``."""
+    for stmt in _triggers():
+        conn.execute(stmt)
+
+
+def rebuild(conn, student_id=None):
+    """Recompute one student's row, or every student's when student_id is None."""
+    if student_id is None:
+        conn.execute(REBUILD_ALL_SQL)
+    else:
+        conn.execute(REFRESH_ONE_SQL, (student_id,))
+    conn.commit()
+
+
+def get_summary(conn, student_id):
+    """Single-row lookup → dict with cgpa and decoded low_attendance (zeros if the student has no data yet)."""
+    row = conn.execute('SELECT * FROM student_summary WHERE student_id=?', (student_id,)).fetchone()
+    if not row:
+        return {'student_id': student_id, 'cgpa': 0, 'grade_points': 0, 'total_credits': 0,
+                'total_subjects': 0, 'low_attendance_count': 0, 'low_attendance': []}
+    s = dict(row)
+    s['cgpa'] = round(s['grade_points'] / s['total_credits'], 2) if s['total_credits'] else 0
+    s['low_attendance'] = json.loads(s['low_attendance'] or '[]')
+    return s
+
+
+if __name__ == '__main__':
+    import os, sqlite3, time
+    db = os.path.join(os.path.dirname(__file__), 'data', 'campus.db')
+    if not os.path.exists(db):
+        raise SystemExit("ERROR: campus.db not found. Run app.py first!")
+    conn = sqlite3.connect(db)
+    t0 = time.perf_counter()
+    rebuild(conn)
+    n = conn.execute('SELECT COUNT(*) FROM student_summary').fetchone()[0]
+    conn.close()
+    print(f"Rebuilt summaries for {n} students in {time.perf_counter()-t0:.2f}s")
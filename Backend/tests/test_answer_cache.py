@@ -0,0 +1,55 @@
+"""Answer-cache scoping and near-duplicate matching.
+
+Usage:  python -m unittest discover -s tests      (or: python -m pytest tests)
+
+A question classed 'shared' gets one answer for every student, so anything
+that asks about the student's own records must stay 'student'.
+"""
+import os, sys, unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from answer_cache import AnswerCache, classify
+
+
+class ClassifyTest(unittest.TestCase):
+
+    def assertKind(self, kind, *questions):
+        for q in questions:
+            with self.subTest(q=q):
+                self.assertEqual(classify(q), kind)
+
+    def test_general_campus_questions_are_shared(self):
+        self.assertKind('shared', 'What are the outpass rules?', 'Hostel timings on Sunday',
+                        'How to apply for on duty?', 'library timing', 'How is the grade point calculated?')
+
+    def test_questions_about_own_records_are_student(self):
+        self.assertKind('student', 'outpass status?', 'hostel fee pending?', 'Is my outpass approved',
+                        'hostel fee due date', 'mess fee payment', 'apply for scholarship',
+                        'hostel attendance', 'outpass rejected why', 'what are my marks')
+
+    def test_personal_and_faculty(self):
+        self.assertKind('student', 'am i safe from detention', 'hostel rules for me')
+        self.assertKind('faculty', 'where is the hod', 'is the warden available')
+        self.assertKind('student', 'tell me a joke')
+
+
+class FuzzyTest(unittest.TestCase):
+
+    def test_fuzzy_is_off_by_default(self):
+        cache = AnswerCache()
+        cache.put('shared', 'am i safe from detention', None, 'yes', 1)
+        self.assertIsNone(cache.get('shared', 'am i safe from detention now', None))
+
+    def test_numbers_must_match(self):
+        cache = AnswerCache(fuzzy=0.9)
+        cache.put('shared', 'What is the fee for semester 5?', None, 'five', 1)
+        self.assertIsNone(cache.get('shared', 'what is the fee for semester 4', None))
+        self.assertIsNone(cache.get('shared', 'what is the fee for fourth semester', None))
+        self.assertEqual(cache.get('shared', 'what is the fee for semester 5 ?', None), 'five')
+        cache.put('shared', 'am i safe from detention', None, 'yes', 1)
+        self.assertEqual(cache.get('shared', 'am i safe from detention now', None), 'yes')
+        self.assertEqual(cache.stats()['fuzzy_hits'], 1)
+
+
+if __name__ == '__main__':
+    unittest.main()
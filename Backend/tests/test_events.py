@@ -0,0 +1,95 @@
+"""EventBus over a temporary event_log: delivery across processes, replay and resync.
+
+Usage:  python -m unittest discover -s tests      (or: python -m pytest tests)
+
+Two EventBus objects on one database file stand in for two gunicorn workers:
+an event published on one must reach the other's subscribers.
+"""
+import os, sys, json, shutil, tempfile, unittest
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+import db, events
+from events import EventBus
+
+
+class EventBusTest(unittest.TestCase):
+
+    def setUp(self):
+        self.dir  = tempfile.mkdtemp()
+        self.path = os.path.join(self.dir, 'campus.db')
+        conn = db.connect(self.path)
+        for sql in events.SCHEMA_SQL:
+            conn.execute(sql)
+        conn.commit()
+        conn.close()
+
+    def tearDown(self):
+        shutil.rmtree(self.dir)
+
+    def bus(self, **kw):
+        kw.setdefault('poll_interval', 0.02)
+        return EventBus(lambda: db.connect(self.path), **kw)
+
+    def next_event(self, sub):
+        event_id, topic, payload = sub.queue.get(timeout=2)
+        return event_id, topic, json.loads(payload)
+
+    def test_other_worker_receives_event(self):
+        writer, reader = self.bus(), self.bus()
+        sub = reader.subscribe(['outpass'])
+        writer.publish('helpdesk', 'created', {'id': 1})            # not subscribed
+        event_id = writer.publish('outpass', 'created', {'id': 7})
+        self.assertEqual(self.next_event(sub), (event_id, 'outpass', {'type': 'created', 'data': {'id': 7}}))
+        reader.unsubscribe(sub)
+
+    def test_reconnect_replays_from_log(self):
+        bus = self.bus()
+        first = bus.publish('outpass', 'created', {'id': 1})
+        bus.publish_many('outpass', 'updated', [{'id': 1}, {'id': 2}])
+        restarted = self.bus()                                       # a new worker after a deploy
+        sub = restarted.subscribe(['outpass'], last_id=first)
+        self.assertEqual([self.next_event(sub)[2]['data']['id'] for _ in range(2)], [1, 2])
+        self.assertFalse(sub.lagged)
+        restarted.unsubscribe(sub)
+
+    def test_unknown_or_pruned_id_resyncs(self):
+        bus = self.bus(history=5)
+        bus.publish_many('outpass', 'created', [{'id': i} for i in range(events.PRUNE_EVERY)])
+        sub = bus.subscribe(['outpass'], last_id=10 ** 6)             # never issued (database replaced)
+        self.assertTrue(sub.lagged)
+        sub = bus.subscribe(['outpass'], last_id=1)                   # trimmed from the log
+        self.assertTrue(sub.lagged)
+
+    def test_unstarted_stream_does_not_subscribe(self):
+        bus = self.bus()
+        stream = bus.stream(['outpass'])
+        stream.close()
+        self.assertEqual(bus.stats()['subscribers'], 0)
+        stream = bus.stream(['outpass'])
+        self.assertEqual(next(stream), 'retry: 3000\n\n')
+        self.assertEqual(bus.stats()['subscribers'], 1)
+        stream.close()
+        self.assertEqual(bus.stats()['subscribers'], 0)
+
+    def test_stream_limit(self):
+        bus = self.bus(max_subscribers=1)
+        first = bus.stream(['outpass'])
+        next(first)
+        with self.assertRaises(events.BusFull):
+            bus.stream(['outpass'])
+        first.close()
+        next(bus.stream(['outpass']))                                # room again once the first one left
+        self.assertEqual(bus.stats()['rejected'], 1)
+
+    def test_stream_formats_events(self):
+        bus = self.bus()
+        stream = bus.stream(['onduty'])
+        next(stream)
+        event_id = bus.publish('onduty', 'updated', {'id': 3, 'status': 'Approved'})
+        self.assertEqual(next(stream), f'id: {event_id}\nevent: onduty\n'
+                                       'data: {"type": "updated", "data": {"id": 3, "status": "Approved"}}\n\n')
+        stream.close()
+
+
+if __name__ == '__main__':
+    unittest.main()
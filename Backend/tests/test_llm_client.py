@@ -0,0 +1,225 @@
+"""LLMClient against a local stub of the chat completions API.
+
+Usage:  python -m unittest discover -s tests      (or: python -m pytest tests)
+
+The stub is a ThreadingHTTPServer that answers each POST /v1/chat/completions
+from a script of (status, body or stream chunks, delay) steps, so retries,
+429/5xx handling, the concurrency limit and every breaker state can be
+driven without the network.
+"""
+import os, sys, json, time, threading, unittest
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+
+sys.path.insert(0, os.path.join(os.path.dirname(__file__), '..'))
+from llm_client import LLMClient, CircuitBreaker, UpstreamError, CircuitOpen, UpstreamBusy
+
+MESSAGES = [{'role': 'user', 'content': 'hi'}]
+
+
+def reply(text):
+    return (200, {'choices': [{'message': {'content': text}}]}, 0)
+
+def stream(*deltas, delay=0):
+    return (200, [{'choices': [{'delta': {'content': d}}]} for d in deltas], delay)
+
+def status(code, delay=0):
+    return (code, {'error': {'message': f'stub {code}'}}, delay)
+
+
+class Stub(BaseHTTPRequestHandler):
+    protocol_version = 'HTTP/1.1'
+
+    def log_message(self, *args):
+        pass
+
+    def do_POST(self):
+        body = json.loads(self.rfile.read(int(self.headers['Content-Length'])))
+        srv  = self.server
+        with srv.lock:
+            srv.requests.append(body)
+            code, payload, delay = srv.script.pop(0) if srv.script else reply('default')
+        time.sleep(delay)
+        if isinstance(payload, list):          # server-sent events
+            data = b''.join(b'data: ' + json.dumps(c).encode() + b'\n\n' for c in payload) + b'data: [DONE]\n\n'
+            ctype = 'text/event-stream'
+        else:
+            data, ctype = json.dumps(payload).encode(), 'application/json'
+        self.send_response(code)
+        self.send_header('Content-Type', ctype)
+        self.send_header('Content-Length', str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+
+class LLMClientTest(unittest.TestCase):
+
+    def setUp(self):
+        self.server = ThreadingHTTPServer(('127.0.0.1', 0), Stub)
+        self.server.lock, self.server.script, self.server.requests = threading.Lock(), [], []
+        threading.Thread(target=self.server.serve_forever, daemon=True).start()
+        self.url = f'http://127.0.0.1:{self.server.server_port}/v1'
+
+    def tearDown(self):
+        self.server.shutdown()
+        self.server.server_close()
+
+    def client(self, **kw):
+        kw.setdefault('backoff', 0)
+        kw.setdefault('breaker', CircuitBreaker(threshold=2, cooldown=0.2))
+        return LLMClient('sk-test', base_url=self.url, **kw)
+
+    def script(self, *steps):
+        self.server.script.extend(steps)
+
+    # ── completions and retries ──────────────────────────────────────
+    def test_complete_returns_reply_and_reuses_connection(self):
+        c = self.client()
+        self.script(reply('one'), reply('two'))
+        self.assertEqual(c.complete(MESSAGES), 'one')
+        self.assertEqual(c.complete(MESSAGES), 'two')
+        self.assertEqual(self.server.requests[0]['messages'], MESSAGES)
+        self.assertEqual(c.stats()['ok'], 2)
+        self.assertEqual(c.pool.opened, 1)
+
+    def test_429_and_5xx_are_retried(self):
+        c = self.client(retries=2)
+        self.script(status(429), status(503), reply('finally'))
+        self.assertEqual(c.complete(MESSAGES), 'finally')
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(c.stats()['retries'], 2)
+        self.assertEqual(c.breaker.state, 'closed')
+
+    def test_retries_give_up(self):
+        c = self.client(retries=2)
+        self.script(status(500), status(502), status(500))
+        with self.assertRaisesRegex(UpstreamError, 'HTTP 500'):
+            c.complete(MESSAGES)
+        self.assertEqual(len(self.server.requests), 3)
+        self.assertEqual(c.stats()['failed'], 1)
+
+    def test_client_errors_are_not_retried(self):
+        c = self.client(retries=2)
+        self.script(status(400))
+        with self.assertRaisesRegex(UpstreamError, 'HTTP 400'):
+            c.complete(MESSAGES)
+        self.assertEqual(len(self.server.requests), 1)
+
+    def test_connection_refused(self):
+        c = self.client(retries=1)
+        self.tearDown()
+        with self.assertRaises(UpstreamError):
+            c.complete(MESSAGES)
+        self.setUp()
+
+    def test_concurrency_limit_times_out(self):
+        c = self.client(max_concurrency=1, queue_timeout=0.1)
+        self.script((200, reply('slow')[1], 0.5))
+        slow = threading.Thread(target=c.complete, args=(MESSAGES,))
+        slow.start()
+        time.sleep(0.1)
+        with self.assertRaises(UpstreamBusy):
+            c.complete(MESSAGES)
+        slow.join()
+        self.assertEqual(c.stats()['busy'], 1)
+
+    # ── circuit breaker ──────────────────────────────────────────────
+    def test_breaker_opens_short_circuits_and_recovers(self):
+        c = self.client(retries=0)
+        self.script(status(500), status(500))
+        for _ in range(2):
+            with self.assertRaises(UpstreamError):
+                c.complete(MESSAGES)
+        self.assertEqual(c.breaker.state, 'open')
+        with self.assertRaises(CircuitOpen):
+            c.complete(MESSAGES)
+        self.assertEqual(len(self.server.requests), 2)          # never reached the server
+
+        time.sleep(0.25)
+        self.script(reply('back'))
+        self.assertEqual(c.complete(MESSAGES), 'back')          # the half-open trial
+        self.assertEqual(c.breaker.state, 'closed')
+
+    def test_failed_trial_reopens(self):
+        c = self.client(retries=0)
+        self.script(status(500), status(500), status(500))
+        for _ in range(2):
+            with self.assertRaises(UpstreamError):
+                c.complete(MESSAGES)
+        time.sleep(0.25)
+        with self.assertRaises(UpstreamError):
+            c.complete(MESSAGES)
+        self.assertEqual(c.breaker.state, 'open')
+        with self.assertRaises(CircuitOpen):
+            c.complete(MESSAGES)
+
+    def test_abandoned_trial_reopens(self):
+        b = CircuitBreaker(threshold=1, cooldown=0.05)
+        b.failure()
+        time.sleep(0.06)
+        self.assertTrue(b.allow())
+        self.assertEqual(b.state, 'half-open')
+        b.abandon()
+        self.assertEqual(b.state, 'open')
+        self.assertFalse(b.allow())
+        time.sleep(0.06)
+        self.assertTrue(b.allow())                               # a new trial after a fresh cooldown
+
+    def test_busy_trial_reopens(self):
+        c = self.client(retries=0, max_concurrency=1, queue_timeout=0.1)
+        self.script(status(500), status(500))
+        for _ in range(2):
+            with self.assertRaises(UpstreamError):
+                c.complete(MESSAGES)
+        time.sleep(0.25)
+        c._slots.acquire()                                       # another call holds the only slot
+        with self.assertRaises(UpstreamBusy):
+            c.complete(MESSAGES)                                 # the half-open trial times out queueing
+        c._slots.release()
+        self.assertEqual(c.breaker.state, 'open')
+        time.sleep(0.25)
+        self.script(reply('recovered'))
+        self.assertEqual(c.complete(MESSAGES), 'recovered')
+        self.assertEqual(c.breaker.state, 'closed')
+
+    # ── streaming ────────────────────────────────────────────────────
+    def test_stream_yields_deltas(self):
+        c = self.client()
+        self.script(status(503), stream('Hel', 'lo'))
+        self.assertEqual(''.join(c.stream(MESSAGES)), 'Hello')
+        self.assertTrue(self.server.requests[-1]['stream'])
+        self.assertEqual(c.stats()['retries'], 1)
+
+    def test_cancelled_half_open_stream_settles_breaker(self):
+        c = self.client(retries=0)
+        self.script(status(500), status(500))
+        for _ in range(2):
+            with self.assertRaises(UpstreamError):
+                c.complete(MESSAGES)
+        time.sleep(0.25)
+        self.script(stream('a', 'b', 'c'))
+        chunks = c.stream(MESSAGES)
+        self.assertEqual(next(chunks), 'a')
+        self.assertEqual(c.breaker.state, 'half-open')
+        chunks.close()                                           # the browser went away
+        self.assertEqual(c.breaker.state, 'closed')
+        self.script(reply('still works'))
+        self.assertEqual(c.complete(MESSAGES), 'still works')
+
+    def test_observer_sees_outcomes(self):
+        seen = []
+        c = self.client(retries=0)
+        c.observer = lambda kind, outcome, seconds: seen.append((kind, outcome))
+        self.script(reply('x'), stream('y'), status(500), status(500))
+        c.complete(MESSAGES)
+        list(c.stream(MESSAGES))
+        for _ in range(2):
+            with self.assertRaises(UpstreamError):
+                c.complete(MESSAGES)
+        with self.assertRaises(CircuitOpen):
+            c.complete(MESSAGES)
+        self.assertEqual(seen, [('complete', 'ok'), ('stream', 'ok'), ('complete', 'error'),
+                                ('complete', 'error'), ('complete', 'short_circuited')])
+
+
+if __name__ == '__main__':
+    unittest.main()
@@ -0,0 +1,241 @@
+"""Timetable grids per student, room and teacher, with now/next and clash lookups.
+
+Each timetable row also stores ``day_idx`` (0 = MON … 4 = FRI) and
+``slot_idx`` (position in SLOTS), filled by triggers. Rows therefore sort
+Monday-first, and the week is a fixed grid of ``len(DAYS) * len(SLOTS)``
+cells.
+
+In memory every distinct (subject, teacher, room) session is stored once.
+A student's week is an ``array('I')`` of session numbers, one per cell
+(0 = free). Room and teacher grids map each cell to the set of sessions held
+there. "Is room X free now", "what is Y teaching now" and "who clashes" are
+therefore dictionary and list lookups, not scans of the timetable table.
+
+The index is rebuilt when the ``timetable`` counter in data_versions moves.
+While rows are streaming in (e.g. the backfill) it rebuilds at most once
+every ``min_interval`` seconds.
+
+Usage:  python timetable_index.py [student_id]
+"""
+import datetime, threading, time
+from array import array
+from collections import namedtuple
+
+DAYS  = ['MON', 'TUE', 'WED', 'THU', 'FRI']
+SLOTS = ['8.00-8.50', '8.50-9.40', '9.50-10.40', '10.40-11.30',
+         '12.20-1.10', '1.10-2.00', '2.00-2.50', '2.50-3.40']
+CELLS = len(DAYS) * len(SLOTS)
+
+_DAY_CASE  = 'CASE UPPER(TRIM({ref}.day)) ' + ' '.join(f"WHEN '{d}' THEN {i}" for i, d in enumerate(DAYS)) + ' END'
+_SLOT_CASE = 'CASE TRIM({ref}.time_slot) ' + ' '.join(f"WHEN '{s}' THEN {i}" for i, s in enumerate(SLOTS)) + ' END'
+_SET_IDX   = f"UPDATE timetable SET day_idx={_DAY_CASE.format(ref='NEW')}, slot_idx={_SLOT_CASE.format(ref='NEW')} WHERE id=NEW.id"
+_BUMP      = '''INSERT INTO data_versions (scope, version) VALUES ('timetable', 1)
+                ON CONFLICT(scope) DO UPDATE SET version=version+1'''
+
+ROWS_SQL = '''SELECT student_id, day_idx, slot_idx, subject, teacher_name, room FROM timetable
+              WHERE day_idx IS NOT NULL AND slot_idx IS NOT NULL ORDER BY student_id, day_idx, slot_idx, id'''
+
+
+def install(conn):
+    """Migration step: add the index columns, back-fill them and keep them (and the version) up to date."""
+    cols = {r[1] for r in conn.execute('PRAGMA table_info(timetable)')}
+    for col in ('day_idx', 'slot_idx'):
+        if col not in cols:
+            conn.execute(f'ALTER TABLE timetable ADD COLUMN {col} INTEGER')
+    conn.execute(f"UPDATE timetable SET day_idx={_DAY_CASE.format(ref='timetable')}, "
+                 f"slot_idx={_SLOT_CASE.format(ref='timetable')}")
+    conn.execute('CREATE INDEX IF NOT EXISTS idx_timetable_grid ON timetable(student_id, day_idx, slot_idx)')
+    conn.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_timetable_idx_ins AFTER INSERT ON timetable
+        BEGIN {_SET_IDX}; {_BUMP}; END''')
+    conn.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_timetable_idx_upd
+        AFTER UPDATE OF student_id, day, time_slot, subject, teacher_name, room ON timetable
+        BEGIN {_SET_IDX}; {_BUMP}; END''')
+    conn.execute(f'''CREATE TRIGGER IF NOT EXISTS trg_timetable_idx_del AFTER DELETE ON timetable
+        BEGIN {_BUMP}; END''')
+
+
+def _slot_minutes(slot):
+    """'12.20-1.10' → (740, 790); afternoon hours are written 1-7."""
+    out = []
+    for part in slot.split('-'):
+        h, m = (int(x) for x in part.split('.'))
+        out.append((h + 12 if h < 8 else h) * 60 + m)
+    return tuple(out)
+
+SLOT_MINUTES = [_slot_minutes(s) for s in SLOTS]
+
+
+def cell_of(day_idx, slot_idx):
+    return day_idx * len(SLOTS) + slot_idx
+
+
+def locate(when):
+    """(current cell or None, next cell or None) for a datetime within the teaching week."""
+    day = when.weekday()
+    if day >= len(DAYS):
+        return None, None
+    minutes = when.hour * 60 + when.minute
+    for i, (start, end) in enumerate(SLOT_MINUTES):
+        if start <= minutes < end:
+            return cell_of(day, i), cell_of(day, i) + 1 if i + 1 < len(SLOTS) else None
+        if minutes < start:
+            return None, cell_of(day, i)
+    return None, None
+
+
+# One immutable build; lookups read a single snapshot so a concurrent rebuild never mixes two builds.
+#   sessions  session number → (subject, teacher, room); 0 = free
+#   students  student_id → array('I') of CELLS session numbers
+#   rooms     room → [set(session) | None] * CELLS
+#   teachers  teacher name → [set(session) | None] * CELLS
+#   clashes   [(student_id, cell, [session, ...])] double-booked students
+Snapshot = namedtuple('Snapshot', 'sessions students rooms teachers clashes')
+
+EMPTY = Snapshot([None], {}, {}, {}, [])
+
+
+def describe_cell(cell):
+    return {'day': DAYS[cell // len(SLOTS)], 'time_slot': SLOTS[cell % len(SLOTS)],
+            'day_idx': cell // len(SLOTS), 'slot_idx': cell % len(SLOTS)}
+
+
+class TimetableIndex:
+
+    def __init__(self, min_interval=5.0):
+        self.min_interval = min_interval
+        self.version   = None
+        self._built_at = 0.0
+        self._snap     = EMPTY
+        self._lock     = threading.Lock()
+
+    # ── building ──────────────────────────────────────────────────────
+    def build(self, rows, version=None):
+        """rows: (student_id, day_idx, slot_idx, subject, teacher_name, room), any order."""
+        sessions, numbers = [None], {}
+        students, rooms, teachers, extra = {}, {}, {}, {}
+        for sid, day, slot, subject, teacher, room in rows:
+            key = (subject, teacher, room)
+            num = numbers.get(key)
+            if num is None:
+                num = numbers[key] = len(sessions)
+                sessions.append(key)
+            grid = students.get(sid)
+            if grid is None:
+                grid = students[sid] = array('I', bytes(4 * CELLS))
+            cell = cell_of(day, slot)
+            if grid[cell] and grid[cell] != num:
+                extra.setdefault((sid, cell), [grid[cell]]).append(num)
+            elif not grid[cell]:
+                grid[cell] = num
+            for owner, table in ((room, rooms), (teacher, teachers)):
+                if owner:
+                    cells = table.get(owner)
+                    if cells is None:
+                        cells = table[owner] = [None] * CELLS
+                    if cells[cell] is None:
+                        cells[cell] = {num}
+                    else:
+                        cells[cell].add(num)
+        snap = Snapshot(sessions, students, rooms, teachers,
+                        [(sid, cell, nums) for (sid, cell), nums in extra.items()])
+        with self._lock:
+            self._snap, self.version, self._built_at = snap, version, time.monotonic()
+
+    def refresh(self, conn):
+        """Rebuild from the timetable table if it changed since the last build (rate-limited)."""
+        row = conn.execute("SELECT version FROM data_versions WHERE scope='timetable'").fetchone()
+        version = row[0] if row else 0
+        if version == self.version:
+            return
+        if self.version is not None and time.monotonic() - self._built_at < self.min_interval:
+            return
+        self.build(conn.execute(ROWS_SQL).fetchall(), version)
+
+    # ── lookups ───────────────────────────────────────────────────────
+    @staticmethod
+    def _session(snap, num, cell):
+        subject, teacher, room = snap.sessions[num]
+        return {**describe_cell(cell), 'subject': subject, 'teacher_name': teacher, 'room': room}
+
+    def _table(self, snap, kind):
+        return {'student': snap.students, 'room': snap.rooms, 'teacher': snap.teachers}[kind]
+
+    def _cell(self, snap, kind, key, cell):
+        if cell is None:
+            return []
+        cells = self._table(snap, kind).get(key)
+        if cells is None or not cells[cell]:
+            return []
+        nums = [cells[cell]] if kind == 'student' else sorted(cells[cell])
+        return [self._session(snap, n, cell) for n in nums]
+
+    def knows(self, kind, key):
+        return key in self._table(self._snap, kind)
+
+    def at(self, kind, key, cell):
+        """Entries for a student ('student'), room ('room') or teacher ('teacher') in one cell."""
+        return self._cell(self._snap, kind, key, cell)
+
+    def grid(self, kind, key):
+        """[[entries] * len(SLOTS)] * len(DAYS), or None for an unknown student/room/teacher."""
+        snap = self._snap
+        if key not in self._table(snap, kind):
+            return None
+        return [[self._cell(snap, kind, key, cell_of(d, s)) for s in range(len(SLOTS))] for d in range(len(DAYS))]
+
+    def next_busy(self, kind, key, cell):
+        """First occupied cell at or after ``cell`` on the same day → (cell, entries)."""
+        if cell is None:
+            return None, []
+        snap    = self._snap
+        day_end = (cell // len(SLOTS) + 1) * len(SLOTS)
+        for c in range(cell, day_end):
+            entries = self._cell(snap, kind, key, c)
+            if entries:
+                return c, entries
+        return None, []
+
+    def now_next(self, kind, key, when=None):
+        """{'slot', 'now': [...], 'next': [...]} around ``when`` (default: the current local time)."""
+        current, upcoming = locate(when or datetime.datetime.now())
+        _, nxt = self.next_busy(kind, key, upcoming)
+        return {'slot': describe_cell(current) if current is not None else None,
+                'now': self.at(kind, key, current), 'next': nxt}
+
+    def day(self, kind, key, day_idx):
+        """Occupied cells of one day, in slot order."""
+        snap = self._snap
+        return [e for s in range(len(SLOTS)) for e in self._cell(snap, kind, key, cell_of(day_idx, s))]
+
+    def clashes(self, kind):
+        """Double bookings: students with two classes, or rooms/teachers with two sessions, in one cell."""
+        snap = self._snap
+        if kind == 'student':
+            return [{'student_id': sid, **describe_cell(cell),
+                     'sessions': [self._session(snap, n, cell) for n in nums]} for sid, cell, nums in snap.clashes]
+        label = 'room' if kind == 'room' else 'teacher_name'
+        return [{label: owner, **describe_cell(cell), 'sessions': [self._session(snap, n, cell) for n in sorted(nums)]}
+                for owner, cells in self._table(snap, kind).items()
+                for cell, nums in enumerate(cells) if nums and len(nums) > 1]
+
+    def stats(self):
+        snap = self._snap
+        return {'version': self.version, 'students': len(snap.students), 'rooms': len(snap.rooms),
+                'teachers': len(snap.teachers), 'sessions': len(snap.sessions) - 1,
+                'student_clashes': len(snap.clashes)}
+
+
+if __name__ == '__main__':
+    import sqlite3, os, sys
+    db = os.path.join(os.path.dirname(__file__), 'data', 'campus.db')
+    if not os.path.exists(db):
+        raise SystemExit("ERROR: campus.db not found. Run app.py first!")
+    conn  = sqlite3.connect(db)
+    index = TimetableIndex()
+    start = time.perf_counter()
+    index.refresh(conn)
+    print(f"Built in {(time.perf_counter() - start) * 1000:.0f} ms: {index.stats()}")
+    sid = int(sys.argv[1]) if len(sys.argv) > 1 else 1
+    for day, row in zip(DAYS, index.grid('student', sid) or []):
+        print(f"  {day}  " + '  '.join((c[0]['subject'][:12] if c else '-').ljust(12) for c in row))
+    conn.close()
@@ -0,0 +1,14 @@
+"""WSGI entry point for production serving.
+
+Usage:  gunicorn -c gunicorn.conf.py wsgi:app
+
+create_app() runs at import. With gunicorn's preload_app (on in
+gunicorn.conf.py) that happens once, in the master, before the workers are
+forked. The CSV bootstrap therefore runs synchronously: a background thread
+must not be holding the pool's lock when the master forks. BOOTSTRAP_MODE=skip
+is honoured.
+"""
+import os
+from app import create_app
+
+app = create_app(bootstrap='skip' if os.getenv('BOOTSTRAP_MODE', '').strip().lower() == 'skip' else 'sync')